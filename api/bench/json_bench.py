@@ -0,0 +1,97 @@
+"""Compare the stdlib JSON path with the orjson/msgspec path used by the API.
+
+Run from the repo root:  python -m api.bench.json_bench [--tracks 10000]
+
+Each case runs the hot-path work for one request and reports the best of several
+rounds (ms). The "fast" column uses whatever of orjson/msgspec is installed.
+"""
+
+import argparse
+import json
+import time
+
+import httpx
+from fastapi.responses import JSONResponse
+
+try:
+    from api import main
+except Exception:
+    import main  # type: ignore
+
+
+def _spotify_track(n: int) -> dict:
+    # Roughly the size of a real /me/tracks item (markets trimmed)
+    return {
+        "added_at": f"2024-01-01T00:{n % 60:02d}:00Z",
+        "track": {
+            "id": f"id{n:018d}",
+            "name": f"Track number {n}",
+            "uri": f"spotify:track:id{n:018d}",
+            "duration_ms": 180000 + n,
+            "preview_url": None,
+            "explicit": False,
+            "popularity": n % 100,
+            "external_ids": {"isrc": f"USRC1{n:07d}"},
+            "external_urls": {"spotify": f"https://open.spotify.com/track/id{n:018d}"},
+            "artists": [
+                {"id": f"ar{n}", "name": f"Artist {n % 500}", "type": "artist", "uri": f"spotify:artist:ar{n}",
+                 "external_urls": {"spotify": f"https://open.spotify.com/artist/ar{n}"}},
+            ],
+            "album": {
+                "id": f"al{n}", "name": f"Album {n % 800}", "album_type": "album", "release_date": "2020-01-01",
+                "total_tracks": 12, "uri": f"spotify:album:al{n}",
+                "images": [
+                    {"url": f"https://i.scdn.co/image/{n:040d}", "height": h, "width": h} for h in (640, 300, 64)
+                ],
+            },
+        },
+    }
+
+
+def _best(fn, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=7)
+    args = parser.parse_args()
+
+    pages = [
+        httpx.Response(200, content=json.dumps({"total": args.tracks, "items": [_spotify_track(n) for n in range(o, min(o + 50, args.tracks))]}).encode())
+        for o in range(0, args.tracks, 50)
+    ]
+    songs = [main._map_spotify_track_to_song(_spotify_track(n), n) for n in range(args.tracks)]
+    session = {"spotify_tokens": {"access_token": "x" * 200, "refresh_token": "y" * 130, "expires_at": time.time()},
+               "spotify_user_id": "user", "auth_popup": False}
+
+    def decode_stdlib():
+        for resp in pages:
+            json.loads(resp.content)
+
+    def decode_fast():
+        for resp in pages:
+            main._decode_tracks(resp)
+
+    cases = [
+        (f"decode {len(pages)} track pages", decode_stdlib, decode_fast),
+        (f"render {args.tracks} songs", lambda: JSONResponse(songs), lambda: main.FastJSONResponse(songs)),
+        ("session hash encode+decode x1000",
+         lambda: [{k: json.loads(v) for k, v in {k: json.dumps(v) for k, v in session.items()}.items()} for _ in range(1000)],
+         lambda: [main._decode_session(main._encode_session(session)) for _ in range(1000)]),
+    ]
+    print(f"orjson: {'yes' if main.orjson else 'no'}  msgspec: {'yes' if main.msgspec else 'no'}")
+    print(f"{'case':<36}{'stdlib ms':>12}{'fast ms':>12}{'speedup':>10}")
+    for name, slow, fast in cases:
+        slow_ms, fast_ms = _best(slow, args.rounds), _best(fast, args.rounds)
+        print(f"{name:<36}{slow_ms:>12.2f}{fast_ms:>12.2f}{slow_ms / fast_ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    run()
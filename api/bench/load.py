@@ -0,0 +1,291 @@
+"""Load-test the API in-process against a local Spotify stand-in.
+
+Run from the repo root:  python -m api.bench.load [--users 20] [--workloads login,polling]
+
+Workloads (each runs on its own, with seeded authenticated sessions):
+  login    every user runs /auth/spotify/login then the callback at once
+  polling  every user polls /api/spotify/current every 1.2 s for --duration seconds
+  search   every user types a query one key at a time, then loads the album art
+  library  every user syncs liked songs, playlists and the first playlists' songs
+
+Throughput and p50/p99 per route are compared with api/bench/baseline.json; the run
+exits with status 1 when a route's p99 or a workload's throughput regresses by more
+than --tolerance. Use --save-baseline to replace the stored baseline. Baselines are
+only comparable on the same machine and settings; a baseline recorded with other
+settings is not compared against, and the run exits with status 2.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+
+try:
+    from api import main
+    from api.bench.spotify_stub import SpotifyStub
+except Exception:
+    import main  # type: ignore
+    from bench.spotify_stub import SpotifyStub  # type: ignore
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+WORKLOADS = ("login", "polling", "search", "library")
+SEARCH_QUERIES = ("daft punk", "radiohead", "dance", "david bowie", "rain")
+# Run settings stored with results; baselines recorded with other values are not comparable
+SETTINGS = ("users", "duration", "latency_ms", "jitter_ms", "throttle_rate", "liked_pages", "playlists", "playlist_pages", "real_limits")
+# A p99 this close to the baseline (ms) is noise, not a regression
+NOISE_FLOOR_MS = 2.0
+
+
+def _percentile(sorted_ms: List[float], q: float) -> float:
+    if not sorted_ms:
+        return 0.0
+    return sorted_ms[min(len(sorted_ms) - 1, max(0, round(q * len(sorted_ms) + 0.5) - 1))]
+
+
+class _Recorder:
+    """Latency samples (ms) and error counts per route name."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    async def call(self, client: httpx.AsyncClient, route: str, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        started = time.perf_counter()
+        resp = await client.request(method, url, **kwargs)
+        self.samples.setdefault(route, []).append((time.perf_counter() - started) * 1000)
+        if resp.status_code >= 400:
+            self.errors[route] = self.errors.get(route, 0) + 1
+        return resp
+
+    def report(self, wall: float) -> Dict[str, Any]:
+        routes = {}
+        for route, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+            routes[route] = {
+                "n": len(ordered),
+                "errors": self.errors.get(route, 0),
+                "p50": round(_percentile(ordered, 0.50), 2),
+                "p99": round(_percentile(ordered, 0.99), 2),
+            }
+        total = sum(r["n"] for r in routes.values())
+        return {"requests": total, "seconds": round(wall, 3), "rps": round(total / wall, 1) if wall else 0.0, "routes": routes}
+
+
+def _client(sid: Optional[str] = None) -> httpx.AsyncClient:
+    # https so the Secure session cookie set by /auth/spotify/login is sent back
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=main.app),
+        base_url="https://bench.local",
+        cookies={"session_id": sid} if sid else None,
+        timeout=60,
+    )
+
+
+async def _seed_sessions(users: int) -> List[str]:
+    sids = []
+    for i in range(users):
+        sid = f"bench-{i}"
+        await main._set_session(sid, {
+            "spotify_tokens": {"access_token": f"tok-{i}", "refresh_token": f"refresh-{i}", "expires_at": time.time() + 3600},
+            "spotify_user_id": f"user-{i}",
+            "auth_popup": False,
+        })
+        sids.append(sid)
+    return sids
+
+
+async def _login(rec: _Recorder, args: argparse.Namespace, sids: List[str]) -> None:
+    async def one(i: int) -> None:
+        async with _client() as c:
+            resp = await rec.call(c, "GET /auth/spotify/login", "GET", "/auth/spotify/login")
+            state = parse_qs(urlparse(resp.headers.get("location", "")).query).get("state", [""])[0]
+            await rec.call(c, "GET /auth/spotify/callback", "GET", "/auth/spotify/callback", params={"code": f"code-{i}", "state": state})
+
+    await asyncio.gather(*(one(i) for i in range(len(sids))))
+
+
+async def _polling(rec: _Recorder, args: argparse.Namespace, sids: List[str]) -> None:
+    rng = random.Random(args.seed)
+
+    async def one(sid: str, phase: float) -> None:
+        async with _client(sid) as c:
+            started = time.monotonic()
+            tick = phase
+            while tick < args.duration:
+                await asyncio.sleep(max(0.0, started + tick - time.monotonic()))
+                await rec.call(c, "GET /api/spotify/current", "GET", "/api/spotify/current")
+                tick += args.poll_interval
+
+    await asyncio.gather(*(one(sid, rng.random() * args.poll_interval) for sid in sids))
+
+
+async def _search(rec: _Recorder, args: argparse.Namespace, sids: List[str]) -> None:
+    rng = random.Random(args.seed)
+
+    async def one(sid: str, query: str) -> None:
+        async with _client(sid) as c:
+            songs: Any = []
+            for end in range(1, len(query) + 1):
+                resp = await rec.call(c, "GET /api/spotify/search", "GET", "/api/spotify/search", params={"q": query[:end], "limit": 20})
+                if resp.status_code == 200:
+                    songs = resp.json()
+                await asyncio.sleep(args.keystroke * (0.5 + rng.random()))
+            arts = list(dict.fromkeys(s.get("albumArt") for s in songs if s.get("albumArt")))[:6]
+            await asyncio.gather(*(rec.call(c, "GET /api/proxy/image", "GET", "/api/proxy/image", params={"src": a}) for a in arts))
+
+    await asyncio.gather(*(one(sid, SEARCH_QUERIES[i % len(SEARCH_QUERIES)]) for i, sid in enumerate(sids)))
+
+
+async def _library(rec: _Recorder, args: argparse.Namespace, sids: List[str]) -> None:
+    async def one(sid: str) -> None:
+        async with _client(sid) as c:
+            await rec.call(c, "GET /api/library/liked", "GET", "/api/library/liked")
+            resp = await rec.call(c, "GET /api/spotify/playlists", "GET", "/api/spotify/playlists")
+            playlists = resp.json().get("items", []) if resp.status_code == 200 else []
+            for p in playlists[:3]:
+                await rec.call(c, "GET /api/spotify/playlists/{id}/songs", "GET", f"/api/spotify/playlists/{p['id']}/songs")
+
+    await asyncio.gather(*(one(sid) for sid in sids))
+
+
+_RUNNERS = {"login": _login, "polling": _polling, "search": _search, "library": _library}
+
+
+def _reset_caches() -> None:
+    """Give every workload a cold start, as after a deploy."""
+    main._SEARCH_CACHE._entries.clear()
+    for _, cache in main._UPSTREAM_POLICIES:
+        cache._entries.clear()
+    main.IMAGE_CACHE = main._ImageCache(tempfile.mkdtemp(prefix="vinyl-bench-"), main.IMAGE_CACHE_MEMORY_BYTES, main.IMAGE_CACHE_DISK_BYTES)
+    main.LIBRARY = main._LibraryStore(main.LIBRARY_CACHE_ENTRIES)
+    main.SPOTIFY_CLIENT = main._SpotifyClient()
+
+
+async def bench(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the selected workloads; returns {"meta": ..., "results": {workload: report}}."""
+    stub = SpotifyStub(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, throttle_rate=args.throttle_rate,
+        liked_pages=args.liked_pages, playlists=args.playlists, playlist_pages=args.playlist_pages, seed=args.seed,
+    )
+    os.environ.setdefault("SPOTIFY_CLIENT_ID", "bench-client")
+    os.environ.setdefault("SPOTIFY_CLIENT_SECRET", "bench-secret")
+    if not args.real_limits:
+        # Measure this server, not Spotify's quota (the buckets are sized for the real API)
+        main.SPOTIFY_APP_RPS = main.SPOTIFY_APP_BURST = main.SPOTIFY_USER_RPS = main.SPOTIFY_USER_BURST = 1e6
+    upstream = httpx.AsyncClient(transport=httpx.ASGITransport(app=stub), timeout=30)
+    main.SPOTIFY_HTTP = main.SPOTIFY_ACCOUNTS_HTTP = main.IMAGE_HTTP = upstream
+    results = {}
+    try:
+        for name in args.workloads:
+            _reset_caches()
+            sids = await _seed_sessions(args.users)
+            rec = _Recorder()
+            started = time.perf_counter()
+            await _RUNNERS[name](rec, args, sids)
+            results[name] = rec.report(time.perf_counter() - started)
+    finally:
+        await upstream.aclose()
+    meta = {key: getattr(args, key) for key in SETTINGS}
+    meta.update(python=platform.python_version(), machine=platform.machine(), orjson=main.orjson is not None)
+    return {"meta": meta, "results": results}
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Return a line per regression beyond `tolerance` (a fraction, e.g. 0.25)."""
+    problems = []
+    for name, report in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        if report["rps"] < base["rps"] / (1 + tolerance):
+            problems.append(f"{name}: throughput {report['rps']} rps vs baseline {base['rps']}")
+        for route, stats in report["routes"].items():
+            ref = base["routes"].get(route)
+            if ref and stats["p99"] > ref["p99"] * (1 + tolerance) and stats["p99"] - ref["p99"] > NOISE_FLOOR_MS:
+                problems.append(f"{name}: {route} p99 {stats['p99']} ms vs baseline {ref['p99']} ms")
+    return problems
+
+
+def incomparable_settings(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Run settings that differ between the two results (empty when they are comparable)."""
+    return [k for k in SETTINGS if baseline.get("meta", {}).get(k) != current["meta"][k]]
+
+
+def _print_report(current: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    print(f"{'workload / route':<48}{'n':>7}{'err':>6}{'p50 ms':>10}{'p99 ms':>10}{'base p99':>10}")
+    for name, report in current["results"].items():
+        base = ((baseline or {}).get("results") or {}).get(name) or {"routes": {}}
+        base_rps = f"  (baseline {base['rps']} rps)" if "rps" in base else ""
+        print(f"{name}: {report['requests']} requests in {report['seconds']} s, {report['rps']} rps{base_rps}")
+        for route, s in report["routes"].items():
+            ref = base["routes"].get(route, {}).get("p99", "-")
+            print(f"  {route:<46}{s['n']:>7}{s['errors']:>6}{s['p50']:>10.2f}{s['p99']:>10.2f}{ref:>10}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--workloads", default=",".join(WORKLOADS), help="comma-separated subset of: " + ", ".join(WORKLOADS))
+    parser.add_argument("--duration", type=float, default=6.0, help="polling run length (s)")
+    parser.add_argument("--poll-interval", type=float, default=1.2)
+    parser.add_argument("--keystroke", type=float, default=0.12, help="mean gap between search keystrokes (s)")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="stub upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of Spotify API calls answered 429")
+    parser.add_argument("--liked-pages", type=int, default=10)
+    parser.add_argument("--playlists", type=int, default=5)
+    parser.add_argument("--playlist-pages", type=int, default=2)
+    parser.add_argument("--real-limits", action="store_true", help="keep the Spotify rate-limit buckets")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+    args.workloads = [w.strip() for w in args.workloads.split(",") if w.strip()]
+    unknown = [w for w in args.workloads if w not in _RUNNERS]
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(unknown)}")
+    return args
+
+
+def run(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    current = asyncio.run(bench(args))
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    changed = incomparable_settings(current, baseline) if baseline is not None and not args.save_baseline else []
+    _print_report(current, None if args.save_baseline or changed else baseline)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if baseline is None:
+        print("no baseline stored; run with --save-baseline to create one")
+        return 0
+    if changed:
+        print(
+            "incomparable baseline: it was recorded with different " + ", ".join(changed)
+            + "; rerun with the same settings or use --save-baseline"
+        )
+        return 2
+    problems = compare(current, baseline, args.tolerance)
+    for line in problems:
+        print("REGRESSION", line)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
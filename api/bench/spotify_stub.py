@@ -0,0 +1,157 @@
+"""In-process ASGI stand-in for accounts.spotify.com, api.spotify.com and i.scdn.co.
+
+Requests are routed on the Host header, so one instance can back all three upstream
+clients through httpx.ASGITransport. Latency, 429 responses and library sizes are
+configurable; responses are deterministic for a given seed.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+
+def spotify_track(n: int) -> Dict[str, Any]:
+    """A track object with the fields the API maps (plus a little of the usual bulk)."""
+    return {
+        "id": f"id{n:018d}",
+        "name": f"Track number {n}",
+        "uri": f"spotify:track:id{n:018d}",
+        "duration_ms": 180000 + n,
+        "preview_url": None,
+        "explicit": False,
+        "popularity": n % 100,
+        "external_urls": {"spotify": f"https://open.spotify.com/track/id{n:018d}"},
+        "artists": [{"id": f"ar{n % 500}", "name": f"Artist {n % 500}", "uri": f"spotify:artist:ar{n % 500}"}],
+        "album": {
+            "id": f"al{n % 800}",
+            "name": f"Album {n % 800}",
+            "release_date": "2020-01-01",
+            "images": [{"url": f"https://i.scdn.co/image/{n % 800:040d}", "height": h, "width": h} for h in (640, 300, 64)],
+        },
+    }
+
+
+class SpotifyStub:
+    """ASGI app answering the Spotify endpoints the API calls.
+    - `latency_ms` (+ up to `jitter_ms`) is slept before every response.
+    - `throttle_rate` of api.spotify.com requests get a 429 with `Retry-After: retry_after`.
+    - The liked library has `liked_pages` pages of 50; each of `playlists` playlists has
+      `playlist_pages` pages of 100.
+    - JSON responses carry an ETag and honour If-None-Match.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 20.0,
+        jitter_ms: float = 10.0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 0.1,
+        liked_pages: int = 10,
+        playlists: int = 5,
+        playlist_pages: int = 2,
+        image_bytes: int = 24_000,
+        seed: int = 1,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.liked_total = liked_pages * 50
+        self.playlists = playlists
+        self.playlist_total = playlist_pages * 100
+        self.image = b"\xff\xd8\xff\xe0" + bytes(random.Random(seed).getrandbits(8) for _ in range(image_bytes))
+        self.rng = random.Random(seed)
+        self.tokens_issued = 0
+        self.requests: Dict[str, int] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        host = headers.get("host", "").split(":")[0]
+        method, path = scope["method"], scope["path"]
+        query = {k: v[-1] for k, v in parse_qs(scope.get("query_string", b"").decode()).items()}
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        key = f"{host} {method} {path}"
+        self.requests[key] = self.requests.get(key, 0) + 1
+
+        delay = self.latency_ms + self.rng.random() * self.jitter_ms
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+        if host == "accounts.spotify.com":
+            status, payload = self._accounts(method, path)
+        elif host == "api.spotify.com":
+            if self.throttle_rate and self.rng.random() < self.throttle_rate:
+                return await self._send(send, 429, b"", [(b"retry-after", str(self.retry_after).encode())])
+            status, payload = self._api(method, path, query, headers)
+        elif host == "i.scdn.co" and path.startswith("/image/"):
+            return await self._send(send, 200, self.image, [(b"content-type", b"image/jpeg")])
+        else:
+            status, payload = 404, {"error": {"status": 404, "message": "Not found"}}
+
+        if payload is None:
+            return await self._send(send, status, b"", [])
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+        etag = f'"{hashlib.blake2b(raw, digest_size=8).hexdigest()}"'
+        if status == 200 and headers.get("if-none-match") == etag:
+            return await self._send(send, 304, b"", [(b"etag", etag.encode())])
+        await self._send(send, status, raw, [(b"content-type", b"application/json"), (b"etag", etag.encode())])
+
+    @staticmethod
+    async def _send(send, status: int, body: bytes, headers: List[Tuple[bytes, bytes]]) -> None:
+        headers = headers + [(b"content-length", str(len(body)).encode())]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    def _accounts(self, method: str, path: str) -> Tuple[int, Optional[Dict[str, Any]]]:
+        if method != "POST" or path != "/api/token":
+            return 404, {"error": "not_found"}
+        self.tokens_issued += 1
+        n = self.tokens_issued
+        return 200, {"access_token": f"tok-issued-{n}", "refresh_token": f"refresh-{n}", "expires_in": 3600, "token_type": "Bearer"}
+
+    def _page(self, total: int, query: Dict[str, str], default_limit: int, wrap: bool, start: int = 0) -> Dict[str, Any]:
+        limit = int(query.get("limit", default_limit))
+        offset = int(query.get("offset", 0))
+        items = []
+        for n in range(offset, min(offset + limit, total)):
+            track = spotify_track(start + n)
+            items.append({"added_at": f"2024-01-01T{n // 3600 % 24:02d}:{n // 60 % 60:02d}:{n % 60:02d}Z", "track": track} if wrap else track)
+        return {"total": total, "limit": limit, "offset": offset, "items": items}
+
+    def _api(self, method: str, path: str, query: Dict[str, str], headers: Dict[str, str]) -> Tuple[int, Optional[Dict[str, Any]]]:
+        token = headers.get("authorization", "").removeprefix("Bearer ")
+        if not token:
+            return 401, {"error": {"status": 401, "message": "No token provided"}}
+        if method != "GET":
+            return (204, None) if path.startswith("/v1/me/player") else (404, {"error": {"status": 404}})
+        if path == "/v1/me":
+            return 200, {"id": f"user-{token}", "display_name": token, "product": "premium"}
+        if path == "/v1/me/tracks":
+            return 200, self._page(self.liked_total, query, 20, wrap=True)
+        if path == "/v1/me/playlists":
+            items = [{"id": f"pl{i}", "name": f"Playlist {i}", "snapshot_id": f"snap-{i}", "tracks": {"total": self.playlist_total}}
+                     for i in range(self.playlists)]
+            return 200, {"total": len(items), "items": items}
+        if path.startswith("/v1/playlists/") and path.endswith("/tracks"):
+            number = int(path.split("/")[3].removeprefix("pl") or 0)
+            return 200, self._page(self.playlist_total, query, 100, wrap=True, start=number * 1000)
+        if path == "/v1/me/player/currently-playing":
+            n = self.rng.randrange(1000)
+            return 200, {"is_playing": True, "progress_ms": self.rng.randrange(180000), "item": spotify_track(n)}
+        if path == "/v1/me/player/devices":
+            return 200, {"devices": [{"id": "dev1", "name": "Bench", "type": "Computer", "is_active": True, "volume_percent": 50}]}
+        if path == "/v1/search":
+            seed = int(hashlib.blake2b(query.get("q", "").encode(), digest_size=4).hexdigest(), 16)
+            limit = int(query.get("limit", 20))
+            return 200, {"tracks": {"total": 1000, "items": [spotify_track((seed + i) % 5000) for i in range(limit)]}}
+        return 404, {"error": {"status": 404, "message": "Service not found"}}
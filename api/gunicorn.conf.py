@@ -0,0 +1,25 @@
+"""Gunicorn settings for running the API with several uvicorn workers.
+
+    PROMETHEUS_MULTIPROC_DIR=/tmp/vinyl-metrics gunicorn -c api/gunicorn.conf.py api.main:app
+"""
+import os
+import shutil
+
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+
+def on_starting(server):
+    # Samples left over from a previous run would be summed into the new one
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,33 +1,847 @@
 import os
 import time
+import math
 import secrets
 import json
-from typing import Dict, Any, List, Optional, Tuple
-from urllib.parse import urlparse
+import re
+import sqlite3
+import asyncio
+import hashlib
+import mimetypes
+import tempfile
+import io
+import heapq
+import itertools
+import random
+import functools
+import contextvars
+import importlib.util
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple, TypedDict
+from urllib.parse import urlparse, urlencode
 
 from fastapi import FastAPI, Request, Response, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, RedirectResponse, HTMLResponse
+from fastapi.responses import JSONResponse, RedirectResponse, HTMLResponse, StreamingResponse, FileResponse
 from dotenv import load_dotenv
 import httpx
 try:
     import redis.asyncio as redis  # redis>=4.x with asyncio support
 except Exception:
     redis = None  # Fallback to in-memory if redis is unavailable
+# Pillow (album-art resizing/transcoding) and NumPy (palette k-means) are only used inside
+# the image worker processes, so they are imported there on first use to keep startup fast
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None  # Without it originals are served as-is
+try:
+    import orjson  # optional: fast JSON encode/decode
+except Exception:
+    orjson = None  # Fallback to the stdlib json module
+try:
+    import msgspec  # optional: typed decoding of Spotify track pages
+except Exception:
+    msgspec = None  # Fallback to decoding every field
+try:
+    import prometheus_client  # optional: /metrics
+except Exception:
+    prometheus_client = None  # Metrics become no-ops
 
 load_dotenv()
 load_dotenv(".env.local")
 
-# Session storage: Redis (preferred) with in-memory fallback
-SESSIONS: Dict[str, Dict[str, Any]] = {}
-OAUTH_STATE_TO_SID: Dict[str, str] = {}
+# JSON on hot paths (responses, sessions, caches, upstream bodies) goes through these
+if orjson is not None:
+    def _json_dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    _json_loads = orjson.loads
+else:
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    _json_loads = json.loads
+
+
+def _json_text(obj: Any) -> str:
+    return _json_dumps(obj).decode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed."""
+
+    def render(self, content: Any) -> bytes:
+        return _json_dumps(content)
+
+
+def _passthrough(resp: httpx.Response) -> Response:
+    """Relay a Spotify JSON body as-is instead of decoding and re-encoding it."""
+    return Response(resp.content, status_code=resp.status_code, media_type="application/json")
+
+
+# Prometheus metrics (optional). Under gunicorn, set PROMETHEUS_MULTIPROC_DIR to an empty
+# directory before the workers start; /metrics then aggregates every worker's samples.
+class _NoMetric:
+    """Stand-in when prometheus_client is not installed."""
+
+    def labels(self, *args: Any, **kwargs: Any) -> "_NoMetric":
+        return self
+
+    def observe(self, value: float) -> None:
+        pass
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def dec(self, amount: float = 1) -> None:
+        pass
+
+
+if prometheus_client is not None:
+    ROUTE_LATENCY = prometheus_client.Histogram(
+        "vinyl_http_request_duration_seconds", "API request latency", ["method", "route", "status"]
+    )
+    REQUESTS_IN_FLIGHT = prometheus_client.Gauge(
+        "vinyl_http_requests_in_flight", "API requests being handled", multiprocess_mode="livesum"
+    )
+    UPSTREAM_LATENCY = prometheus_client.Histogram(
+        "vinyl_upstream_request_duration_seconds", "Spotify API / accounts call latency",
+        ["service", "method", "path", "status"],
+    )
+    REDIS_LATENCY = prometheus_client.Histogram(
+        "vinyl_redis_operation_duration_seconds", "Session store Redis call latency", ["op"],
+        buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+    )
+    REDIS_FALLBACKS = prometheus_client.Counter(
+        "vinyl_redis_fallbacks_total", "Session operations served by the local store instead of Redis", ["op"]
+    )
+    CACHE_EVENTS = prometheus_client.Counter(
+        "vinyl_cache_events_total", "Cache lookups by result (hits, misses, ...)", ["cache", "result"]
+    )
+else:
+    ROUTE_LATENCY = REQUESTS_IN_FLIGHT = UPSTREAM_LATENCY = REDIS_LATENCY = REDIS_FALLBACKS = CACHE_EVENTS = _NoMetric()
+
+# Spotify ids in upstream paths collapse to a placeholder to keep label cardinality bounded
+_UPSTREAM_PATH_IDS = re.compile(r"/(playlists|tracks|albums|artists|shows|episodes|users)/[^/]+")
+
+
+def _upstream_path_label(path: str) -> str:
+    return _UPSTREAM_PATH_IDS.sub(r"/\1/{id}", path)
+
+
+def _observe_upstream(service: str, method: str, path: str, status: Any, started: float) -> None:
+    UPSTREAM_LATENCY.labels(service, method, _upstream_path_label(path), str(status)).observe(
+        time.perf_counter() - started
+    )
+
+
+async def _accounts_token_post(data: Dict[str, str]) -> httpx.Response:
+    """POST to the Spotify token endpoint, recording its latency and status."""
+    started = time.perf_counter()
+    status: Any = "error"
+    try:
+        resp = await _accounts_http().post(SPOTIFY_TOKEN_URL, data=data)
+        status = resp.status_code
+        return resp
+    finally:
+        _observe_upstream("accounts", "POST", "/api/token", status, started)
+
+
+def _observe_redis(op: str, started: float) -> None:
+    REDIS_LATENCY.labels(op).observe(time.perf_counter() - started)
+
+
+def _local_fallback(op: str) -> None:
+    """Count a session operation served locally although Redis is configured."""
+    if REDIS is not None:
+        REDIS_FALLBACKS.labels(op).inc()
+
+
+class _MetricsMiddleware:
+    """Per-route latency histogram and in-flight gauge, as plain ASGI (no per-request task)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            ROUTE_LATENCY.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status[0])
+            ).observe(time.perf_counter() - started)
+
+
+# Request tracing: spans are summed per name into the current request's trace, sent back
+# in a Server-Timing header, and slow requests are sampled into a per-worker ring buffer.
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "500"))
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))  # share of slow requests kept
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+# SSE/NDJSON responses stay open for the whole stream; they are timed to their first byte
+_STREAMING_CONTENT_TYPES = (b"text/event-stream", b"application/x-ndjson")
+_TRACE: "contextvars.ContextVar[Optional[_Trace]]" = contextvars.ContextVar("vinyl_trace", default=None)
+
+
+class _Trace:
+    """Per-request span totals: name -> [seconds, count]."""
+
+    __slots__ = ("started", "spans")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: Dict[str, List[float]] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        span = self.spans.get(name)
+        if span is None:
+            self.spans[name] = [seconds, 1]
+        else:
+            span[0] += seconds
+            span[1] += 1
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        parts = []
+        for name, (seconds, count) in self.spans.items():
+            part = f"{name};dur={seconds * 1000:.1f}"
+            parts.append(part if count == 1 else f'{part};desc="{int(count)}x"')
+        parts.append(f"app;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+
+
+class _Span:
+    """`with _Span("map"):` adds the block's duration to the current trace, if any.
+    Nested or concurrent spans are summed independently, so totals may exceed `app`.
+    """
+
+    __slots__ = ("name", "trace", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.trace = _TRACE.get()
+
+    def __enter__(self) -> "_Span":
+        if self.trace is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        if self.trace is not None:
+            self.trace.add(self.name, time.perf_counter() - self.started)
+
+
+def _traced(name: str):
+    """Decorator: record each call of an async function as a span."""
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _TRACE.get() is None:
+                return await fn(*args, **kwargs)
+            with _Span(name):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+class _SlowTraces:
+    """Ring buffer of recent slow requests (this worker only)."""
+
+    def __init__(self, size: int):
+        self.entries: "deque[Dict[str, Any]]" = deque(maxlen=size)
+        self.stats = {"slow": 0, "sampled": 0}
+
+    def offer(self, scope: Dict[str, Any], status: int, trace: _Trace) -> None:
+        elapsed_ms = trace.elapsed() * 1000
+        if elapsed_ms < TRACE_SLOW_MS:
+            return
+        self.stats["slow"] += 1
+        if random.random() >= TRACE_SAMPLE_RATE:
+            return
+        self.stats["sampled"] += 1
+        route = scope.get("route")
+        self.entries.append({
+            "at": time.time(),
+            "method": scope["method"],
+            "route": getattr(route, "path", None),
+            "path": scope["path"],
+            "status": status,
+            "ms": round(elapsed_ms, 1),
+            "spans": {name: {"ms": round(sec * 1000, 1), "count": int(n)} for name, (sec, n) in trace.spans.items()},
+        })
+
+    def query(self, min_ms: float = 0.0, route: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Newest first."""
+        out = []
+        for entry in reversed(self.entries):
+            if entry["ms"] >= min_ms and (route is None or entry["route"] == route):
+                out.append(entry)
+                if len(out) >= limit:
+                    break
+        return out
+
+
+SLOW_TRACES = _SlowTraces(TRACE_BUFFER_SIZE)
+
+
+class _TracingMiddleware:
+    """Starts a trace per request and adds the `Server-Timing` header (plain ASGI)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        # /api/batch sub-requests run inside the batch's trace
+        if scope["type"] != "http" or "vinyl.auth" in scope:
+            return await self.app(scope, receive, send)
+        trace = _Trace()
+        token = _TRACE.set(trace)
+        status = [500]
+        streaming = [False]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                headers.append((b"timing-allow-origin", FRONTEND_URL.encode("latin-1")))
+                message = {**message, "headers": headers}
+                streaming[0] = any(
+                    k.lower() == b"content-type" and v.startswith(_STREAMING_CONTENT_TYPES) for k, v in headers
+                )
+                if streaming[0]:
+                    SLOW_TRACES.offer(scope, status[0], trace)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _TRACE.reset(token)
+            if not streaming[0]:
+                SLOW_TRACES.offer(scope, status[0], trace)
+
+
+class _TTLStore:
+    """In-process key/value store with per-entry TTL and an LRU size cap.
+
+    Expiry uses a hashed timer wheel: each entry sits in the bucket for the tick its TTL
+    ends in, and every operation first drops the buckets whose tick has passed. Each entry
+    is bucketed and swept once, so eviction is amortized O(1) with no background task.
+    """
+
+    __slots__ = ("ttl", "max_entries", "sliding", "resolution", "_entries", "_wheel", "_swept_tick", "stats")
+
+    class _Entry:
+        __slots__ = ("value", "ttl", "expires_at", "tick")
+
+        def __init__(self, value: Any, ttl: float):
+            self.value = value
+            self.ttl = ttl
+            self.expires_at = 0.0
+            self.tick = -1
+
+    def __init__(self, ttl: float, max_entries: int, sliding: bool = False, resolution: float = 1.0):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.sliding = sliding  # reads extend the TTL
+        self.resolution = resolution
+        self._entries: "OrderedDict[str, _TTLStore._Entry]" = OrderedDict()
+        self._wheel: Dict[int, set] = {}
+        self._swept_tick = int(time.monotonic() // resolution)
+        self.stats = {"expired": 0, "evicted": 0}
+
+    def _sweep(self, now: float) -> None:
+        current = int(now // self.resolution)
+        if current <= self._swept_tick:
+            return
+        if current - self._swept_tick > len(self._wheel):
+            # Idle for a long time: visit only the buckets that exist
+            due = sorted(t for t in self._wheel if t <= current)
+        else:
+            due = range(self._swept_tick + 1, current + 1)
+        for tick in due:
+            for key in self._wheel.pop(tick, ()):
+                self._entries.pop(key, None)
+                self.stats["expired"] += 1
+        self._swept_tick = current
+
+    def _schedule(self, key: str, entry: "_TTLStore._Entry", expires_at: float) -> None:
+        entry.expires_at = expires_at
+        # Round up so a bucket only holds entries that have expired once its tick passes
+        tick = max(math.ceil(expires_at / self.resolution), self._swept_tick + 1)
+        if tick != entry.tick:
+            self._unschedule(key, entry)
+            entry.tick = tick
+            self._wheel.setdefault(tick, set()).add(key)
+
+    def _unschedule(self, key: str, entry: "_TTLStore._Entry") -> None:
+        bucket = self._wheel.get(entry.tick)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._wheel[entry.tick]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.monotonic()
+        self._sweep(now)
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        if entry.expires_at <= now:
+            self.pop(key)
+            self.stats["expired"] += 1
+            return default
+        self._entries.move_to_end(key)
+        if self.sliding:
+            self._schedule(key, entry, now + entry.ttl)
+        return entry.value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        now = time.monotonic()
+        self._sweep(now)
+        ttl = self.ttl if ttl is None else ttl
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _TTLStore._Entry(value, ttl)
+        entry.value, entry.ttl = value, ttl
+        self._entries.move_to_end(key)
+        self._schedule(key, entry, now + ttl)
+        while len(self._entries) > self.max_entries:
+            old_key, old = self._entries.popitem(last=False)
+            self._unschedule(old_key, old)
+            self.stats["evicted"] += 1
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return default
+        self._unschedule(key, entry)
+        return entry.value
+
+    def items(self) -> List[Tuple[str, Any]]:
+        self._sweep(time.monotonic())
+        return [(k, e.value) for k, e in self._entries.items()]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._wheel.clear()
+
+    def __getitem__(self, key: str) -> Any:
+        marker = object()
+        value = self.get(key, marker)
+        if value is marker:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.set(key, value)
+
+    def __contains__(self, key: str) -> bool:
+        marker = object()
+        return self.get(key, marker) is not marker
+
+    def __len__(self) -> int:
+        self._sweep(time.monotonic())
+        return len(self._entries)
+
+
+class _SessionRecord:
+    """Compact in-memory session: known fields in slots, anything else in `extra`."""
+
+    __slots__ = ("spotify_tokens", "spotify_oauth_state", "auth_popup", "spotify_user_id", "extra")
+    FIELDS = ("spotify_tokens", "spotify_oauth_state", "auth_popup", "spotify_user_id")
+
+    def __init__(self):
+        for name in self.FIELDS:
+            setattr(self, name, None)
+        self.extra: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "_SessionRecord":
+        record = cls()
+        record.update(data)
+        return record
+
+    def update(self, fields: Dict[str, Any]) -> None:
+        for name, value in fields.items():
+            if name in self.FIELDS:
+                setattr(self, name, value)
+            else:
+                if self.extra is None:
+                    self.extra = {}
+                self.extra[name] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {name: getattr(self, name) for name in self.FIELDS if getattr(self, name) is not None}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+# Session storage: Redis (preferred) with in-memory fallback. The in-memory stores expire
+# entries so crawlers and abandoned logins don't grow a long-running worker without bound;
+# sessions that never completed a login get the shorter SESSION_ANON_TTL.
+SESSION_TTL = float(os.getenv("SESSION_TTL", str(30 * 24 * 3600)))
+SESSION_ANON_TTL = float(os.getenv("SESSION_ANON_TTL", "3600"))
+SESSION_MEMORY_MAX = int(os.getenv("SESSION_MEMORY_MAX", "100000"))
+OAUTH_STATE_TTL = 600
+SESSIONS = _TTLStore(SESSION_TTL, SESSION_MEMORY_MAX, sliding=True)
+OAUTH_STATE_TO_SID = _TTLStore(OAUTH_STATE_TTL, SESSION_MEMORY_MAX)
+
+
+def _session_ttl(data: Dict[str, Any]) -> float:
+    return SESSION_TTL if data.get("spotify_tokens") else SESSION_ANON_TTL
+
+
+class _MemorySessions:
+    """Per-process fallback session store (the default without Redis)."""
+
+    async def call(self, method: str, *args: Any) -> Any:
+        """Run a store method from async code; in-memory operations run inline."""
+        return getattr(self, method)(*args)
+
+    def close(self) -> None:
+        pass
+
+    def get(self, sid: str) -> Optional[Dict[str, Any]]:
+        record = SESSIONS.get(sid)
+        return record.to_dict() if record else None
+
+    def _store(self, sid: str, record: _SessionRecord) -> None:
+        SESSIONS.set(sid, record, ttl=SESSION_TTL if record.spotify_tokens else SESSION_ANON_TTL)
+
+    def replace(self, sid: str, data: Dict[str, Any]) -> None:
+        self._store(sid, _SessionRecord.from_dict(data))
+
+    def update(self, sid: str, fields: Dict[str, Any], oauth_state: Optional[str] = None) -> None:
+        record = SESSIONS.get(sid) or _SessionRecord()
+        record.update(fields)
+        self._store(sid, record)
+        if oauth_state:
+            OAUTH_STATE_TO_SID.set(oauth_state, sid)
+
+    def ensure(self, sid: str) -> None:
+        if sid not in SESSIONS:
+            self._store(sid, _SessionRecord())
+
+    def delete(self, sid: str) -> None:
+        SESSIONS.pop(sid, None)
+
+    def state_sid(self, state: str) -> Optional[str]:
+        return OAUTH_STATE_TO_SID.get(state)
+
+    def items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        return [(sid, record.to_dict()) for sid, record in SESSIONS.items()]
+
+    def state_items(self) -> List[Tuple[str, str]]:
+        return OAUTH_STATE_TO_SID.items()
+
+    def discard_if_unchanged(self, sid: str, data: Dict[str, Any]) -> None:
+        if self.get(sid) == data:
+            SESSIONS.pop(sid, None)
+
+    def discard_state(self, state: str) -> None:
+        OAUTH_STATE_TO_SID.pop(state, None)
+
+
+class _SQLiteSessions:
+    """Sessions in a local SQLite database shared by every worker process on the host.
+
+    The database runs in WAL mode, so reads never wait on another process's login or token
+    refresh and cost one indexed lookup. Writes are small single-row transactions. Async
+    code goes through `call()`, which runs them on one thread per process, so waiting
+    out another worker's write lock never blocks the event loop.
+    """
+
+    SWEEP_INTERVAL = 60
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._pid = 0
+        self._next_sweep = 0.0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid = 0
+
+    async def call(self, method: str, *args: Any) -> Any:
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-db")
+            self._executor_pid = os.getpid()
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(getattr(self, method), *args)
+        )
+
+    def close(self) -> None:
+        if self._executor is not None and self._executor_pid == os.getpid():
+            self._executor.shutdown(wait=False)
+        self._executor = None
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per process; never reuse one inherited across a fork (gunicorn --preload)
+        if self._db is None or self._pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=2.0, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints; no fsync per commit
+            db.execute("CREATE TABLE IF NOT EXISTS sessions (sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)")
+            db.execute("CREATE TABLE IF NOT EXISTS oauth_states (state TEXT PRIMARY KEY, sid TEXT NOT NULL, expires_at REAL NOT NULL)")
+            self._db, self._pid = db, os.getpid()
+        return self._db
+
+    def _sweep(self, db: sqlite3.Connection, now: float) -> None:
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.SWEEP_INTERVAL
+        db.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+        db.execute("DELETE FROM oauth_states WHERE expires_at <= ?", (now,))
+
+    def _put(self, db: sqlite3.Connection, sid: str, data: Dict[str, Any], now: float) -> None:
+        db.execute(
+            "INSERT OR REPLACE INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)",
+            (sid, _json_text(data), now + _session_ttl(data)),
+        )
+
+    def get(self, sid: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT data FROM sessions WHERE sid = ? AND expires_at > ?", (sid, time.time())
+        ).fetchone()
+        return _json_loads(row[0]) if row else None
+
+    def replace(self, sid: str, data: Dict[str, Any]) -> None:
+        db, now = self._conn(), time.time()
+        self._put(db, sid, data, now)
+        self._sweep(db, now)
+
+    def update(self, sid: str, fields: Dict[str, Any], oauth_state: Optional[str] = None) -> None:
+        db, now = self._conn(), time.time()
+        # IMMEDIATE takes the write lock up front so concurrent updates from other
+        # workers can't interleave between the read and the write
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            data = self.get(sid) or {}
+            data.update(fields)
+            self._put(db, sid, data, now)
+            if oauth_state:
+                db.execute(
+                    "INSERT OR REPLACE INTO oauth_states (state, sid, expires_at) VALUES (?, ?, ?)",
+                    (oauth_state, sid, now + OAUTH_STATE_TTL),
+                )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self._sweep(db, now)
+
+    def ensure(self, sid: str) -> None:
+        db, now = self._conn(), time.time()
+        # Create, or reset a row that expired but hasn't been swept yet
+        db.execute(
+            "INSERT INTO sessions (sid, data, expires_at) VALUES (?, '{}', ?) "
+            "ON CONFLICT(sid) DO UPDATE SET data = '{}', expires_at = excluded.expires_at "
+            "WHERE sessions.expires_at <= ?",
+            (sid, now + SESSION_ANON_TTL, now),
+        )
+
+    def delete(self, sid: str) -> None:
+        self._conn().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def state_sid(self, state: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT sid FROM oauth_states WHERE state = ? AND expires_at > ?", (state, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        rows = self._conn().execute("SELECT sid, data FROM sessions WHERE expires_at > ?", (time.time(),))
+        return [(sid, _json_loads(data)) for sid, data in rows]
+
+    def state_items(self) -> List[Tuple[str, str]]:
+        return list(self._conn().execute("SELECT state, sid FROM oauth_states WHERE expires_at > ?", (time.time(),)))
+
+    def discard_if_unchanged(self, sid: str, data: Dict[str, Any]) -> None:
+        self._conn().execute("DELETE FROM sessions WHERE sid = ? AND data = ?", (sid, _json_text(data)))
+
+    def discard_state(self, state: str) -> None:
+        self._conn().execute("DELETE FROM oauth_states WHERE state = ?", (state,))
+
+
+# Without Redis, SESSION_DB_PATH points every worker on the host at one SQLite session
+# database (e.g. /var/lib/vinyl/sessions.db); otherwise sessions stay in process memory.
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH")
+LOCAL_SESSIONS = _SQLiteSessions(SESSION_DB_PATH) if SESSION_DB_PATH else _MemorySessions()
 REDIS_URL = os.getenv("REDIS_URL")
 REDIS: Optional["redis.Redis"] = None
+# Pub/sub gets its own connection without a read timeout: an idle subscription blocks
+# in a read for as long as nobody publishes
+REDIS_PUBSUB: Optional["redis.Redis"] = None
+
+# Redis circuit breaker: after REDIS_BREAKER_THRESHOLD connection failures within
+# REDIS_BREAKER_WINDOW seconds, Redis is skipped entirely (in-memory fallback) until a
+# background probe sees it answer PING again.
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", "0.5"))
+REDIS_BREAKER_THRESHOLD = int(os.getenv("REDIS_BREAKER_THRESHOLD", "3"))
+REDIS_BREAKER_WINDOW = float(os.getenv("REDIS_BREAKER_WINDOW", "10"))
+REDIS_PROBE_INTERVAL = float(os.getenv("REDIS_PROBE_INTERVAL", "2"))
+
+
+class _CircuitBreaker:
+    """closed -> open on repeated failures; open -> half_open when a probe succeeds;
+    half_open -> closed once recovery work is done. Only `closed` lets calls through."""
+
+    def __init__(self, threshold: int, window: float):
+        self.threshold = threshold
+        self.window = window
+        self.state = "closed"
+        self.changed_at = time.time()
+        self._failures = 0
+        self._first_failure = 0.0
+        self.stats = {"failures": 0, "opens": 0, "short_circuits": 0}
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        self.stats["short_circuits"] += 1
+        return False
+
+    def record_failure(self) -> bool:
+        """Count a failure; returns True if this one opened the breaker."""
+        self.stats["failures"] += 1
+        if self.state != "closed":
+            return False
+        now = time.monotonic()
+        if not self._failures or now - self._first_failure > self.window:
+            self._failures, self._first_failure = 0, now
+        self._failures += 1
+        if self._failures >= self.threshold:
+            self.trip()
+            return True
+        return False
+
+    def trip(self) -> None:
+        self._set("open")
+        self.stats["opens"] += 1
+
+    def half_open(self) -> None:
+        self._set("half_open")
+
+    def close(self) -> None:
+        self._failures = 0
+        self._set("closed")
+
+    def _set(self, state: str) -> None:
+        self.state = state
+        self.changed_at = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"state": self.state, "since": int(self.changed_at), **self.stats}
+
+
+REDIS_BREAKER = _CircuitBreaker(REDIS_BREAKER_THRESHOLD, REDIS_BREAKER_WINDOW)
+_REDIS_PROBE: Optional[asyncio.Task] = None
+
+
+def _redis() -> Optional["redis.Redis"]:
+    """The Redis client, or None when Redis is not configured or the breaker is open."""
+    if REDIS is None or not REDIS_BREAKER.allow():
+        return None
+    return REDIS
+
+
+def _redis_failed(exc: BaseException) -> None:
+    """Feed connection-level Redis errors to the breaker (command errors don't count)."""
+    if redis is not None and isinstance(exc, redis.ResponseError):
+        return
+    if REDIS_BREAKER.record_failure():
+        _start_redis_probe()
+
+
+def _start_redis_probe() -> None:
+    global _REDIS_PROBE
+    if _REDIS_PROBE is None or _REDIS_PROBE.done():
+        _REDIS_PROBE = asyncio.create_task(_probe_redis())
+
+
+async def _probe_redis() -> None:
+    """PING Redis until it answers, copy sessions created during the outage back, then close."""
+    while REDIS is not None and REDIS_BREAKER.state != "closed":
+        await asyncio.sleep(REDIS_PROBE_INTERVAL)
+        try:
+            await REDIS.ping()
+        except Exception:
+            continue
+        REDIS_BREAKER.half_open()
+        try:
+            await _write_back_local_sessions()
+        except Exception:
+            REDIS_BREAKER.trip()
+            continue
+        # Anything cached locally may predate writes made by other workers meanwhile
+        _SESSION_CACHE.clear()
+        REDIS_BREAKER.close()
+
+
+async def _write_back_local_sessions() -> None:
+    """Move sessions and OAuth states stored locally during an outage into Redis.
+
+    Fields written locally are newer than what Redis holds, so they are merged over it.
+    """
+    # Requests keep writing locally until the breaker closes, so drain until empty
+    while True:
+        sessions, states = await LOCAL_SESSIONS.call("items"), await LOCAL_SESSIONS.call("state_items")
+        if not sessions and not states:
+            return
+        for sid, snapshot in sessions:
+            await _write_session(sid, snapshot)
+            await LOCAL_SESSIONS.call("discard_if_unchanged", sid, snapshot)
+        for state, sid in states:
+            await REDIS.set(f"oauth_state:{state}", sid, ex=OAUTH_STATE_TTL)
+            await LOCAL_SESSIONS.call("discard_state", state)
+
 
 SPOTIFY_TOKEN_URL = "https://accounts.spotify.com/api/token"
 SPOTIFY_API_BASE = "https://api.spotify.com/v1"
 
-app = FastAPI(title="Vinyl Records API")
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    """Open upstream clients, Redis and the token refresher; close them in reverse on shutdown.
+    Connection pre-warming runs in the background so the first request isn't held up.
+    """
+    _open_http_clients()
+    await _init_redis()
+    _start_token_refresher()
+    warmup = asyncio.create_task(_warm_http_clients()) if HTTP_PREWARM else None
+    disk_index = asyncio.create_task(IMAGE_CACHE.load_disk_index())
+    try:
+        yield
+    finally:
+        disk_index.cancel()
+        if warmup is not None:
+            warmup.cancel()
+        _stop_token_refresher()
+        await _close_redis()
+        _close_image_pool()
+        LOCAL_SESSIONS.close()
+        await _close_http_clients()
+
+
+app = FastAPI(title="Vinyl Records API", default_response_class=FastJSONResponse, lifespan=_lifespan)
 
 # CORS: allow frontend origin from env for cross-origin cookie flows
 FRONTEND_URL = os.getenv("FRONTEND_URL", "https://vinyl-records-six.vercel.app")
@@ -38,6 +852,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(_MetricsMiddleware)
+app.add_middleware(_TracingMiddleware)
 
 def _cookie_settings(request: Request) -> Dict[str, Any]:
     """Return env-aware cookie flags for session cookies.
@@ -57,68 +873,206 @@ def _cookie_settings(request: Request) -> Dict[str, Any]:
     }
 
 
-async def _get_session(sid: str) -> Dict[str, Any]:
-    if REDIS:
+# Sessions live in Redis as hashes (one JSON-encoded value per field) so single fields
+# can be updated with HSET. Each worker keeps decoded sessions for a few seconds;
+# writes publish the sid so other workers drop their copy.
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "5"))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_INVALIDATION_CHANNEL = "session:invalidate"
+# "<worker> <cache name> <key>" for upstream cache entries made stale by a player command
+UPSTREAM_INVALIDATION_CHANNEL = "upstream:invalidate"
+_WORKER_ID = secrets.token_hex(6)
+_SESSION_CACHE: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+# Marker field so an empty session still exists as a Redis hash
+_SESSION_MARKER = "_created"
+_SESSION_LISTENER: Optional[asyncio.Task] = None
+
+
+def _session_cache_get(sid: str) -> Optional[Dict[str, Any]]:
+    entry = _SESSION_CACHE.get(sid)
+    if entry is None:
+        return None
+    if time.monotonic() >= entry[0]:
+        _SESSION_CACHE.pop(sid, None)
+        return None
+    return dict(entry[1])  # callers mutate the dict they get back
+
+
+def _session_cache_put(sid: str, data: Dict[str, Any]) -> None:
+    _SESSION_CACHE[sid] = (time.monotonic() + SESSION_CACHE_TTL, dict(data))
+    _SESSION_CACHE.move_to_end(sid)
+    while len(_SESSION_CACHE) > SESSION_CACHE_SIZE:
+        _SESSION_CACHE.popitem(last=False)
+
+
+def _decode_session(raw: Dict[str, str]) -> Dict[str, Any]:
+    return {k: _json_loads(v) for k, v in raw.items() if k != _SESSION_MARKER}
+
+
+def _encode_session(data: Dict[str, Any]) -> Dict[str, str]:
+    return {k: _json_text(v) for k, v in data.items()}
+
+
+async def _read_session_hash(sid: str) -> Dict[str, Any]:
+    key = f"session:{sid}"
+    try:
+        raw = await REDIS.hgetall(key)
+    except redis.ResponseError:
+        # Pre-hash format: a single JSON string. Migrate it in place.
+        val = await REDIS.get(key)
+        data = _json_loads(val) if val else {}
+        await _write_session(sid, data, replace=True)
+        return data
+    return _decode_session(raw)
+
+
+async def _write_session(sid: str, fields: Dict[str, Any], replace: bool = False, oauth_state: Optional[str] = None) -> None:
+    """Write session fields (or the whole session) to Redis in one pipeline and notify peers."""
+    key = f"session:{sid}"
+    pipe = REDIS.pipeline(transaction=True)
+    if replace:
+        pipe.delete(key)
+    pipe.hset(key, mapping=dict(_encode_session(fields), **{_SESSION_MARKER: str(int(time.time()))}))
+    if oauth_state:
+        # Keep short TTL for OAuth state mapping
+        pipe.set(f"oauth_state:{oauth_state}", sid, ex=OAUTH_STATE_TTL)
+    pipe.publish(SESSION_INVALIDATION_CHANNEL, f"{_WORKER_ID}:{sid}")
+    await pipe.execute()
+
+
+@_traced("session")
+async def _get_session(sid: str, fresh: bool = False) -> Dict[str, Any]:
+    """Return the decoded session (a copy). `fresh=True` bypasses this worker's read cache."""
+    if _redis():
+        if not fresh:
+            cached = _session_cache_get(sid)
+            if cached is not None:
+                return cached
+        started = time.perf_counter()
         try:
-            val = await REDIS.get(f"session:{sid}")
-            return json.loads(val) if val else {}
-        except Exception:
-            pass
-    return SESSIONS.get(sid, {})
+            data = await _read_session_hash(sid)
+            _observe_redis("get_session", started)
+            _session_cache_put(sid, data)
+            return data
+        except Exception as exc:
+            _redis_failed(exc)
+    _local_fallback("get_session")
+    return await LOCAL_SESSIONS.call("get", sid) or {}
 
 
 async def _set_session(sid: str, data: Dict[str, Any]) -> None:
-    if REDIS:
+    """Replace the whole session."""
+    if _redis():
+        started = time.perf_counter()
         try:
-            await REDIS.set(f"session:{sid}", json.dumps(data))
+            await _write_session(sid, data, replace=True)
+            _observe_redis("set_session", started)
+            _session_cache_put(sid, data)
             return
-        except Exception:
-            pass
-    SESSIONS[sid] = data
+        except Exception as exc:
+            _SESSION_CACHE.pop(sid, None)
+            _redis_failed(exc)
+    _local_fallback("set_session")
+    await LOCAL_SESSIONS.call("replace", sid, data)
+
+
+async def _update_session(sid: str, fields: Dict[str, Any], oauth_state: Optional[str] = None) -> None:
+    """Update only `fields` of a session (HSET), optionally mapping `oauth_state` to it
+    in the same Redis pipeline."""
+    if _redis():
+        started = time.perf_counter()
+        try:
+            await _write_session(sid, fields, oauth_state=oauth_state)
+            _observe_redis("update_session", started)
+            cached = _session_cache_get(sid)
+            if cached is not None:
+                cached.update(fields)
+                _session_cache_put(sid, cached)
+            return
+        except Exception as exc:
+            _SESSION_CACHE.pop(sid, None)
+            _redis_failed(exc)
+    _local_fallback("update_session")
+    await LOCAL_SESSIONS.call("update", sid, fields, oauth_state)
 
 
 async def _ensure_session(sid: str) -> None:
-    if REDIS:
+    if _redis():
+        if _session_cache_get(sid) is not None:
+            return
+        started = time.perf_counter()
         try:
             exists = await REDIS.exists(f"session:{sid}")
             if not exists:
-                await REDIS.set(f"session:{sid}", json.dumps({}))
+                await REDIS.hset(f"session:{sid}", _SESSION_MARKER, str(int(time.time())))
+            _observe_redis("ensure_session", started)
             return
-        except Exception:
-            pass
-    if sid not in SESSIONS:
-        SESSIONS[sid] = {}
+        except Exception as exc:
+            _redis_failed(exc)
+    _local_fallback("ensure_session")
+    await LOCAL_SESSIONS.call("ensure", sid)
 
 
 async def _delete_session(sid: str) -> None:
-    if REDIS:
+    _SESSION_CACHE.pop(sid, None)
+    if _redis():
+        started = time.perf_counter()
         try:
-            await REDIS.delete(f"session:{sid}")
+            pipe = REDIS.pipeline(transaction=True)
+            pipe.delete(f"session:{sid}")
+            pipe.publish(SESSION_INVALIDATION_CHANNEL, f"{_WORKER_ID}:{sid}")
+            await pipe.execute()
+            _observe_redis("delete_session", started)
             return
-        except Exception:
-            pass
-    SESSIONS.pop(sid, None)
-
-
-async def _set_state_map(state: str, sid: str) -> None:
-    if REDIS:
+        except Exception as exc:
+            _redis_failed(exc)
+    _local_fallback("delete_session")
+    await LOCAL_SESSIONS.call("delete", sid)
+
+
+async def _session_invalidation_listener() -> None:
+    """Drop locally cached sessions and player state that other workers changed."""
+    while True:
+        if REDIS_BREAKER.state != "closed":
+            await asyncio.sleep(REDIS_PROBE_INTERVAL)
+            continue
         try:
-            # Keep short TTL for OAuth state mapping
-            await REDIS.set(f"oauth_state:{state}", sid, ex=600)
-            return
-        except Exception:
-            pass
-    OAUTH_STATE_TO_SID[state] = sid
+            pubsub = (REDIS_PUBSUB or REDIS).pubsub()
+            await pubsub.subscribe(SESSION_INVALIDATION_CHANNEL, UPSTREAM_INVALIDATION_CHANNEL)
+            try:
+                async for msg in pubsub.listen():
+                    if msg.get("type") != "message":
+                        continue
+                    if msg.get("channel") == UPSTREAM_INVALIDATION_CHANNEL:
+                        _drop_upstream_entry(str(msg.get("data") or ""))
+                        continue
+                    origin, _, sid = str(msg.get("data") or "").partition(":")
+                    if origin != _WORKER_ID:
+                        _SESSION_CACHE.pop(sid, None)
+            finally:
+                await pubsub.aclose()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            # A read timing out on a quiet channel says nothing about Redis health
+            if not isinstance(exc, (asyncio.TimeoutError, redis.TimeoutError)):
+                _redis_failed(exc)
+        # Invalidations may have been missed while disconnected
+        _SESSION_CACHE.clear()
+        await asyncio.sleep(1)
 
 
 async def _get_state_sid(state: str) -> Optional[str]:
-    if REDIS:
+    if _redis():
+        started = time.perf_counter()
         try:
             val = await REDIS.get(f"oauth_state:{state}")
+            _observe_redis("get_state", started)
             return val if val else None
-        except Exception:
-            pass
-    return OAUTH_STATE_TO_SID.get(state)
+        except Exception as exc:
+            _redis_failed(exc)
+    _local_fallback("get_state")
+    return await LOCAL_SESSIONS.call("state_sid", state)
 
 
 async def _get_or_create_session_id(request: Request, response: Response) -> str:
@@ -139,32 +1093,280 @@ def _get_spotify_env() -> Tuple[Optional[str], Optional[str], str]:
 
 async def _ensure_access_token(request: Request) -> Tuple[str, str]:
     """Return (sid, access_token) or raise 401 if not authenticated."""
+    # Sub-requests of /api/batch carry the auth resolved once for the whole batch
+    pre = request.scope.get("vinyl.auth")
+    if pre:
+        return pre
     sid = request.cookies.get("session_id")
-    session = await _get_session(sid or "") if sid else {}
-    if not sid or not session or "spotify_tokens" not in session:
+    if not sid:
+        raise HTTPException(status_code=401, detail="Not authenticated with Spotify")
+    return sid, await _access_token_for_sid(sid)
+
+
+@_traced("auth")
+async def _access_token_for_sid(sid: str) -> str:
+    """Return a valid access token for a session id, refreshing it if needed."""
+    session = await _get_session(sid)
+    if not session or "spotify_tokens" not in session:
         raise HTTPException(status_code=401, detail="Not authenticated with Spotify")
 
-    tokens = session.get("spotify_tokens", {})
+    access_token = _fresh_access_token(session)
+    if access_token:
+        TOKEN_REFRESHER.touch(sid, session["spotify_tokens"].get("expires_at", 0))
+        return access_token
+
+    # refresh (coalesced with any other request for this session)
+    return await _refresh_access_token(sid)
+
+
+# In-flight token refreshes keyed by session id (single-flight within this worker)
+_TOKEN_REFRESHES: Dict[str, "asyncio.Task[str]"] = {}
+# Upper bound for how long a worker may hold the cross-worker refresh lock
+TOKEN_REFRESH_LOCK_TTL = 10
+# Compare-and-delete so a worker never releases a lock another worker now holds
+_RELEASE_LOCK_LUA = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+
+async def _refresh_access_token(sid: str, margin: float = 15) -> str:
+    """Refresh the session's Spotify token, coalescing concurrent callers.
+    - Callers in this worker share one in-flight refresh task per session.
+    - Across workers a short Redis lock elects one refresher; the rest wait for
+      the new token to land in the shared session.
+    """
+    return await _single_flight(_TOKEN_REFRESHES, sid, lambda: _do_refresh_access_token(sid, margin))
+
+
+def _start_single_flight(inflight: Dict[str, "asyncio.Task"], key: str, factory) -> "asyncio.Task":
+    """Return the in-flight task for `key`, starting `factory()` if none is running."""
+    task = inflight.get(key)
+    if task is None:
+        task = inflight[key] = asyncio.ensure_future(factory())
+
+        def _done(t: "asyncio.Task") -> None:
+            if inflight.get(key) is t:
+                inflight.pop(key, None)
+            if not t.cancelled():
+                t.exception()  # mark retrieved even if every waiter went away
+
+        task.add_done_callback(_done)
+    return task
+
+
+async def _single_flight(inflight: Dict[str, "asyncio.Task"], key: str, factory):
+    """Await the in-flight task for `key`, starting `factory()` if none is running.
+    Waiters are shielded so one cancelled caller doesn't cancel the shared work.
+    """
+    return await asyncio.shield(_start_single_flight(inflight, key, factory))
+
+
+class _TieredCache:
+    """Size-bounded LRU/TTL cache with an optional Redis tier shared across workers.
+    - Entries are fresh for `ttl` seconds, then served stale for up to `stale_ttl`
+      more while a single background refresh runs (stale-while-revalidate).
+    - Concurrent misses for the same key share one load (single-flight).
+    - Values must be JSON-serializable when the Redis tier is enabled.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float, stale_ttl: float = 0.0, shared: bool = True):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.shared = shared
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._loads: Dict[str, "asyncio.Task"] = {}
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "redis_hits": 0}
+
+    def count(self, result: str) -> None:
+        self.stats[result] = self.stats.get(result, 0) + 1
+        CACHE_EVENTS.labels(self.name, result).inc()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _redis_key(self, key: str) -> str:
+        return f"cache:{self.name}:{key}"
+
+    def peek(self, key: str) -> Optional[Tuple[float, Any]]:
+        """Return (stored_at, value) from the local tier without touching Redis."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry[0] >= self.ttl + self.stale_ttl:
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put_local(self, key: str, stored_at: float, value: Any) -> None:
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        """Return (stored_at, value) from the local tier, falling back to Redis."""
+        entry = self.peek(key)
+        if entry is not None or not (self.shared and _redis()):
+            return entry
+        try:
+            raw = await REDIS.get(self._redis_key(key))
+        except Exception as exc:
+            _redis_failed(exc)
+            return None
+        return self._from_redis(key, raw)
+
+    def _from_redis(self, key: str, raw: Optional[str]) -> Optional[Tuple[float, Any]]:
+        """Decode a Redis value into (stored_at, value) and copy it into the local tier."""
+        if not raw:
+            return None
+        try:
+            data = _json_loads(raw)
+            entry = (float(data["t"]), data["v"])
+        except Exception:
+            return None
+        if time.time() - entry[0] >= self.ttl + self.stale_ttl:
+            return None
+        self.count("redis_hits")
+        self._put_local(key, *entry)
+        return entry
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Tuple[float, Any]]:
+        """Like `get` for many keys: the local tier first, then one MGET for the rest."""
+        found: Dict[str, Tuple[float, Any]] = {}
+        missing: List[str] = []
+        for key in keys:
+            entry = self.peek(key)
+            if entry is not None:
+                found[key] = entry
+            else:
+                missing.append(key)
+        if not missing or not (self.shared and _redis()):
+            return found
+        try:
+            raws = await REDIS.mget([self._redis_key(key) for key in missing])
+        except Exception as exc:
+            _redis_failed(exc)
+            return found
+        for key, raw in zip(missing, raws):
+            entry = self._from_redis(key, raw)
+            if entry is not None:
+                found[key] = entry
+        return found
+
+    async def set(self, key: str, value: Any, stored_at: Optional[float] = None) -> None:
+        await self.set_many({key: value}, stored_at)
+
+    async def set_many(self, values: Dict[str, Any], stored_at: Optional[float] = None) -> None:
+        """Store several values; the Redis writes go out in one pipeline."""
+        stored_at = time.time() if stored_at is None else stored_at
+        for key, value in values.items():
+            self._put_local(key, stored_at, value)
+        if values and self.shared and _redis():
+            try:
+                ttl = max(1, int(self.ttl + self.stale_ttl))
+                pipe = REDIS.pipeline(transaction=False)
+                for key, value in values.items():
+                    pipe.set(self._redis_key(key), _json_text({"t": stored_at, "v": value}), ex=ttl)
+                await pipe.execute()
+            except Exception as exc:
+                _redis_failed(exc)
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+        if self.shared and _redis():
+            try:
+                await REDIS.delete(self._redis_key(key))
+            except Exception as exc:
+                _redis_failed(exc)
+
+    async def _load(self, key: str, loader) -> Any:
+        value = await loader()
+        await self.set(key, value)
+        return value
+
+    async def get_or_load(self, key: str, loader) -> Any:
+        """Return the cached value for `key`, calling `loader()` on a miss.
+        Exceptions from `loader` propagate and nothing is cached.
+        """
+        entry = await self.get(key)
+        if entry is not None:
+            age = time.time() - entry[0]
+            if age < self.ttl:
+                self.count("hits")
+                return entry[1]
+            self.count("stale_hits")
+            _start_single_flight(self._loads, key, lambda: self._load(key, loader))
+            return entry[1]
+        self.count("misses")
+        return await _single_flight(self._loads, key, lambda: self._load(key, loader))
+
+
+def _fresh_access_token(session: Dict[str, Any], margin: float = 15) -> Optional[str]:
+    """The session's access token if it stays valid for at least `margin` seconds."""
+    tokens = session.get("spotify_tokens") or {}
     access_token = tokens.get("access_token")
-    expires_at = tokens.get("expires_at", 0)
-    refresh_token = tokens.get("refresh_token")
+    if access_token and time.time() < tokens.get("expires_at", 0) - margin:
+        return access_token
+    return None
+
+
+async def _wait_for_peer_refresh(sid: str, lock_key: str) -> Optional[str]:
+    """Poll the shared session while another worker holds the refresh lock."""
+    deadline = time.time() + TOKEN_REFRESH_LOCK_TTL
+    while time.time() < deadline:
+        await asyncio.sleep(0.1)
+        token = _fresh_access_token(await _get_session(sid, fresh=True))
+        if token:
+            return token
+        if not _redis():
+            return None
+        try:
+            if not await REDIS.exists(lock_key):
+                return None  # holder gave up without refreshing
+        except Exception as exc:
+            _redis_failed(exc)
+            return None
+    return None
+
+
+async def _do_refresh_access_token(sid: str, margin: float = 15) -> str:
+    lock_key = f"lock:token_refresh:{sid}"
+    lock_id: Optional[str] = None
+    if _redis():
+        try:
+            lock_id = secrets.token_hex(8)
+            if not await REDIS.set(lock_key, lock_id, nx=True, ex=TOKEN_REFRESH_LOCK_TTL):
+                lock_id = None
+                token = await _wait_for_peer_refresh(sid, lock_key)
+                if token:
+                    return token
+        except Exception as exc:
+            lock_id = None
+            _redis_failed(exc)
 
-    if access_token and time.time() < expires_at - 15:
-        return sid, access_token
+    try:
+        # Re-read: a peer worker may have refreshed while we were queued
+        session = await _get_session(sid, fresh=True)
+        token = _fresh_access_token(session, margin)
+        if token:
+            return token
 
-    # refresh
-    client_id, client_secret, _ = _get_spotify_env()
-    if not client_id or not client_secret or not refresh_token:
-        raise HTTPException(status_code=401, detail="Missing credentials to refresh token")
+        client_id, client_secret, _ = _get_spotify_env()
+        refresh_token = (session.get("spotify_tokens") or {}).get("refresh_token")
+        if not client_id or not client_secret or not refresh_token:
+            raise HTTPException(status_code=401, detail="Missing credentials to refresh token")
 
-    async with httpx.AsyncClient(timeout=15) as client:
         data = {
             "grant_type": "refresh_token",
             "refresh_token": refresh_token,
             "client_id": client_id,
             "client_secret": client_secret,
         }
-        resp = await client.post(SPOTIFY_TOKEN_URL, data=data)
+        try:
+            resp = await _accounts_token_post(data)
+        except httpx.HTTPError:
+            raise HTTPException(status_code=401, detail="Failed to refresh Spotify token")
         if resp.status_code != 200:
             raise HTTPException(status_code=401, detail="Failed to refresh Spotify token")
         body = resp.json()
@@ -172,19 +1374,223 @@ async def _ensure_access_token(request: Request) -> Tuple[str, str]:
         expires_in = body.get("expires_in", 3600)
         # Spotify may or may not return a new refresh_token; keep old if absent
         new_refresh = body.get("refresh_token", refresh_token)
-        # Save refreshed tokens
-        session["spotify_tokens"] = {
+        # Save refreshed tokens (only this field; other session fields may be changing)
+        expires_at = time.time() + int(expires_in) - 60
+        await _update_session(sid, {"spotify_tokens": {
             "access_token": new_access,
             "refresh_token": new_refresh,
-            "expires_at": time.time() + int(expires_in) - 60,
-        }
-        await _set_session(sid, session)
-        return sid, new_access
+            "expires_at": expires_at,
+        }})
+        TOKEN_REFRESHER.schedule(sid, expires_at)
+        return new_access
+    finally:
+        if lock_id:
+            try:
+                await REDIS.eval(_RELEASE_LOCK_LUA, 1, lock_key, lock_id)
+            except Exception as exc:
+                _redis_failed(exc)
+
+
+# Proactive refresh: tokens of recently active sessions are refreshed in the background
+# TOKEN_REFRESH_AHEAD seconds (minus a per-session jitter) before they expire, so requests
+# don't wait on accounts.spotify.com. With Redis the queue is a sorted set shared by all
+# workers; otherwise each worker keeps a heap.
+TOKEN_REFRESH_AHEAD = float(os.getenv("TOKEN_REFRESH_AHEAD", "300"))
+TOKEN_REFRESH_JITTER = float(os.getenv("TOKEN_REFRESH_JITTER", "60"))
+TOKEN_REFRESH_CONCURRENCY = int(os.getenv("TOKEN_REFRESH_CONCURRENCY", "4"))
+# Sessions without requests for this long are left to refresh on demand
+TOKEN_REFRESH_IDLE = float(os.getenv("TOKEN_REFRESH_IDLE", "3600"))
+TOKEN_REFRESH_TICK = 1.0
+
+
+class _TokenRefreshScheduler:
+    """Delay queue of (due, sid) for proactive token refreshes.
+    - `touch()` runs on the request path: O(1), no awaits; Redis writes happen in the
+      background and at most once a minute per session unless the due time changed.
+    - Each tick claims due sessions (with Redis, ZREM decides which worker owns one)
+      and refreshes up to TOKEN_REFRESH_CONCURRENCY of them at a time.
+    """
+
+    DUE_KEY = "token_refresh:due"
+    ACTIVE_KEY = "token_refresh:active"
+    REDIS_WRITE_INTERVAL = 60
+
+    def __init__(self):
+        self._heap: List[Tuple[float, str]] = []
+        self._due: Dict[str, float] = {}  # local queue membership (heap entries are lazily deleted)
+        # sid -> (last seen, due, last Redis write), oldest activity first
+        self._seen: "OrderedDict[str, Tuple[float, float, float]]" = OrderedDict()
+        self._running: Dict[str, "asyncio.Task"] = {}
+        self.stats = {"refreshed": 0, "failed": 0, "idle": 0}
+
+    @staticmethod
+    def _due_time(sid: str, expires_at: float) -> float:
+        # Stable per-session jitter spreads refreshes out and keeps the due time idempotent
+        jitter = int(hashlib.sha1(sid.encode()).hexdigest()[:8], 16) / 0xFFFFFFFF * TOKEN_REFRESH_JITTER
+        return expires_at - TOKEN_REFRESH_AHEAD - jitter
+
+    def touch(self, sid: str, expires_at: float) -> None:
+        """Record request activity for `sid` and make sure its refresh is queued."""
+        self._note(sid, expires_at, active=True)
+
+    def schedule(self, sid: str, expires_at: float) -> None:
+        """Queue the next refresh after a token change (not itself activity)."""
+        self._note(sid, expires_at, active=False)
+
+    def _note(self, sid: str, expires_at: float, active: bool) -> None:
+        now = time.time()
+        due = self._due_time(sid, expires_at)
+        prev = self._seen.pop(sid, None)
+        last_seen = now if active else prev[0] if prev is not None else 0.0
+        written = prev[2] if prev is not None and prev[1] == due else 0.0
+        if _redis():
+            if now - written >= self.REDIS_WRITE_INTERVAL:
+                written = now
+                asyncio.ensure_future(self._write_redis(sid, due, last_seen))
+        elif self._due.get(sid) != due:
+            self._due[sid] = due
+            heapq.heappush(self._heap, (due, sid))
+        self._seen[sid] = (last_seen, due, written)
+
+    async def _write_redis(self, sid: str, due: float, last_seen: float) -> None:
+        try:
+            pipe = REDIS.pipeline(transaction=False)
+            pipe.zadd(self.DUE_KEY, {sid: due})
+            pipe.zadd(self.ACTIVE_KEY, {sid: last_seen}, gt=True)
+            await pipe.execute()
+        except Exception as exc:
+            _redis_failed(exc)
+
+    async def _claim_due(self, limit: int) -> List[str]:
+        now = time.time()
+        if _redis():
+            try:
+                sids = await REDIS.zrangebyscore(self.DUE_KEY, "-inf", now, start=0, num=limit)
+                # Whichever worker's ZREM removes the entry owns the refresh
+                return [sid for sid in sids if await REDIS.zrem(self.DUE_KEY, sid)]
+            except Exception as exc:
+                _redis_failed(exc)
+                return []
+        claimed = []
+        while self._heap and self._heap[0][0] <= now and len(claimed) < limit:
+            due, sid = heapq.heappop(self._heap)
+            if self._due.get(sid) == due:
+                del self._due[sid]
+                claimed.append(sid)
+        return claimed
+
+    async def _is_active(self, sid: str) -> bool:
+        cutoff = time.time() - TOKEN_REFRESH_IDLE
+        seen = self._seen.get(sid)
+        if seen is not None and seen[0] >= cutoff:
+            return True
+        if _redis():
+            try:
+                score = await REDIS.zscore(self.ACTIVE_KEY, sid)
+                return score is not None and score >= cutoff
+            except Exception as exc:
+                _redis_failed(exc)
+        return False
+
+    async def _refresh(self, sid: str) -> None:
+        try:
+            if not await self._is_active(sid):
+                self.stats["idle"] += 1
+                return
+            # Wider than the ahead window, so the token counts as due for refresh
+            await _refresh_access_token(sid, margin=TOKEN_REFRESH_AHEAD + TOKEN_REFRESH_JITTER + 2 * TOKEN_REFRESH_TICK)
+            self.stats["refreshed"] += 1
+        except Exception:
+            # The request path still refreshes on demand
+            self.stats["failed"] += 1
+        finally:
+            self._running.pop(sid, None)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - TOKEN_REFRESH_IDLE
+        while self._seen:
+            sid, (last_seen, _, _) = next(iter(self._seen.items()))
+            if last_seen >= cutoff:
+                break
+            self._seen.popitem(last=False)
+
+    async def tick(self) -> List["asyncio.Task"]:
+        """Start refreshes for due sessions; returns the tasks started."""
+        self._prune()
+        free = TOKEN_REFRESH_CONCURRENCY - len(self._running)
+        if free <= 0:
+            return []
+        started = []
+        for sid in await self._claim_due(free):
+            if sid not in self._running:
+                self._running[sid] = asyncio.ensure_future(self._refresh(sid))
+                started.append(self._running[sid])
+        return started
+
+    async def run(self) -> None:
+        last_cleanup = 0.0
+        while True:
+            await asyncio.sleep(TOKEN_REFRESH_TICK)
+            try:
+                await self.tick()
+                if _redis() and time.time() - last_cleanup > self.REDIS_WRITE_INTERVAL:
+                    last_cleanup = time.time()
+                    await REDIS.zremrangebyscore(self.ACTIVE_KEY, "-inf", time.time() - TOKEN_REFRESH_IDLE)
+            except Exception as exc:
+                _redis_failed(exc)
+
+
+TOKEN_REFRESHER = _TokenRefreshScheduler()
+_TOKEN_REFRESHER_TASK: Optional[asyncio.Task] = None
+
+
+def _start_token_refresher():
+    global _TOKEN_REFRESHER_TASK
+    _TOKEN_REFRESHER_TASK = asyncio.create_task(TOKEN_REFRESHER.run())
+
+
+def _stop_token_refresher():
+    if _TOKEN_REFRESHER_TASK:
+        _TOKEN_REFRESHER_TASK.cancel()
 
 
 @app.get("/api/health")
 async def health():
-    return {"status": "ok"}
+    return {"status": "ok", "redis": REDIS_BREAKER.snapshot() if REDIS is not None else None}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus exposition; aggregates all workers when PROMETHEUS_MULTIPROC_DIR is set."""
+    if prometheus_client is None:
+        raise HTTPException(status_code=503, detail="Metrics unavailable")
+    registry = prometheus_client.REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    body = await asyncio.to_thread(prometheus_client.generate_latest, registry)
+    return Response(body, media_type=prometheus_client.CONTENT_TYPE_LATEST)
+
+
+@app.get("/api/debug/traces")
+async def debug_traces(request: Request, min_ms: float = 0.0, route: Optional[str] = None, limit: int = 50):
+    """Slow-request traces sampled by this worker, newest first.
+    Disabled unless DEBUG_TOKEN is set; callers send it as `X-Debug-Token`.
+    """
+    expected = os.getenv("DEBUG_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(request.headers.get("x-debug-token", ""), expected):
+        raise HTTPException(status_code=403, detail="Invalid debug token")
+    return {
+        "worker": os.getpid(),
+        "slow_ms": TRACE_SLOW_MS,
+        "sample_rate": TRACE_SAMPLE_RATE,
+        "stats": SLOW_TRACES.stats,
+        "traces": SLOW_TRACES.query(min_ms, route, max(1, min(limit, TRACE_BUFFER_SIZE))),
+    }
 
 
 @app.get("/")
@@ -194,6 +1600,8 @@ async def root():
 
 @app.get("/api/auth/status")
 async def auth_status(request: Request):
+    if request.scope.get("vinyl.auth"):
+        return {"authenticated": True}
     sid = request.cookies.get("session_id")
     session = await _get_session(sid or "") if sid else {}
     ok = bool(sid and session and "spotify_tokens" in session)
@@ -201,7 +1609,7 @@ async def auth_status(request: Request):
 
 @app.post("/api/auth/logout")
 async def auth_logout(request: Request):
-    response = JSONResponse({"status": "ok"})
+    response = FastJSONResponse({"status": "ok"})
     sid = request.cookies.get("session_id")
     if sid:
         await _delete_session(sid)
@@ -231,10 +1639,6 @@ async def spotify_login(request: Request):
   response = Response()
   sid = await _get_or_create_session_id(request, response)
   state = secrets.token_urlsafe(16)
-  session = await _get_session(sid)
-  session["spotify_oauth_state"] = state
-  await _set_session(sid, session)
-  await _set_state_map(state, sid)
 
   from urllib.parse import urlencode
   # Allow frontend to force the account chooser via ?show_dialog=true or ?force_new_login=true
@@ -251,13 +1655,13 @@ async def spotify_login(request: Request):
   }
   # Track whether this auth flow was initiated from a popup window so that
   # the callback can return a small HTML page that posts a success message
-  # to the opener and closes itself.
-  try:
-      session = session or {}
-      session["auth_popup"] = (qs.get("popup") == "true")
-      await _set_session(sid, session)
-  except Exception:
-      pass
+  # to the opener and closes itself. State, popup flag and the state->sid
+  # mapping are written in one round trip.
+  await _update_session(
+      sid,
+      {"spotify_oauth_state": state, "auth_popup": qs.get("popup") == "true"},
+      oauth_state=state,
+  )
   url = f"https://accounts.spotify.com/authorize?{urlencode(params)}"
 
   r = RedirectResponse(url)
@@ -298,29 +1702,28 @@ async def spotify_callback(request: Request):
             raise HTTPException(status_code=400, detail="Invalid Spotify OAuth state or code")
 
     # Exchange code for tokens
-    async with httpx.AsyncClient(timeout=15) as client:
-        data = {
-            "grant_type": "authorization_code",
-            "code": code,
-            "redirect_uri": redirect_uri,
-            "client_id": client_id,
-            "client_secret": client_secret,
-        }
-        token_resp = await client.post(SPOTIFY_TOKEN_URL, data=data)
-        if token_resp.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to obtain Spotify tokens")
-        body = token_resp.json()
-        access_token = body["access_token"]
-        refresh_token = body.get("refresh_token")
-        expires_in = body.get("expires_in", 3600)
-
-        session = session or {}
-        session["spotify_tokens"] = {
-            "access_token": access_token,
-            "refresh_token": refresh_token,
-            "expires_at": time.time() + int(expires_in) - 60,
-        }
-        await _set_session(sid, session)
+    data = {
+        "grant_type": "authorization_code",
+        "code": code,
+        "redirect_uri": redirect_uri,
+        "client_id": client_id,
+        "client_secret": client_secret,
+    }
+    token_resp = await _accounts_token_post(data)
+    if token_resp.status_code != 200:
+        raise HTTPException(status_code=400, detail="Failed to obtain Spotify tokens")
+    body = token_resp.json()
+    access_token = body["access_token"]
+    refresh_token = body.get("refresh_token")
+    expires_in = body.get("expires_in", 3600)
+
+    session = session or {}
+    session["spotify_tokens"] = {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "expires_at": time.time() + int(expires_in) - 60,
+    }
+    await _update_session(sid, {"spotify_tokens": session["spotify_tokens"]})
 
     # If this callback was initiated from a popup window, return a small HTML page
     # that notifies the opener and closes the popup. This avoids needing a manual
@@ -357,8 +1760,7 @@ async def spotify_callback(request: Request):
         # Clear popup flag from session to avoid affecting future flows
         try:
             if session:
-                session["auth_popup"] = False
-                await _set_session(sid, session)
+                await _update_session(sid, {"auth_popup": False})
         except Exception:
             pass
         return r
@@ -372,12 +1774,38 @@ async def spotify_callback(request: Request):
     return r
 
 
-@app.get("/api/proxy/image")
-async def proxy_image(src: str):
-    """Proxy Spotify CDN album art to avoid browser CORS restrictions.
-    - Only allows images from i.scdn.co
-    - Returns bytes with original content-type and cache headers
-    """
+# Album-art cache: a memory tier for hot art and a disk tier for the long tail.
+# Spotify CDN URLs are content-hashed, so entries never need revalidation.
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "vinyl-image-cache")
+IMAGE_CACHE_MEMORY_BYTES = int(os.getenv("IMAGE_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+IMAGE_CACHE_DISK_BYTES = int(os.getenv("IMAGE_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+IMAGE_CACHE_HEADERS = {"Cache-Control": "public, max-age=86400, immutable"}
+
+# Pooled keep-alive client for i.scdn.co
+IMAGE_HTTP: Optional[httpx.AsyncClient] = None
+
+
+def _image_http() -> httpx.AsyncClient:
+    """Return the pooled image CDN client, creating it if startup hasn't run."""
+    global IMAGE_HTTP
+    if IMAGE_HTTP is None:
+        IMAGE_HTTP = _new_http_client("image")
+    return IMAGE_HTTP
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match covers `etag` (weak comparison)."""
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    if inm.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return any((t.strip()[2:] if t.strip().startswith("W/") else t.strip()) == bare for t in inm.split(","))
+
+
+def _validate_image_src(src: str) -> None:
+    """Raise 400 unless `src` is an http(s) URL on the Spotify image CDN."""
     try:
         u = urlparse(src)
     except Exception:
@@ -387,111 +1815,947 @@ async def proxy_image(src: str):
     if (u.hostname or "").lower() != "i.scdn.co":
         raise HTTPException(status_code=400, detail="Image host not allowed")
 
-    # Fetch image from Spotify CDN
-    try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            resp = await client.get(src)
-    except Exception:
-        raise HTTPException(status_code=502, detail="Failed to fetch image")
-    if resp.status_code != 200:
-        raise HTTPException(status_code=resp.status_code, detail="Upstream image error")
 
-    ct = resp.headers.get("content-type", "image/jpeg")
-    r = Response(content=resp.content, media_type=ct)
-    # Cache for one day; CDN images are immutable by hash
-    r.headers["Cache-Control"] = "public, max-age=86400, immutable"
-    return r
+class _ImageCache:
+    """Content-addressed, size-bounded LRU cache with memory and disk tiers.
+    - Keys are sha256 of the source URL; files are named `<key><ext>` so the
+      disk index can be rebuilt from the directory after a restart.
+    - Index bookkeeping happens on the event loop; file I/O, including the directory
+      scan that rebuilds the index (started by the lifespan hook), runs in threads.
+    - The disk bound is enforced per process: workers sharing one directory can grow it
+      to about workers x `disk_bytes`.
+    """
 
-# Persistent HTTP client for Spotify API to reduce handshake latency
-SPOTIFY_HTTP: Optional[httpx.AsyncClient] = None
+    def __init__(self, directory: str, memory_bytes: int, disk_bytes: int):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._memory_size = 0
+        self._disk: "OrderedDict[str, Tuple[int, str, str]]" = OrderedDict()  # key -> (size, content_type, path)
+        self._disk_size = 0
+        self._disk_loaded = False
+        self._disk_loading: Optional["asyncio.Future"] = None
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def count(self, result: str) -> None:
+        self.stats[result] += 1
+        CACHE_EVENTS.labels("image", result).inc()
+
+    @staticmethod
+    def key_for(src: str) -> str:
+        return hashlib.sha256(src.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _scan_directory(directory: str) -> List[Tuple[float, str, str, int]]:
+        """(mtime, name, path, size) for every cached file; removes leftover temp files."""
+        entries = []
+        try:
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if name.endswith(".tmp"):
+                    os.remove(path)
+                    continue
+                st = os.stat(path)
+                entries.append((st.st_mtime, name, path, st.st_size))
+        except OSError:
+            return []
+        return sorted(entries)
+
+    async def load_disk_index(self) -> None:
+        """Rebuild the disk index from the directory (once; concurrent callers share the scan)."""
+        if self._disk_loaded:
+            return
+        if self._disk_loading is None:
+            self._disk_loading = asyncio.ensure_future(asyncio.to_thread(self._scan_directory, self.directory))
+        entries = await asyncio.shield(self._disk_loading)
+        if self._disk_loaded:
+            return
+        self._disk_loaded = True
+        # Files written while the scan ran are already indexed and are the newest
+        written, self._disk = self._disk, OrderedDict()
+        for _, name, path, size in entries:
+            key, _ext = os.path.splitext(name)
+            if key not in written:
+                self._disk[key] = (size, mimetypes.guess_type(name)[0] or "image/jpeg", path)
+        self._disk.update(written)
+        self._disk_size = sum(size for size, _, _ in self._disk.values())
+
+    def get_memory(self, key: str) -> Optional[Tuple[bytes, str]]:
+        hit = self._memory.get(key)
+        if hit is not None:
+            self._memory.move_to_end(key)
+            self.count("memory_hits")
+        return hit
+
+    async def get_disk(self, key: str) -> Optional[Tuple[str, str]]:
+        """Return (path, content_type) for a disk hit."""
+        if not self._disk_loaded:
+            await self.load_disk_index()
+        entry = self._disk.get(key)
+        if entry is None:
+            return None
+        size, ct, path = entry
+        if not os.path.exists(path):
+            self._disk.pop(key, None)
+            self._disk_size -= size
+            return None
+        self._disk.move_to_end(key)
+        self.count("disk_hits")
+        return path, ct
+
+    def put_memory(self, key: str, data: bytes, content_type: str) -> None:
+        # Anything bigger than an eighth of the tier goes straight to disk only
+        if len(data) > self.memory_bytes // 8:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_size -= len(old[0])
+        self._memory[key] = (data, content_type)
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes and self._memory:
+            _, (evicted, _ct) = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    @staticmethod
+    def _write_file(directory: str, path: str, data: bytes) -> None:
+        os.makedirs(directory, exist_ok=True)
+        tmp = f"{path}.{secrets.token_hex(4)}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _read_file(path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    @staticmethod
+    def _remove_files(paths: List[str]) -> None:
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    async def put(self, key: str, data: bytes, content_type: str) -> None:
+        """Store in both tiers, evicting least-recently-used disk entries past the bound."""
+        self.put_memory(key, data, content_type)
+        if not self._disk_loaded:
+            await self.load_disk_index()
+        ext = mimetypes.guess_extension(content_type.split(";")[0].strip()) or ".img"
+        path = os.path.join(self.directory, f"{key}{ext}")
+        try:
+            await asyncio.to_thread(self._write_file, self.directory, path, data)
+        except OSError:
+            return
+        old = self._disk.pop(key, None)
+        if old is not None:
+            self._disk_size -= old[0]
+        self._disk[key] = (len(data), content_type, path)
+        self._disk_size += len(data)
+        victims: List[str] = []
+        while self._disk_size > self.disk_bytes and len(self._disk) > 1:
+            _, (size, _ct, victim) = self._disk.popitem(last=False)
+            self._disk_size -= size
+            victims.append(victim)
+        if victims:
+            await asyncio.to_thread(self._remove_files, victims)
+
+
+IMAGE_CACHE = _ImageCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MEMORY_BYTES, IMAGE_CACHE_DISK_BYTES)
+
+
+class _ImageFill:
+    """A single upstream fetch shared by every request that misses on the same image.
+    Readers stream chunks as they arrive; the completed body is stored in the cache.
+    """
 
-@app.on_event("startup")
-def _init_http_client():
-    # http2 improves throughput/latency; enable if 'h2' is available; small timeout to fail fast
-    global SPOTIFY_HTTP
-    http2_supported = False
+    def __init__(self):
+        self.status = 0
+        self.content_type = "image/jpeg"
+        self.chunks: List[bytes] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.ready = asyncio.Event()  # set once status/headers are known
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def body(self) -> bytes:
+        """Wait for the fetch to finish and return the full body."""
+        while not self.done:
+            await self._changed.wait()
+        if self.error is not None:
+            raise self.error
+        return b"".join(self.chunks)
+
+    async def iter_bytes(self):
+        i = 0
+        while True:
+            if i < len(self.chunks):
+                yield self.chunks[i]
+                i += 1
+                continue
+            if self.done:
+                if self.error is not None:
+                    raise self.error  # abort the response so the client doesn't cache a truncated image
+                return
+            await self._changed.wait()
+
+
+# In-flight upstream fetches keyed by cache key
+_IMAGE_FILLS: Dict[str, _ImageFill] = {}
+
+
+async def _fill_image(key: str, src: str, fill: _ImageFill) -> None:
+    try:
+        async with _image_http().stream("GET", src) as resp:
+            fill.status = resp.status_code
+            fill.content_type = resp.headers.get("content-type", "image/jpeg")
+            fill.ready.set()
+            if resp.status_code != 200:
+                return
+            async for chunk in resp.aiter_bytes():
+                fill.chunks.append(chunk)
+                fill._notify()
+        await IMAGE_CACHE.put(key, b"".join(fill.chunks), fill.content_type)
+    except Exception as e:
+        fill.error = e
+    finally:
+        fill.done = True
+        fill.ready.set()
+        fill._notify()
+        _IMAGE_FILLS.pop(key, None)
+
+
+def _start_image_fill(key: str, src: str) -> _ImageFill:
+    """Return the in-flight fetch for `key`, starting one if none is running."""
+    fill = _IMAGE_FILLS.get(key)
+    if fill is None:
+        IMAGE_CACHE.count("misses")
+        fill = _IMAGE_FILLS[key] = _ImageFill()
+        asyncio.create_task(_fill_image(key, src, fill))
+    return fill
+
+
+# Derived album-art variants (resized and/or transcoded), produced in a bounded process pool
+IMAGE_VARIANT_WIDTHS = (64, 128, 256, 320, 480, 640)
+IMAGE_VARIANT_FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg", "jpg": "image/jpeg", "png": "image/png"}
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+_IMAGE_POOL: Optional[ProcessPoolExecutor] = None
+_IMAGE_POOL_SLOTS: Optional[asyncio.Semaphore] = None
+# In-flight variant jobs keyed by variant cache key
+_IMAGE_VARIANT_JOBS: Dict[str, "asyncio.Task[bytes]"] = {}
+
+
+def _transcode_image(data: bytes, width: int, fmt: str) -> bytes:
+    """Resize to `width` (never upscaling) and encode as `fmt`. Runs in a worker process."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as im:
+        if width and im.width > width:
+            im = im.resize((width, max(1, round(im.height * width / im.width))), Image.LANCZOS)
+        if fmt in ("jpeg", "webp") and im.mode not in ("RGB", "L"):
+            im = im.convert("RGB")
+        out = io.BytesIO()
+        if fmt == "png":
+            im.save(out, format="PNG", optimize=True)
+        else:
+            im.save(out, format=fmt.upper(), quality=80)
+        return out.getvalue()
+
+
+def _image_variant(w: Optional[int], fmt: Optional[str]) -> Optional[Tuple[int, str]]:
+    """Normalize `w`/`fmt` query params to (width bucket, format), or None for the original."""
+    if w is None and not fmt:
+        return None
+    fmt = (fmt or "jpeg").lower()
+    if fmt not in IMAGE_VARIANT_FORMATS:
+        raise HTTPException(status_code=400, detail="Unsupported image format")
+    if fmt == "jpg":
+        fmt = "jpeg"
+    width = 0
+    if w is not None:
+        if w <= 0:
+            raise HTTPException(status_code=400, detail="Invalid image width")
+        # Snap to a few buckets so the variant cache stays small
+        width = next((b for b in IMAGE_VARIANT_WIDTHS if b >= w), IMAGE_VARIANT_WIDTHS[-1])
+    return width, fmt
+
+
+async def _run_image_job(fn, *args):
+    """Run `fn(*args)` in the image process pool, queueing when all slots are busy."""
+    global _IMAGE_POOL, _IMAGE_POOL_SLOTS
+    if _IMAGE_POOL is None:
+        _IMAGE_POOL = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+        _IMAGE_POOL_SLOTS = asyncio.Semaphore(IMAGE_WORKERS * 2)
+    async with _IMAGE_POOL_SLOTS:
+        return await asyncio.get_running_loop().run_in_executor(_IMAGE_POOL, fn, *args)
+
+
+async def _image_source_bytes(key: str, src: str) -> bytes:
+    """Return the original image bytes, from cache or via a (shared) upstream fetch."""
+    hit = IMAGE_CACHE.get_memory(key)
+    if hit is not None:
+        return hit[0]
+    on_disk = await IMAGE_CACHE.get_disk(key)
+    if on_disk is not None:
+        return await asyncio.to_thread(_ImageCache._read_file, on_disk[0])
+    fill = _start_image_fill(key, src)
+    await fill.ready.wait()
+    if fill.status == 0:
+        raise HTTPException(status_code=502, detail="Failed to fetch image")
+    if fill.status != 200:
+        raise HTTPException(status_code=fill.status, detail="Upstream image error")
     try:
-        import h2  # noqa: F401
-        http2_supported = True
+        return await fill.body()
     except Exception:
-        print("Warning: HTTP/2 not available (install 'httpx[http2]'). Falling back to HTTP/1.1.")
-    SPOTIFY_HTTP = httpx.AsyncClient(timeout=10, http2=http2_supported)
-
+        raise HTTPException(status_code=502, detail="Failed to fetch image")
 
-@app.on_event("startup")
-async def _init_redis():
-    global REDIS
-    if REDIS_URL and redis is not None:
-        try:
-            REDIS = redis.from_url(REDIS_URL, decode_responses=True)
-            # Confirm connection (ignore errors to allow fallback)
-            await REDIS.ping()
-        except Exception:
-            REDIS = None
 
-@app.on_event("shutdown")
-async def _close_http_client():
-    global SPOTIFY_HTTP
+async def _build_image_variant(vkey: str, key: str, src: str, width: int, fmt: str) -> bytes:
+    data = await _image_source_bytes(key, src)
     try:
-      await SPOTIFY_HTTP.aclose()
+        out = await _run_image_job(_transcode_image, data, width, fmt)
     except Exception:
-      pass
+        raise HTTPException(status_code=502, detail="Failed to process image")
+    await IMAGE_CACHE.put(vkey, out, IMAGE_VARIANT_FORMATS[fmt])
+    return out
 
-@app.on_event("shutdown")
-async def _close_redis():
-    global REDIS
-    try:
-      if REDIS:
-        await REDIS.close()
-    except Exception:
-      pass
-
-async def _spotify_get(access_token: str, path: str, params: Optional[dict] = None) -> httpx.Response:
-    assert SPOTIFY_HTTP is not None, "HTTP client not initialized"
-    return await SPOTIFY_HTTP.get(
-        f"{SPOTIFY_API_BASE}{path}",
-        headers={"Authorization": f"Bearer {access_token}"},
-        params=params or {},
-    )
 
-async def _spotify_put(access_token: str, path: str, json: Optional[dict] = None, params: Optional[dict] = None) -> httpx.Response:
-    assert SPOTIFY_HTTP is not None, "HTTP client not initialized"
-    return await SPOTIFY_HTTP.put(
-        f"{SPOTIFY_API_BASE}{path}",
-        headers={"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"},
-        json=json or {},
-        params=params or {},
-    )
+@app.get("/api/proxy/image")
+async def proxy_image(request: Request, src: str, w: Optional[int] = None, fmt: Optional[str] = None):
+    """Proxy Spotify CDN album art to avoid browser CORS restrictions.
+    - Only allows images from i.scdn.co
+    - Serves from the memory/disk cache; misses stream to the client while
+      filling the cache, and concurrent misses share one upstream fetch
+    - ETag is derived from the (content-hashed) URL, so revalidation is a 304
+    - Optional `w` (snapped to a width bucket) and `fmt` (webp/jpeg/png) return
+      a resized/transcoded variant, cached by (source, width, format); without
+      Pillow installed the original is served
+    """
+    _validate_image_src(src)
+    variant = _image_variant(w, fmt) if PIL_AVAILABLE else None
+    key = _ImageCache.key_for(src)
+    if variant is None:
+        headers = dict(IMAGE_CACHE_HEADERS, ETag=f'"{key[:32]}"')
+    else:
+        headers = dict(IMAGE_CACHE_HEADERS, ETag=f'"{key[:32]}-w{variant[0]}-{variant[1]}"')
+    if _etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    if variant is not None:
+        width, vfmt = variant
+        vkey = f"{key}-w{width}-{vfmt}"
+        hit = IMAGE_CACHE.get_memory(vkey)
+        if hit is not None:
+            return Response(content=hit[0], media_type=hit[1], headers=headers)
+        on_disk = await IMAGE_CACHE.get_disk(vkey)
+        if on_disk is not None:
+            return FileResponse(on_disk[0], media_type=on_disk[1], headers=headers)
+        data = await _single_flight(
+            _IMAGE_VARIANT_JOBS, vkey, lambda: _build_image_variant(vkey, key, src, width, vfmt)
+        )
+        return Response(content=data, media_type=IMAGE_VARIANT_FORMATS[vfmt], headers=headers)
+
+    hit = IMAGE_CACHE.get_memory(key)
+    if hit is not None:
+        return Response(content=hit[0], media_type=hit[1], headers=headers)
+    on_disk = await IMAGE_CACHE.get_disk(key)
+    if on_disk is not None:
+        return FileResponse(on_disk[0], media_type=on_disk[1], headers=headers)
 
-async def _spotify_post(access_token: str, path: str, params: Optional[dict] = None) -> httpx.Response:
-    assert SPOTIFY_HTTP is not None, "HTTP client not initialized"
-    return await SPOTIFY_HTTP.post(
-        f"{SPOTIFY_API_BASE}{path}",
-        headers={"Authorization": f"Bearer {access_token}"},
-        params=params or {},
+    # Fetch image from Spotify CDN
+    fill = _start_image_fill(key, src)
+    await fill.ready.wait()
+    if fill.status == 0:
+        raise HTTPException(status_code=502, detail="Failed to fetch image")
+    if fill.status != 200:
+        raise HTTPException(status_code=fill.status, detail="Upstream image error")
+    return StreamingResponse(fill.iter_bytes(), media_type=fill.content_type, headers=headers)
+
+# Album-art palettes, extracted in the image process pool and memoized per image
+PALETTE_CACHE_SIZE = int(os.getenv("PALETTE_CACHE_SIZE", "4096"))
+PALETTE_BATCH_MAX = 100
+_PALETTE_CACHE: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_PALETTE_JOBS: Dict[str, "asyncio.Task[Dict[str, Any]]"] = {}
+
+
+def _extract_palette(data: bytes, k: int) -> List[Dict[str, Any]]:
+    """Return up to `k` colors as [{hex, rgb, weight}], most common first. Runs in a worker process.
+    Uses k-means on a 64x64 downsample when NumPy is available, otherwise Pillow's median cut.
+    """
+    from PIL import Image
+
+    try:
+        import numpy as np
+    except Exception:
+        np = None
+    with Image.open(io.BytesIO(data)) as im:
+        small = im.convert("RGB").resize((64, 64), Image.BILINEAR)
+    if np is not None:
+        px = np.asarray(small, dtype=np.float32).reshape(-1, 3)
+        rng = np.random.default_rng(0)
+        # k-means++ seeding
+        centers = [px[rng.integers(len(px))]]
+        for _ in range(1, k):
+            d = np.min(((px[:, None, :] - np.array(centers)[None, :, :]) ** 2).sum(-1), axis=1)
+            if d.sum() == 0:
+                break
+            centers.append(px[rng.choice(len(px), p=d / d.sum())])
+        c = np.array(centers)
+        for _ in range(12):
+            labels = ((px[:, None, :] - c[None, :, :]) ** 2).sum(-1).argmin(1)
+            counts = np.bincount(labels, minlength=len(c))
+            sums = np.stack([np.bincount(labels, weights=px[:, ch], minlength=len(c)) for ch in range(3)], 1)
+            nonempty = counts > 0
+            moved = sums[nonempty] / counts[nonempty, None]
+            if np.allclose(moved, c[nonempty], atol=0.5):
+                c[nonempty] = moved
+                break
+            c[nonempty] = moved
+        labels = ((px[:, None, :] - c[None, :, :]) ** 2).sum(-1).argmin(1)
+        counts = np.bincount(labels, minlength=len(c))
+        colors = [(int(n), tuple(int(round(v)) for v in c[i])) for i, n in enumerate(counts) if n]
+    else:
+        q = small.quantize(colors=k, method=Image.Quantize.MEDIANCUT)
+        pal = q.getpalette() or []
+        colors = [(n, tuple(pal[i * 3:i * 3 + 3])) for n, i in (q.getcolors() or [])]
+    total = sum(n for n, _ in colors) or 1
+    colors.sort(key=lambda nc: -nc[0])
+    return [
+        {"hex": "#%02x%02x%02x" % rgb, "rgb": list(rgb), "weight": round(n / total, 4)}
+        for n, rgb in colors
+    ]
+
+
+async def _image_palette(src: str, k: int) -> Dict[str, Any]:
+    """Palette for one allowlisted image URL, memoized by (image hash, k)."""
+    _validate_image_src(src)
+    if not PIL_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Image processing unavailable")
+    pkey = f"{_ImageCache.key_for(src)}:{k}"
+    cached = _PALETTE_CACHE.get(pkey)
+    if cached is not None:
+        _PALETTE_CACHE.move_to_end(pkey)
+        return cached
+
+    async def build() -> Dict[str, Any]:
+        data = await _image_source_bytes(_ImageCache.key_for(src), src)
+        try:
+            colors = await _run_image_job(_extract_palette, data, k)
+        except Exception:
+            raise HTTPException(status_code=502, detail="Failed to process image")
+        result = {"src": src, "dominant": colors[0]["hex"] if colors else None, "palette": colors}
+        _PALETTE_CACHE[pkey] = result
+        while len(_PALETTE_CACHE) > PALETTE_CACHE_SIZE:
+            _PALETTE_CACHE.popitem(last=False)
+        return result
+
+    return await _single_flight(_PALETTE_JOBS, pkey, build)
+
+
+@app.get("/api/art/palette")
+async def art_palette(src: str, k: int = 5):
+    """Dominant colors for a Spotify CDN image (same host allowlist as /api/proxy/image)."""
+    result = await _image_palette(src, max(1, min(k, 12)))
+    return FastJSONResponse(result, headers={"Cache-Control": "public, max-age=86400"})
+
+
+@app.post("/api/art/palette/batch")
+async def art_palette_batch(request: Request):
+    """Palettes for many images in one call, e.g. to precompute a whole playlist.
+    Body: {"srcs": [...], "k": 5}. Returns {"palettes": {src: palette | {"error": ...}}}.
+    """
+    body = await request.json()
+    srcs = (body.get("srcs") or []) if isinstance(body, dict) else None
+    if (
+        not isinstance(srcs, list)
+        or len(srcs) > PALETTE_BATCH_MAX
+        or not all(isinstance(src, str) for src in srcs)
+    ):
+        raise HTTPException(status_code=400, detail=f"srcs must be a list of at most {PALETTE_BATCH_MAX} URLs")
+    k = body.get("k") or 5
+    if isinstance(k, bool) or not isinstance(k, int):
+        raise HTTPException(status_code=400, detail="k must be an integer")
+    k = max(1, min(k, 12))
+
+    async def one(src: str) -> Dict[str, Any]:
+        try:
+            return await _image_palette(src, k)
+        except HTTPException as e:
+            return {"src": src, "error": e.detail, "status": e.status_code}
+
+    unique = list(dict.fromkeys(srcs))
+    results = await asyncio.gather(*[one(src) for src in unique])
+    return FastJSONResponse({"palettes": {r["src"]: r for r in results}})
+
+# One pooled client per upstream host. The lifespan hook opens them and pre-warms a
+# connection to each host in the background; they are also created on first use.
+# Tests and the load bench swap the module globals for stubs.
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+HTTP_PREWARM = os.getenv("HTTP_PREWARM", "1") != "0"
+HTTP_PREWARM_TIMEOUT = float(os.getenv("HTTP_PREWARM_TIMEOUT", "3"))
+SPOTIFY_HTTP_MAX_CONNECTIONS = int(os.getenv("SPOTIFY_HTTP_MAX_CONNECTIONS", "100"))
+_HTTP_CLIENT_SPECS: Dict[str, Dict[str, Any]] = {
+    "api": {
+        "warm_url": f"{SPOTIFY_API_BASE}/",
+        "timeout": 10,
+        "limits": httpx.Limits(max_connections=SPOTIFY_HTTP_MAX_CONNECTIONS, max_keepalive_connections=20, keepalive_expiry=120),
+    },
+    "accounts": {
+        "warm_url": SPOTIFY_TOKEN_URL,
+        "timeout": 15,
+        "limits": httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=120),
+    },
+    "image": {
+        "warm_url": "https://i.scdn.co/",
+        "timeout": 10,
+        "limits": httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=120),
+    },
+}
+# Persistent HTTP client for Spotify API to reduce handshake latency
+SPOTIFY_HTTP: Optional[httpx.AsyncClient] = None
+# Separate keep-alive pool for accounts.spotify.com (token exchange/refresh)
+SPOTIFY_ACCOUNTS_HTTP: Optional[httpx.AsyncClient] = None
+
+
+def _new_http_client(name: str) -> httpx.AsyncClient:
+    spec = _HTTP_CLIENT_SPECS[name]
+    # HTTP/2 multiplexes concurrent requests to a host over one connection
+    return httpx.AsyncClient(timeout=spec["timeout"], limits=spec["limits"], http2=HTTP2_AVAILABLE)
+
+
+def _spotify_http() -> httpx.AsyncClient:
+    """Return the pooled api.spotify.com client, creating it if startup hasn't run."""
+    global SPOTIFY_HTTP
+    if SPOTIFY_HTTP is None:
+        SPOTIFY_HTTP = _new_http_client("api")
+    return SPOTIFY_HTTP
+
+
+def _accounts_http() -> httpx.AsyncClient:
+    """Return the pooled accounts.spotify.com client, creating it if startup hasn't run."""
+    global SPOTIFY_ACCOUNTS_HTTP
+    if SPOTIFY_ACCOUNTS_HTTP is None:
+        SPOTIFY_ACCOUNTS_HTTP = _new_http_client("accounts")
+    return SPOTIFY_ACCOUNTS_HTTP
+
+
+def _http_clients() -> Dict[str, httpx.AsyncClient]:
+    return {"api": _spotify_http(), "accounts": _accounts_http(), "image": _image_http()}
+
+
+def _open_http_clients() -> None:
+    if not HTTP2_AVAILABLE:
+        print("Warning: HTTP/2 not available (install 'httpx[http2]'). Falling back to HTTP/1.1.")
+    _http_clients()
+
+
+async def _warm_http_clients() -> None:
+    """Open a connection (DNS, TCP, TLS, HTTP/2 settings) to each upstream host ahead of
+    the first request. Any response will do; failures are left to the real requests.
+    """
+
+    async def warm(name: str, client: httpx.AsyncClient) -> None:
+        try:
+            await client.head(_HTTP_CLIENT_SPECS[name]["warm_url"], timeout=HTTP_PREWARM_TIMEOUT)
+        except httpx.HTTPError:
+            pass
+
+    await asyncio.gather(*(warm(name, client) for name, client in _http_clients().items()))
+
+
+async def _close_http_clients() -> None:
+    global SPOTIFY_HTTP, SPOTIFY_ACCOUNTS_HTTP, IMAGE_HTTP
+    for client in (SPOTIFY_HTTP, SPOTIFY_ACCOUNTS_HTTP, IMAGE_HTTP):
+        if client is not None:
+            try:
+                await client.aclose()
+            except Exception:
+                pass
+    SPOTIFY_HTTP = SPOTIFY_ACCOUNTS_HTTP = IMAGE_HTTP = None
+
+
+async def _init_redis():
+    global REDIS, REDIS_PUBSUB, _SESSION_LISTENER
+    if REDIS_URL and redis is not None:
+        # Short timeouts so a slow Redis trips the breaker instead of stalling requests
+        REDIS = redis.from_url(
+            REDIS_URL,
+            decode_responses=True,
+            socket_timeout=REDIS_TIMEOUT,
+            socket_connect_timeout=REDIS_TIMEOUT,
+        )
+        REDIS_PUBSUB = redis.from_url(
+            REDIS_URL,
+            decode_responses=True,
+            socket_timeout=None,
+            socket_connect_timeout=REDIS_TIMEOUT,
+        )
+        try:
+            await REDIS.ping()
+        except Exception:
+            # Start on the in-memory fallback; the probe switches over once Redis answers
+            REDIS_BREAKER.trip()
+            _start_redis_probe()
+    if REDIS:
+        _SESSION_LISTENER = asyncio.create_task(_session_invalidation_listener())
+
+
+def _close_image_pool():
+    global _IMAGE_POOL
+    if _IMAGE_POOL is not None:
+        _IMAGE_POOL.shutdown(wait=False, cancel_futures=True)
+        _IMAGE_POOL = None
+
+
+async def _close_redis():
+    global REDIS
+    for task in (_SESSION_LISTENER, _REDIS_PROBE):
+        if task:
+            task.cancel()
+    for client in (REDIS_PUBSUB, REDIS):
+        try:
+          if client:
+            await client.close()
+        except Exception:
+          pass
+
+
+# Spotify rate limits are per app over a rolling window; these keep us under them
+SPOTIFY_APP_RPS = float(os.getenv("SPOTIFY_APP_RPS", "25"))
+SPOTIFY_APP_BURST = float(os.getenv("SPOTIFY_APP_BURST", "50"))
+SPOTIFY_USER_RPS = float(os.getenv("SPOTIFY_USER_RPS", "5"))
+SPOTIFY_USER_BURST = float(os.getenv("SPOTIFY_USER_BURST", "15"))
+# 429s with a longer Retry-After are returned to the caller instead of waited out
+SPOTIFY_MAX_RETRY_AFTER = float(os.getenv("SPOTIFY_MAX_RETRY_AFTER", "5"))
+SPOTIFY_MAX_RETRIES = 2
+
+
+class _TokenBucket:
+    """Reservation-style token bucket: `reserve()` returns how long to wait for a token."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self) -> None:
+        """Give back a reservation that won't be used."""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+class _AIMDLimiter:
+    """Adaptive in-flight limit with a priority wait queue (lower priority value goes first).
+    - Additive increase (+1 per window of successes) while latency stays under target.
+    - Multiplicative decrease on 429s (halve) and on slow responses (x0.9).
+    """
+
+    def __init__(self, initial: int = 16, minimum: int = 2, maximum: int = 64, target_latency: float = 1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.inflight = 0
+        self._waiters: List[Tuple[int, int, "asyncio.Future"]] = []
+        self._seq = itertools.count()
+
+    async def acquire(self, priority: int) -> None:
+        if self.inflight < int(self.limit) and not self._waiters:
+            self.inflight += 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()  # slot was granted just as we were cancelled
+            raise
+
+    def release(self) -> None:
+        self.inflight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.inflight < int(self.limit):
+            _, _, fut = heapq.heappop(self._waiters)
+            if fut.done():
+                continue
+            self.inflight += 1
+            fut.set_result(None)
+
+    def on_success(self, latency: float) -> None:
+        if latency <= self.target_latency:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        else:
+            self.limit = max(self.minimum, self.limit * 0.9)
+        self._wake()
+
+    def on_throttle(self) -> None:
+        self.limit = max(self.minimum, self.limit / 2)
+
+
+class _SpotifyClient:
+    """Rate-limit-aware wrapper around SPOTIFY_HTTP used by the `_spotify_*` helpers.
+    - Token buckets per app and per access token smooth request bursts.
+    - 429 Retry-After pauses all requests and is retried when short enough.
+    - Requests that would wait longer than SPOTIFY_MAX_RETRY_AFTER (a long pause or a
+      deep bucket backlog) fail fast with a synthesized 429 instead of sleeping.
+    - An AIMD limiter bounds in-flight requests; playback commands queue ahead of reads.
+    """
+
+    def __init__(self):
+        self.app_bucket = _TokenBucket(SPOTIFY_APP_RPS, SPOTIFY_APP_BURST)
+        self.user_buckets: "OrderedDict[str, _TokenBucket]" = OrderedDict()
+        self.limiter = _AIMDLimiter()
+        self.blocked_until = 0.0
+        self.stats = {"requests": 0, "throttled": 0, "retries": 0, "shed": 0}
+
+    def _user_bucket(self, token: str) -> _TokenBucket:
+        bucket = self.user_buckets.get(token)
+        if bucket is None:
+            bucket = self.user_buckets[token] = _TokenBucket(SPOTIFY_USER_RPS, SPOTIFY_USER_BURST)
+            while len(self.user_buckets) > 10000:
+                self.user_buckets.popitem(last=False)
+        else:
+            self.user_buckets.move_to_end(token)
+        return bucket
+
+    @staticmethod
+    def _retry_after(resp: httpx.Response) -> float:
+        try:
+            return max(0.0, float(resp.headers.get("retry-after", "1")))
+        except ValueError:
+            return 1.0
+
+    def _shed(self, method: str, path: str, wait: float) -> httpx.Response:
+        """A local 429 for a request we won't queue, telling the caller when to come back."""
+        self.stats["shed"] += 1
+        return httpx.Response(
+            429,
+            headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            json={"error": {"status": 429, "message": "API rate limit exceeded"}},
+            request=httpx.Request(method, f"{SPOTIFY_API_BASE}{path}"),
+        )
+
+    async def request(self, method: str, token: str, path: str, **kwargs) -> httpx.Response:
+        priority = 0 if method != "GET" and path.startswith("/me/player") else 1
+        headers = {"Authorization": f"Bearer {token}", **kwargs.pop("headers", {})}
+        if "json" in kwargs:
+            headers["Content-Type"] = "application/json"
+        for attempt in range(SPOTIFY_MAX_RETRIES + 1):
+            blocked = self.blocked_until - time.monotonic()
+            if blocked > SPOTIFY_MAX_RETRY_AFTER:
+                return self._shed(method, path, blocked)
+            user_bucket = self._user_bucket(token)
+            wait = max(blocked, self.app_bucket.reserve(), user_bucket.reserve())
+            if wait > SPOTIFY_MAX_RETRY_AFTER:
+                self.app_bucket.refund()
+                user_bucket.refund()
+                return self._shed(method, path, wait)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self.limiter.acquire(priority)
+            started = time.monotonic()
+            observed = time.perf_counter()
+            status: Any = "error"
+            try:
+                self.stats["requests"] += 1
+                resp = await _spotify_http().request(method, f"{SPOTIFY_API_BASE}{path}", headers=headers, **kwargs)
+                status = resp.status_code
+            finally:
+                self.limiter.release()
+                _observe_upstream("api", method, path, status, observed)
+            if resp.status_code != 429:
+                self.limiter.on_success(time.monotonic() - started)
+                return resp
+            self.stats["throttled"] += 1
+            retry_after = self._retry_after(resp)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            self.limiter.on_throttle()
+            if attempt == SPOTIFY_MAX_RETRIES or retry_after > SPOTIFY_MAX_RETRY_AFTER:
+                return resp
+            self.stats["retries"] += 1
+        return resp
+
+
+SPOTIFY_CLIENT = _SpotifyClient()
+
+
+# Read-through cache for Spotify GETs that change rarely or only when the user acts.
+# Entries are per Spotify user and fresh for the route's TTL; after that, responses that
+# carried an ETag are revalidated with If-None-Match (a 304 refreshes the entry).
+UPSTREAM_CACHE_SIZE = int(os.getenv("UPSTREAM_CACHE_SIZE", "4096"))
+UPSTREAM_ETAG_TTL = float(os.getenv("UPSTREAM_ETAG_TTL", "3600"))
+# Player state is worthless after seconds, so it stays in the local tier with a short
+# stale window; other workers drop it via UPSTREAM_INVALIDATION_CHANNEL on commands.
+_UPSTREAM_POLICIES: List[Tuple["re.Pattern", _TieredCache]] = [
+    (re.compile(pattern), _TieredCache(f"upstream:{name}", UPSTREAM_CACHE_SIZE, ttl, stale_ttl=stale_ttl, shared=shared))
+    for pattern, name, ttl, stale_ttl, shared in (
+        (r"^/me$", "me", 300, UPSTREAM_ETAG_TTL, True),
+        (r"^/me/playlists$", "playlists", 60, UPSTREAM_ETAG_TTL, True),
+        (r"^/playlists/[^/]+/tracks$", "playlist_tracks", 60, UPSTREAM_ETAG_TTL, True),
+        (r"^/me/player/devices$", "devices", 5, 30, False),
+        (r"^/me/player/currently-playing$", "player", 0.5, 5, False),
     )
+]
+_UPSTREAM_LOADS: Dict[str, "asyncio.Task"] = {}
+
+
+def _upstream_cache(path: str) -> Optional[_TieredCache]:
+    for pattern, cache in _UPSTREAM_POLICIES:
+        if pattern.match(path):
+            return cache
+    return None
+
+
+def _token_owner(token: str) -> str:
+    """Cache owner for a token. A hash of the token itself, so every worker derives the
+    same key without first having seen /me (cross-worker invalidations rely on it)."""
+    return "t:" + hashlib.sha256(token.encode()).hexdigest()[:24]
+
+
+def _upstream_key(token: str, path: str, params: Optional[dict]) -> str:
+    query = urlencode(sorted((params or {}).items()))
+    return f"{_token_owner(token)}:{path}?{query}"
+
+
+def _cached_response(value: Dict[str, Any]) -> httpx.Response:
+    headers = {"content-type": "application/json"}
+    if value.get("etag"):
+        headers["etag"] = value["etag"]
+    return httpx.Response(200, content=value["body"].encode(), headers=headers)
+
+
+async def _cached_spotify_get(cache: _TieredCache, token: str, path: str, params: Optional[dict], timeout: Any) -> httpx.Response:
+    key = _upstream_key(token, path, params)
+    entry = await cache.get(key)
+    if entry is not None and time.time() - entry[0] < cache.ttl:
+        cache.count("hits")
+        return _cached_response(entry[1])
+    cache.count("misses")
+
+    async def load() -> httpx.Response:
+        headers = {}
+        if entry is not None and entry[1].get("etag"):
+            headers["If-None-Match"] = entry[1]["etag"]
+        resp = await SPOTIFY_CLIENT.request("GET", token, path, params=params or {}, timeout=timeout, headers=headers)
+        if resp.status_code == 304 and entry is not None:
+            cache.count("revalidated")
+            await cache.set(key, entry[1])
+            return _cached_response(entry[1])
+        if resp.status_code == 200:
+            await cache.set(key, {"body": resp.text, "etag": resp.headers.get("etag")})
+        return resp
+
+    return await _single_flight(_UPSTREAM_LOADS, key, load)
+
+
+def _stale_upstream_paths(path: str) -> Tuple[str, ...]:
+    """Cached reads made stale by a successful write to `path`."""
+    if path in ("/me/player", "/me/player/volume"):  # transfer; volume is reported per device
+        return ("/me/player/devices", "/me/player/currently-playing")
+    if path.startswith("/me/player/"):
+        return ("/me/player/currently-playing",)
+    return ()
+
+
+async def _invalidate_upstream(token: str, path: str) -> None:
+    stale_paths = _stale_upstream_paths(path)
+    for stale in stale_paths:
+        cache = _upstream_cache(stale)
+        key = _upstream_key(token, stale, None)
+        await cache.delete(key)
+        if _redis():
+            try:
+                await REDIS.publish(UPSTREAM_INVALIDATION_CHANNEL, f"{_WORKER_ID} {cache.name} {key}")
+            except Exception as exc:
+                _redis_failed(exc)
+
+
+def _drop_upstream_entry(message: str) -> None:
+    """Apply an invalidation published by another worker."""
+    origin, name, key = (message.split(" ", 2) + ["", ""])[:3]
+    if origin == _WORKER_ID:
+        return
+    for _, cache in _UPSTREAM_POLICIES:
+        if cache.name == name:
+            cache._entries.pop(key, None)
+
+
+@_traced("spotify")
+async def _spotify_get(access_token: str, path: str, params: Optional[dict] = None, timeout: Any = httpx.USE_CLIENT_DEFAULT, cached: bool = True) -> httpx.Response:
+    cache = _upstream_cache(path) if cached else None
+    if cache is None:
+        return await SPOTIFY_CLIENT.request("GET", access_token, path, params=params or {}, timeout=timeout)
+    return await _cached_spotify_get(cache, access_token, path, params, timeout)
+
+@_traced("spotify")
+async def _spotify_put(access_token: str, path: str, json: Optional[dict] = None, params: Optional[dict] = None, timeout: Any = httpx.USE_CLIENT_DEFAULT) -> httpx.Response:
+    resp = await SPOTIFY_CLIENT.request("PUT", access_token, path, json=json or {}, params=params or {}, timeout=timeout)
+    if resp.status_code < 300:
+        await _invalidate_upstream(access_token, path)
+    return resp
+
+@_traced("spotify")
+async def _spotify_post(access_token: str, path: str, params: Optional[dict] = None) -> httpx.Response:
+    resp = await SPOTIFY_CLIENT.request("POST", access_token, path, params=params or {})
+    if resp.status_code < 300:
+        await _invalidate_upstream(access_token, path)
+    return resp
+
+
+class _UpstreamError(Exception):
+    """A non-success Spotify response, raised out of cache loaders so it isn't cached."""
+
+    def __init__(self, resp: httpx.Response):
+        super().__init__(resp.status_code)
+        self.resp = resp
+
+
+def _spotify_error_response(resp: httpx.Response) -> JSONResponse:
+    # Pass Retry-After through so clients back off instead of retrying immediately
+    headers = {"Retry-After": resp.headers["retry-after"]} if "retry-after" in resp.headers else None
+    try:
+        return FastJSONResponse(resp.json(), status_code=resp.status_code, headers=headers)
+    except Exception:
+        return FastJSONResponse({"status": "error", "message": resp.text}, status_code=resp.status_code, headers=headers)
+
 
 
 @app.get("/api/spotify/me")
 async def spotify_me(request: Request):
     _, token = await _ensure_access_token(request)
     resp = await _spotify_get(token, "/me")
-    return JSONResponse(resp.json(), status_code=resp.status_code)
+    return _passthrough(resp)
 
 @app.get("/api/spotify/token")
 async def spotify_token(request: Request):
     _, token = await _ensure_access_token(request)
-    return JSONResponse({"access_token": token})
+    return FastJSONResponse({"access_token": token})
 
 @app.get("/api/spotify/devices")
 async def spotify_devices(request: Request):
     _, token = await _ensure_access_token(request)
     resp = await _spotify_get(token, "/me/player/devices")
-    return JSONResponse(resp.json(), status_code=resp.status_code)
+    return _passthrough(resp)
 
 @app.put("/api/spotify/transfer")
 async def spotify_transfer(request: Request):
-    _, token = await _ensure_access_token(request)
+    sid, token = await _ensure_access_token(request)
     body = await request.json()
     device_id = body.get("device_id")
     play = bool(body.get("play", False))
@@ -500,55 +2764,181 @@ async def spotify_transfer(request: Request):
     resp = await _spotify_put(token, "/me/player", json={"device_ids": [device_id], "play": play})
     status = resp.status_code
     if status in (200, 204):
-        return JSONResponse({"status": "ok"}, status_code=200)
-    try:
-        return JSONResponse(resp.json(), status_code=status)
-    except Exception:
-        return JSONResponse({"status": "error", "message": resp.text}, status_code=status)
+        _nudge_playback_pollers(sid)
+        return FastJSONResponse({"status": "ok"}, status_code=200)
+    return _spotify_error_response(resp)
 
 @app.put("/api/spotify/play")
 async def spotify_play(request: Request):
-    _, token = await _ensure_access_token(request)
+    sid, token = await _ensure_access_token(request)
     body = await request.json()
     device_id = body.get("device_id")
+    params = {"device_id": device_id} if device_id else None
+    resp = await _spotify_put(token, "/me/player/play", json=_play_payload(body), params=params)
+    status = resp.status_code
+    # Spotify returns 204 No Content on success
+    if status == 204:
+        _nudge_playback_pollers(sid)
+        return FastJSONResponse({"status": "ok"}, status_code=200)
+    return _spotify_error_response(resp)
+
+def _play_payload(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the /me/player/play JSON body from our request body."""
     uris = body.get("uris")
     context_uri = body.get("context_uri")
     offset = body.get("offset")
-
-    params = {"device_id": device_id} if device_id else None
     json = {"uris": uris} if uris else {"context_uri": context_uri} if context_uri else {}
     if offset is not None:
         json["offset"] = offset
+    return json
 
-    resp = await _spotify_put(token, "/me/player/play", json=json, params=params)
-    status = resp.status_code
-    # Spotify returns 204 No Content on success
-    if status == 204:
-        return JSONResponse({"status": "ok"}, status_code=200)
+
+# Compound transfer+play: tight per-call timeouts, a few quick server-side retries
+PLAY_ON_DEVICE_ATTEMPTS = 3
+PLAY_ON_DEVICE_TIMEOUT = httpx.Timeout(4.0, connect=2.0)
+
+
+@app.put("/api/spotify/play-on-device")
+async def spotify_play_on_device(request: Request):
+    """Resolve a target device, transfer playback to it and start playing, in one call.
+    Body: {device_id?, fallback_device_id?, uris? | context_uri?, offset?}
+    - Device order: `device_id`, then the active device, then `fallback_device_id`
+      (typically the browser's Web Playback SDK device).
+    - Transfer is skipped when the target is already active; a rejected play is
+      retried after re-transferring, with short backoff.
+    """
+    sid, token = await _ensure_access_token(request)
+    body = await request.json()
+    target = body.get("device_id")
+    active = None
     try:
-        return JSONResponse(resp.json(), status_code=status)
-    except Exception:
-        return JSONResponse({"status": "error", "message": resp.text}, status_code=status)
+        devices_resp = await _spotify_get(token, "/me/player/devices", timeout=PLAY_ON_DEVICE_TIMEOUT)
+    except httpx.TimeoutException:
+        devices_resp = None  # unknown active device: transfer to the target before playing
+    if devices_resp is not None and devices_resp.status_code == 200:
+        devices = devices_resp.json().get("devices") or []
+        active = next((d.get("id") for d in devices if d and d.get("is_active")), None)
+    target = target or active or body.get("fallback_device_id")
+    if not target:
+        raise HTTPException(status_code=404, detail="No playback device available")
+
+    payload = _play_payload(body)
+    needs_transfer = target != active
+    resp: Optional[httpx.Response] = None
+    for attempt in range(1, PLAY_ON_DEVICE_ATTEMPTS + 1):
+        try:
+            if needs_transfer:
+                await _spotify_put(
+                    token, "/me/player", json={"device_ids": [target], "play": True}, timeout=PLAY_ON_DEVICE_TIMEOUT
+                )
+            resp = await _spotify_put(
+                token, "/me/player/play", json=payload, params={"device_id": target}, timeout=PLAY_ON_DEVICE_TIMEOUT
+            )
+        except httpx.TimeoutException:
+            resp = None
+        if resp is not None and resp.status_code in (200, 202, 204):
+            _nudge_playback_pollers(sid)
+            return FastJSONResponse({"status": "ok", "device_id": target, "attempts": attempt})
+        if resp is not None and resp.status_code in (401, 403, 429):
+            break  # retrying won't help
+        needs_transfer = True  # device may have gone inactive; re-transfer before retrying
+        if attempt < PLAY_ON_DEVICE_ATTEMPTS:
+            await asyncio.sleep(0.2 * attempt)
+    if resp is None:
+        raise HTTPException(status_code=504, detail="Spotify did not respond in time")
+    return _spotify_error_response(resp)
+
 
 @app.put("/api/spotify/pause")
 async def spotify_pause(request: Request):
-    _, token = await _ensure_access_token(request)
+    sid, token = await _ensure_access_token(request)
     body = await request.json()
     device_id = body.get("device_id")
     params = {"device_id": device_id} if device_id else None
     resp = await _spotify_put(token, "/me/player/pause", params=params)
     status = resp.status_code
     if status == 204:
-        return JSONResponse({"status": "ok"}, status_code=200)
-    try:
-        return JSONResponse(resp.json(), status_code=status)
-    except Exception:
-        return JSONResponse({"status": "error", "message": resp.text}, status_code=status)
+        _nudge_playback_pollers(sid)
+        return FastJSONResponse({"status": "ok"}, status_code=200)
+    return _spotify_error_response(resp)
+
+# Idempotent playback commands (volume, seek): only the latest pending value per device is sent
+COMMAND_MIN_INTERVAL = float(os.getenv("COMMAND_MIN_INTERVAL", "0.2"))
+
+
+class _CommandSlot:
+    __slots__ = ("value", "send", "waiters", "task", "last_sent")
+
+    def __init__(self):
+        self.value: Any = None
+        self.send = None
+        self.waiters: List["asyncio.Future"] = []
+        self.task: Optional[asyncio.Task] = None
+        self.last_sent = 0.0
+
+
+class _CommandCoalescer:
+    """Latest-value-wins sender for idempotent commands, keyed by (session, command, device).
+    - At most one upstream call per key every COMMAND_MIN_INTERVAL seconds.
+    - Values submitted while a call is pending replace each other; every request in a
+      batch resolves with (applied value, upstream response) of the value actually sent.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._slots: Dict[Tuple[str, ...], _CommandSlot] = {}
+
+    async def submit(self, key: Tuple[str, ...], value: Any, send) -> Tuple[Any, httpx.Response]:
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = _CommandSlot()
+        fut = asyncio.get_running_loop().create_future()
+        slot.value, slot.send = value, send
+        slot.waiters.append(fut)
+        if slot.task is None:
+            slot.task = asyncio.create_task(self._drain(key, slot))
+        return await fut
+
+    async def _drain(self, key: Tuple[str, ...], slot: _CommandSlot) -> None:
+        try:
+            while slot.waiters:
+                wait = slot.last_sent + self.interval - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                value, send, waiters = slot.value, slot.send, slot.waiters
+                slot.waiters = []
+                slot.last_sent = time.monotonic()
+                try:
+                    resp = await send(value)
+                except Exception as e:
+                    for w in waiters:
+                        if not w.done():
+                            w.set_exception(e)
+                    continue
+                for w in waiters:
+                    if not w.done():
+                        w.set_result((value, resp))
+        finally:
+            slot.task = None
+            if not slot.waiters and self._slots.get(key) is slot:
+                # Keep the slot briefly so the rate interval still applies to the next burst
+                asyncio.get_running_loop().call_later(self.interval, self._expire, key, slot)
+
+    def _expire(self, key: Tuple[str, ...], slot: _CommandSlot) -> None:
+        if slot.task is None and not slot.waiters and self._slots.get(key) is slot:
+            self._slots.pop(key, None)
+
+
+_PLAYBACK_COMMANDS = _CommandCoalescer(COMMAND_MIN_INTERVAL)
+
 
 @app.put("/api/spotify/volume")
 async def spotify_volume(request: Request):
-    """Set volume for a Spotify device (0-100%)."""
-    _, token = await _ensure_access_token(request)
+    """Set volume for a Spotify device (0-100%).
+    Bursts (e.g. slider drags) are coalesced: only the latest value is sent upstream,
+    and superseded requests get the final applied volume back.
+    """
+    sid, token = await _ensure_access_token(request)
     body = await request.json()
     device_id = body.get("device_id")
     vol = body.get("volume_percent")
@@ -558,18 +2948,42 @@ async def spotify_volume(request: Request):
         vol_int = 50
     vol_int = max(0, min(100, vol_int))
 
-    params = {"volume_percent": vol_int}
-    if device_id:
-        params["device_id"] = device_id
+    async def send(value: int) -> httpx.Response:
+        params = {"volume_percent": value}
+        if device_id:
+            params["device_id"] = device_id
+        return await _spotify_put(token, "/me/player/volume", params=params)
 
-    resp = await _spotify_put(token, "/me/player/volume", params=params)
+    applied, resp = await _PLAYBACK_COMMANDS.submit((sid, "volume", device_id or ""), vol_int, send)
     status = resp.status_code
     if status in (200, 204):
-        return JSONResponse({"status": "ok", "volume_percent": vol_int}, status_code=200)
+        return FastJSONResponse({"status": "ok", "volume_percent": applied}, status_code=200)
+    return _spotify_error_response(resp)
+
+
+@app.put("/api/spotify/seek")
+async def spotify_seek(request: Request):
+    """Seek to `position_ms` on a Spotify device, coalesced like volume changes."""
+    sid, token = await _ensure_access_token(request)
+    body = await request.json()
+    device_id = body.get("device_id")
     try:
-        return JSONResponse(resp.json(), status_code=status)
+        position = max(0, int(body.get("position_ms")))
     except Exception:
-        return JSONResponse({"status": "error", "message": resp.text}, status_code=status)
+        raise HTTPException(status_code=400, detail="position_ms required")
+
+    async def send(value: int) -> httpx.Response:
+        params = {"position_ms": value}
+        if device_id:
+            params["device_id"] = device_id
+        return await _spotify_put(token, "/me/player/seek", params=params)
+
+    applied, resp = await _PLAYBACK_COMMANDS.submit((sid, "seek", device_id or ""), position, send)
+    status = resp.status_code
+    if status in (200, 204):
+        _nudge_playback_pollers(sid)
+        return FastJSONResponse({"status": "ok", "position_ms": applied}, status_code=200)
+    return _spotify_error_response(resp)
 
 
 @app.get("/api/spotify/me/tracks")
@@ -578,39 +2992,119 @@ async def spotify_liked_tracks(request: Request, limit: int = 50):
     resp = await _spotify_get(token, "/me/tracks", params={"limit": min(limit, 50)})
     if resp.status_code != 200:
         raise HTTPException(status_code=resp.status_code, detail=resp.text)
-    data = resp.json()
-    return JSONResponse(data)
+    return _passthrough(resp)
 
 
 @app.get("/api/spotify/playlists")
 async def spotify_playlists(request: Request, limit: int = 50):
-    _, token = await _ensure_access_token(request)
+    sid, token = await _ensure_access_token(request)
     resp = await _spotify_get(token, "/me/playlists", params={"limit": min(limit, 50)})
-    return JSONResponse(resp.json(), status_code=resp.status_code)
+    if resp.status_code == 200:
+        body = _json_loads(resp.content)
+        await _record_playlist_snapshots(await _spotify_account_id(sid, token), body.get("items") or [])
+    return _passthrough(resp)
 
 
 @app.get("/api/spotify/playlists/{playlist_id}/tracks")
 async def spotify_playlist_tracks(request: Request, playlist_id: str, limit: int = 100):
     _, token = await _ensure_access_token(request)
     resp = await _spotify_get(token, f"/playlists/{playlist_id}/tracks", params={"limit": min(limit, 100)})
-    return JSONResponse(resp.json(), status_code=resp.status_code)
+    return _passthrough(resp)
 
 
 @app.get("/api/spotify/playlists/{playlist_id}/songs")
-async def spotify_playlist_songs(request: Request, playlist_id: str, limit: int = 100):
-    _, token = await _ensure_access_token(request)
-    resp = await _spotify_get(token, f"/playlists/{playlist_id}/tracks", params={"limit": min(limit, 100)})
-    if resp.status_code != 200:
-        return JSONResponse(resp.json(), status_code=resp.status_code)
-    body = resp.json()
-    items: List[Dict[str, Any]] = body.get("items", [])
-    songs = [_map_spotify_track_to_song(item, i) for i, item in enumerate(items)]
-    return JSONResponse(songs)
+async def spotify_playlist_songs(request: Request, playlist_id: str, limit: Optional[int] = None, fields: Optional[str] = None):
+    """Every playlist track mapped to Song (the first `limit` when given), served from the
+    library store while the playlist's snapshot_id is unchanged."""
+    sid, token = await _ensure_access_token(request)
+    user = await _spotify_account_id(sid, token)
+    try:
+        songs = await _library_playlist_songs(user, token, playlist_id)
+    except _UpstreamError as e:
+        return _spotify_error_response(e.resp)
+    if limit is not None:
+        songs = songs[:max(0, limit)]
+    return _song_list_response(request, _numbered(songs), fields)
 
 
 # Map Spotify track to app Song shape
 
-def _map_spotify_track_to_song(track: Dict[str, Any], idx: int) -> Dict[str, Any]:
+class Song(TypedDict, total=False):
+    """Track shape served to the frontend (frontend/types.ts `Song`)."""
+
+    id: int
+    title: str
+    artist: str
+    album: str
+    albumArt: str
+    duration: int
+    audioUrl: Optional[str]
+    spotifyUri: Optional[str]
+
+
+# Just the parts of Spotify track objects that the Song mapping reads. With msgspec
+# installed, track pages are decoded against these types: every other field is skipped
+# by the parser instead of being built into dicts and thrown away.
+class _SpotifyImage(TypedDict, total=False):
+    url: str
+
+
+class _SpotifyAlbum(TypedDict, total=False):
+    name: Optional[str]
+    images: Optional[List[_SpotifyImage]]
+
+
+class _SpotifyArtist(TypedDict, total=False):
+    name: Optional[str]
+
+
+class _SpotifyTrack(TypedDict, total=False):
+    name: Optional[str]
+    uri: Optional[str]
+    duration_ms: Optional[int]
+    preview_url: Optional[str]
+    artists: Optional[List[Optional[_SpotifyArtist]]]
+    album: _SpotifyAlbum
+
+
+class _SpotifyTrackItem(TypedDict, total=False):
+    added_at: Optional[str]
+    track: Optional[_SpotifyTrack]
+
+
+class _SpotifyTrackPage(TypedDict, total=False):
+    total: int
+    items: List[Optional[_SpotifyTrackItem]]
+
+
+class _SpotifyTrackList(TypedDict, total=False):
+    items: List[Optional[_SpotifyTrack]]
+
+
+class _SpotifySearchResult(TypedDict, total=False):
+    tracks: _SpotifyTrackList
+
+
+if msgspec is not None:
+    _TRACK_PAGE_DECODER = msgspec.json.Decoder(_SpotifyTrackPage)
+    _SEARCH_RESULT_DECODER = msgspec.json.Decoder(_SpotifySearchResult)
+else:
+    _TRACK_PAGE_DECODER = _SEARCH_RESULT_DECODER = None
+
+
+def _decode_tracks(resp: httpx.Response, decoder: Any = None) -> Dict[str, Any]:
+    """Decode a Spotify track page (or search result), keeping only Song fields when
+    msgspec is available. Bodies that don't fit the types are decoded in full."""
+    decoder = decoder or _TRACK_PAGE_DECODER
+    if decoder is not None:
+        try:
+            return decoder.decode(resp.content)
+        except msgspec.ValidationError:
+            pass
+    return _json_loads(resp.content)
+
+
+def _map_spotify_track_to_song(track: Dict[str, Any], idx: int) -> Song:
     # Track object shape differs depending on endpoint; /me/tracks wraps inside item["track"]
     t = track.get("track") if "track" in track else track
     if not t:
@@ -641,17 +3135,43 @@ def _map_spotify_track_to_song(track: Dict[str, Any], idx: int) -> Dict[str, Any
     }
 
 
+SONG_FIELDS = ("id", "title", "artist", "album", "albumArt", "duration", "audioUrl", "spotifyUri")
+# Only what _map_spotify_track_to_song reads (plus paging), for /playlists/{id}/tracks
+SPOTIFY_PLAYLIST_TRACK_FIELDS = "total,items(added_at,track(name,uri,duration_ms,preview_url,artists(name),album(name,images(url))))"
+
+
+def _project_songs(songs: List[Dict[str, Any]], fields: Optional[str]) -> List[Dict[str, Any]]:
+    """Keep only the requested Song keys (`fields=title,artist,...`)."""
+    if not fields:
+        return songs
+    keep = [f for f in fields.split(",") if f in SONG_FIELDS]
+    if not keep:
+        raise HTTPException(status_code=400, detail=f"fields must name Song keys: {', '.join(SONG_FIELDS)}")
+    return [{k: song.get(k) for k in keep} for song in songs]
+
+
+def _song_list_response(request: Request, songs: List[Dict[str, Any]], fields: Optional[str] = None) -> Response:
+    """Song list as JSON with a content ETag; a matching If-None-Match gets a bodiless 304."""
+    resp = FastJSONResponse(_project_songs(songs, fields), headers={"Cache-Control": "private, no-cache"})
+    etag = '"' + hashlib.blake2b(resp.body, digest_size=12).hexdigest() + '"'
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+    resp.headers["ETag"] = etag
+    return resp
+
+
 @app.get("/api/songs")
-async def get_songs(request: Request):
+async def get_songs(request: Request, fields: Optional[str] = None):
     # If logged in, return liked tracks mapped to Song; otherwise return stub
     try:
         _, token = await _ensure_access_token(request)
         resp = await _spotify_get(token, "/me/tracks", params={"limit": 50})
         if resp.status_code == 200:
-            body = resp.json()
-            items: List[Dict[str, Any]] = body.get("items", [])
-            songs = [_map_spotify_track_to_song(item, i) for i, item in enumerate(items)]
-            return JSONResponse(songs)
+            with _Span("map"):
+                body = _decode_tracks(resp)
+                items: List[Dict[str, Any]] = body.get("items", [])
+                songs = [_map_spotify_track_to_song(item, i) for i, item in enumerate(items)]
+            return _song_list_response(request, songs, fields)
     except HTTPException:
         pass
 
@@ -685,78 +3205,753 @@ async def get_songs(request: Request):
             "audioUrl": None,
         },
     ]
-    return JSONResponse(sample)
+    return _song_list_response(request, sample, fields)
+
+
+# Full-library sync: the first page gives the total, the rest are fetched concurrently
+SPOTIFY_PAGE_CONCURRENCY = int(os.getenv("SPOTIFY_PAGE_CONCURRENCY", "4"))
+
+
+async def _spotify_pages(token: str, path: str, page_size: int, params: Optional[dict] = None):
+    """Yield (offset, page body) for every page of a Spotify paging object.
+    - Page 0 is yielded first; its `total` determines the remaining offsets.
+    - At most SPOTIFY_PAGE_CONCURRENCY later pages are in flight; they are yielded
+      as they complete (not in offset order), so memory stays flat.
+    - Raises _UpstreamError on the first non-200 page.
+    """
+    base = dict(params or {}, limit=page_size)
+
+    async def fetch(offset: int) -> Tuple[int, Dict[str, Any]]:
+        # Uncached: full syncs must see the playlist as of its current snapshot
+        resp = await _spotify_get(token, path, params=dict(base, offset=offset), cached=False)
+        if resp.status_code != 200:
+            raise _UpstreamError(resp)
+        return offset, _decode_tracks(resp)
+
+    offset, first = await fetch(0)
+    yield offset, first
+    offsets = iter(range(page_size, int(first.get("total") or 0), page_size))
+    pending: set = set()
+    try:
+        while True:
+            while len(pending) < SPOTIFY_PAGE_CONCURRENCY:
+                nxt = next(offsets, None)
+                if nxt is None:
+                    break
+                pending.add(asyncio.ensure_future(fetch(nxt)))
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _ndjson_song_stream(token: str, path: str, page_size: int, params: Optional[dict] = None):
+    """Stream a paged track collection as NDJSON Song lines, or a JSON error before any output."""
+    pages = _spotify_pages(token, path, page_size, params)
+    try:
+        first = await pages.__anext__()
+    except _UpstreamError as e:
+        return _spotify_error_response(e.resp)
+
+    async def lines():
+        page = first
+        try:
+            while True:
+                offset, body = page
+                items: List[Dict[str, Any]] = body.get("items", []) or []
+                with _Span("map"):
+                    chunk = b"".join(
+                        _json_dumps(_map_spotify_track_to_song(item, offset + i)) + b"\n" for i, item in enumerate(items)
+                    )
+                if chunk:
+                    yield chunk
+                page = await pages.__anext__()
+        except StopAsyncIteration:
+            pass
+        except _UpstreamError as e:
+            # Headers are already sent; report the failure as a final line
+            yield _json_text({"error": e.resp.text, "status": e.resp.status_code}) + "\n"
+        finally:
+            await pages.aclose()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.get("/api/songs/stream")
+async def stream_liked_songs(request: Request):
+    """Every liked track as NDJSON Song lines, streamed as pages arrive.
+    Song ids reflect library position, but lines may arrive out of order.
+    """
+    _, token = await _ensure_access_token(request)
+    return await _ndjson_song_stream(token, "/me/tracks", 50)
+
+
+@app.get("/api/spotify/playlists/{playlist_id}/songs/stream")
+async def stream_playlist_songs(request: Request, playlist_id: str):
+    """Every track of a playlist as NDJSON Song lines, streamed as pages arrive."""
+    _, token = await _ensure_access_token(request)
+    return await _ndjson_song_stream(token, f"/playlists/{playlist_id}/tracks", 100, {"fields": SPOTIFY_PLAYLIST_TRACK_FIELDS})
+
+
+# Per-user library store: playlists keyed by snapshot_id, liked tracks synced incrementally
+LIBRARY_CACHE_ENTRIES = int(os.getenv("LIBRARY_CACHE_ENTRIES", "1024"))
+# Redis entries expire after this long unused (every read pushes the expiry back)
+LIBRARY_TTL = int(os.getenv("LIBRARY_TTL", str(30 * 24 * 3600)))
+# A playlist's snapshot_id is re-checked once it is older than this
+PLAYLIST_SNAPSHOT_TTL = float(os.getenv("PLAYLIST_SNAPSHOT_TTL", "60"))
+
+
+class _LibraryStore:
+    """JSON values in Redis (preferred) with a bounded in-memory LRU fallback.
+    Keys used:
+    - library:{user}:snapshots         playlist id -> [snapshot_id, checked_at]
+    - library:{user}:playlist:{id}     {"snapshot_id", "songs"}
+    - library:{user}:liked             {"total", "anchor", "songs"}
+    Redis keys expire after LIBRARY_TTL without a read or write.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._local: "OrderedDict[str, Any]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        if _redis():
+            try:
+                pipe = REDIS.pipeline(transaction=False)
+                pipe.get(key)
+                pipe.expire(key, LIBRARY_TTL)
+                raw, _ = await pipe.execute()
+                return _json_loads(raw) if raw else None
+            except Exception as exc:
+                _redis_failed(exc)
+        val = self._local.get(key)
+        if val is not None:
+            self._local.move_to_end(key)
+        return val
+
+    async def set(self, key: str, value: Any) -> None:
+        if _redis():
+            try:
+                await REDIS.set(key, _json_text(value), ex=LIBRARY_TTL)
+                return
+            except Exception as exc:
+                _redis_failed(exc)
+        self._local[key] = value
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+
+LIBRARY = _LibraryStore(LIBRARY_CACHE_ENTRIES)
+
+
+def _numbered(songs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Assign 1-based positional ids to stored songs."""
+    return [dict(song, id=i + 1) for i, song in enumerate(songs)]
+
+
+async def _record_playlist_snapshots(user: str, playlists: List[Dict[str, Any]]) -> None:
+    key = f"library:{user}:snapshots"
+    snapshots = await LIBRARY.get(key) or {}
+    now = time.time()
+    changed = False
+    for p in playlists:
+        pid, snap = (p or {}).get("id"), (p or {}).get("snapshot_id")
+        if pid and snap:
+            snapshots[pid] = [snap, now]
+            changed = True
+    if changed:
+        await LIBRARY.set(key, snapshots)
+
+
+def _snapshot_entry(value: Any) -> Tuple[Optional[str], float]:
+    """(snapshot_id, checked_at); older entries are a bare snapshot_id with no check time."""
+    if isinstance(value, list) and len(value) == 2:
+        return value[0], float(value[1])
+    return value, 0.0
+
+
+async def _fetch_all_songs(token: str, path: str, page_size: int, params: Optional[dict] = None) -> List[Tuple[str, Dict[str, Any]]]:
+    """Fetch every page concurrently; return (added_at, song) pairs in collection order."""
+    indexed: List[Tuple[int, str, Dict[str, Any]]] = []
+    async for offset, body in _spotify_pages(token, path, page_size, params):
+        with _Span("map"):
+            for i, item in enumerate(body.get("items", []) or []):
+                indexed.append((offset + i, (item or {}).get("added_at") or "", _map_spotify_track_to_song(item or {}, offset + i)))
+    indexed.sort(key=lambda t: t[0])
+    return [(added_at, song) for _, added_at, song in indexed]
+
+
+async def _library_playlist_songs(user: str, token: str, playlist_id: str) -> List[Dict[str, Any]]:
+    """Return a playlist's songs, refetching only when its snapshot_id changed.
+    Snapshots are learned from /me/playlists listings. When a playlist was never listed,
+    or its snapshot is older than PLAYLIST_SNAPSHOT_TTL (followed playlists, ones past the
+    first listing page), a small `fields=snapshot_id` lookup refreshes it.
+    """
+    snapshots = await LIBRARY.get(f"library:{user}:snapshots") or {}
+    snapshot, checked_at = _snapshot_entry(snapshots.get(playlist_id))
+    if snapshot is None or time.time() - checked_at >= PLAYLIST_SNAPSHOT_TTL:
+        resp = await _spotify_get(token, f"/playlists/{playlist_id}", params={"fields": "snapshot_id"})
+        if resp.status_code != 200:
+            raise _UpstreamError(resp)
+        snapshot = resp.json().get("snapshot_id")
+        await _record_playlist_snapshots(user, [{"id": playlist_id, "snapshot_id": snapshot}])
+
+    key = f"library:{user}:playlist:{playlist_id}"
+    stored = await LIBRARY.get(key)
+    if stored and snapshot and stored.get("snapshot_id") == snapshot:
+        return stored["songs"]
+
+    songs = [song for _, song in await _fetch_all_songs(
+        token, f"/playlists/{playlist_id}/tracks", 100, {"fields": SPOTIFY_PLAYLIST_TRACK_FIELDS}
+    )]
+    await LIBRARY.set(key, {"snapshot_id": snapshot, "songs": songs})
+    return songs
+
+
+def _liked_key(added_at: str, song: Dict[str, Any]) -> List[str]:
+    return [added_at, song.get("spotifyUri") or ""]
+
+
+async def _library_liked_songs(user: str, token: str) -> List[Dict[str, Any]]:
+    """Return every liked track, syncing incrementally from the newest end.
+    /me/tracks is ordered by added_at (newest first), so new likes appear before the
+    stored anchor (the previously newest item). Pages are read until the anchor shows
+    up; if it is gone, or the total shows removals, a full concurrent resync runs.
+    """
+    key = f"library:{user}:liked"
+    stored = await LIBRARY.get(key)
+    if stored and stored.get("anchor"):
+        fresh: List[Tuple[str, Dict[str, Any]]] = []
+        offset, total, found = 0, None, False
+        while not found:
+            resp = await _spotify_get(token, "/me/tracks", params={"limit": 50, "offset": offset})
+            if resp.status_code != 200:
+                raise _UpstreamError(resp)
+            with _Span("map"):
+                body = _decode_tracks(resp)
+                total = int(body.get("total") or 0)
+                items = body.get("items", []) or []
+                for i, item in enumerate(items):
+                    song = _map_spotify_track_to_song(item or {}, offset + i)
+                    added_at = (item or {}).get("added_at") or ""
+                    if _liked_key(added_at, song) == stored["anchor"]:
+                        found = True
+                        break
+                    fresh.append((added_at, song))
+            offset += len(items)
+            if not items or offset >= total:
+                break
+        if found and total == stored["total"] + len(fresh):
+            if not fresh:
+                return stored["songs"]
+            songs = [song for _, song in fresh] + stored["songs"]
+            await LIBRARY.set(key, {"total": total, "anchor": _liked_key(*fresh[0]), "songs": songs})
+            return songs
+
+    pairs = await _fetch_all_songs(token, "/me/tracks", 50)
+    songs = [song for _, song in pairs]
+    anchor = _liked_key(*pairs[0]) if pairs else None
+    await LIBRARY.set(key, {"total": len(songs), "anchor": anchor, "songs": songs})
+    return songs
+
+
+@app.get("/api/library/liked")
+async def library_liked(request: Request, fields: Optional[str] = None):
+    """Every liked track mapped to Song, synced incrementally against the library store."""
+    sid, token = await _ensure_access_token(request)
+    user = await _spotify_account_id(sid, token)
+    try:
+        songs = await _library_liked_songs(user, token)
+    except _UpstreamError as e:
+        return _spotify_error_response(e.resp)
+    return _song_list_response(request, _numbered(songs), fields)
 
 
 @app.get("/api/spotify/current")
 async def spotify_current(request: Request):
     _, token = await _ensure_access_token(request)
+    return FastJSONResponse(await _fetch_current_state(token))
+
+
+async def _fetch_current_state(token: str) -> Dict[str, Any]:
+    """Fetch Spotify's currently-playing state mapped to the `/api/spotify/current` shape."""
     resp = await _spotify_get(token, "/me/player/currently-playing")
     # 204 means no content (nothing playing)
     if resp.status_code == 204:
-        return JSONResponse({"isPlaying": False, "progressMs": 0, "durationMs": 0, "track": None}, status_code=200)
+        return {"isPlaying": False, "progressMs": 0, "durationMs": 0, "track": None}
     # 403: Spotify Free accounts cannot access Connect playback state
     if resp.status_code == 403:
-        return JSONResponse({"isPlaying": False, "progressMs": 0, "durationMs": 0, "track": None, "error": "premium_required"}, status_code=200)
+        return {"isPlaying": False, "progressMs": 0, "durationMs": 0, "track": None, "error": "premium_required"}
     if resp.status_code != 200:
         raise HTTPException(status_code=resp.status_code, detail=resp.text)
-    body = resp.json()
+    body = _json_loads(resp.content)
     item = body.get("item")
     is_playing = bool(body.get("is_playing", False))
     progress_ms = int(body.get("progress_ms", 0) or 0)
     duration_ms = int((item or {}).get("duration_ms", 0) or 0)
     song = _map_spotify_track_to_song(item or {}, 0) if item else None
-    return JSONResponse({
+    return {
         "isPlaying": is_playing,
         "progressMs": progress_ms,
         "durationMs": duration_ms,
         "track": song,
-    })
+    }
+
 
+async def _spotify_account_id(sid: str, token: str) -> str:
+    """Return the Spotify user id for a session (cached on the session), or the sid if unknown."""
+    session = await _get_session(sid)
+    user_id = session.get("spotify_user_id")
+    if user_id:
+        return user_id
+    try:
+        resp = await _spotify_get(token, "/me")
+        user_id = resp.json().get("id") if resp.status_code == 200 else None
+    except Exception:
+        user_id = None
+    if not user_id:
+        return f"sid:{sid}"
+    await _update_session(sid, {"spotify_user_id": user_id})
+    return user_id
+
+
+# Shared playback pollers: one upstream poll loop per Spotify account, fanned out to every open stream
+PLAYBACK_POLL_INTERVAL = float(os.getenv("PLAYBACK_POLL_INTERVAL", "1.0"))
+PLAYBACK_IDLE_MAX_INTERVAL = float(os.getenv("PLAYBACK_IDLE_MAX_INTERVAL", "10"))
+# Progress drift beyond this (vs. interpolated progress) is reported as a seek
+PLAYBACK_SEEK_TOLERANCE_MS = 2500
+_PLAYBACK_POLLERS: Dict[str, "_PlaybackPoller"] = {}
+
+
+def _playback_event(prev: Optional[Dict[str, Any]], prev_at: float, cur: Dict[str, Any], now: float) -> Optional[str]:
+    """Classify the change between two playback snapshots, or None if nothing changed.
+    Progress is compared against the value interpolated from the previous snapshot, so
+    normal playback produces no events and only real jumps are reported as seeks.
+    """
+    if prev is None:
+        return "state"
+    prev_uri = (prev.get("track") or {}).get("spotifyUri")
+    cur_uri = (cur.get("track") or {}).get("spotifyUri")
+    if prev_uri != cur_uri:
+        return "track"
+    if prev.get("isPlaying") != cur.get("isPlaying"):
+        return "play" if cur.get("isPlaying") else "pause"
+    if prev.get("error") != cur.get("error"):
+        return "state"
+    expected = prev.get("progressMs", 0) + ((now - prev_at) * 1000 if prev.get("isPlaying") else 0)
+    if abs(cur.get("progressMs", 0) - expected) > PLAYBACK_SEEK_TOLERANCE_MS:
+        return "seek"
+    return None
+
+
+class _PlaybackPoller:
+    """Polls currently-playing for one account and pushes changes to subscriber queues.
+    - Polls at PLAYBACK_POLL_INTERVAL while playing; backs off up to
+      PLAYBACK_IDLE_MAX_INTERVAL while paused or idle.
+    - Stops once the last subscriber leaves.
+    """
 
-    
+    def __init__(self, account: str):
+        self.account = account
+        self.sids: Dict[str, int] = {}
+        self.subscribers: set = set()
+        self.state: Optional[Dict[str, Any]] = None
+        self.state_at = 0.0
+        self.wake = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def subscribe(self, sid: str) -> "asyncio.Queue":
+        q: asyncio.Queue = asyncio.Queue(maxsize=16)
+        self.sids[sid] = self.sids.get(sid, 0) + 1
+        self.subscribers.add(q)
+        if self.state is not None:
+            q.put_nowait(("state", self._snapshot()))
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+        return q
+
+    def unsubscribe(self, sid: str, q: "asyncio.Queue") -> None:
+        self.subscribers.discard(q)
+        n = self.sids.get(sid, 0) - 1
+        if n > 0:
+            self.sids[sid] = n
+        else:
+            self.sids.pop(sid, None)
+        if not self.subscribers:
+            self.wake.set()  # let the loop notice and exit
+
+    def _snapshot(self) -> Dict[str, Any]:
+        """Current state with progress interpolated up to now (for late joiners)."""
+        state = dict(self.state or {})
+        if state.get("isPlaying"):
+            progress = state.get("progressMs", 0) + int((time.time() - self.state_at) * 1000)
+            state["progressMs"] = min(progress, state.get("durationMs") or progress)
+        return state
+
+    def _publish(self, event: str, data: Dict[str, Any]) -> None:
+        for q in list(self.subscribers):
+            if q.full():
+                # Slow consumer: drop its oldest event, the newest state supersedes it
+                try:
+                    q.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            q.put_nowait((event, data))
+
+    async def _token(self) -> str:
+        for sid in reversed(list(self.sids)):
+            try:
+                return await _access_token_for_sid(sid)
+            except HTTPException:
+                continue
+        raise HTTPException(status_code=401, detail="Not authenticated with Spotify")
+
+    async def _run(self) -> None:
+        interval = PLAYBACK_POLL_INTERVAL
+        try:
+            while self.subscribers:
+                self.wake.clear()
+                try:
+                    state = await _fetch_current_state(await self._token())
+                except HTTPException as e:
+                    if e.status_code == 401:
+                        self._publish("error", {"status": 401, "detail": "Not authenticated with Spotify"})
+                        return
+                    interval = min(interval * 2, PLAYBACK_IDLE_MAX_INTERVAL)
+                except Exception:
+                    interval = min(interval * 2, PLAYBACK_IDLE_MAX_INTERVAL)
+                else:
+                    now = time.time()
+                    event = _playback_event(self.state, self.state_at, state, now)
+                    self.state, self.state_at = state, now
+                    if event:
+                        self._publish(event, state)
+                    if state.get("isPlaying") or event:
+                        interval = PLAYBACK_POLL_INTERVAL
+                    else:
+                        interval = min(interval * 1.5, PLAYBACK_IDLE_MAX_INTERVAL)
+                if not self.subscribers:
+                    break
+                try:
+                    await asyncio.wait_for(self.wake.wait(), timeout=interval)
+                    interval = PLAYBACK_POLL_INTERVAL  # woken by a playback command
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if _PLAYBACK_POLLERS.get(self.account) is self and not self.subscribers:
+                _PLAYBACK_POLLERS.pop(self.account, None)
+
+
+def _nudge_playback_pollers(sid: str) -> None:
+    """Ask pollers watching this session to re-poll now (after play/pause/transfer)."""
+    for poller in _PLAYBACK_POLLERS.values():
+        if sid in poller.sids:
+            poller.wake.set()
+
+
+@app.get("/api/spotify/current/stream")
+async def spotify_current_stream(request: Request):
+    """Server-sent events stream of playback changes.
+    - Each event carries the `/api/spotify/current` shape; the event name says what
+      changed (`state`, `track`, `play`, `pause`, `seek`), `error` ends the stream.
+    - Events are only sent on change; clients interpolate progress in between.
+    """
+    sid, token = await _ensure_access_token(request)
+    account = await _spotify_account_id(sid, token)
+    poller = _PLAYBACK_POLLERS.get(account)
+    if poller is None:
+        poller = _PLAYBACK_POLLERS[account] = _PlaybackPoller(account)
+    q = poller.subscribe(sid)
+
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(q.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event}\ndata: {_json_text(data)}\n\n"
+                if event == "error":
+                    break
+        finally:
+            poller.unsubscribe(sid, q)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
-# 30s TTL in-memory cache for spotify search
-_spotify_search_cache: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+# Search results: fresh for 30s, then served stale while refreshing in the background
+_SEARCH_CACHE = _TieredCache(
+    "search",
+    maxsize=int(os.getenv("SEARCH_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("SEARCH_CACHE_TTL", "30")),
+    stale_ttl=float(os.getenv("SEARCH_CACHE_STALE_TTL", "300")),
+)
 
 @app.get("/api/spotify/search")
-async def spotify_search(request: Request, q: str, limit: int = 20):
+async def spotify_search(request: Request, q: str, limit: int = 20, fields: Optional[str] = None):
     """Search tracks on Spotify and return results mapped to Song shape with short-lived caching."""
     _, token = await _ensure_access_token(request)
     query = (q or "").strip()
     if not query:
-        return JSONResponse([], status_code=200)
+        return FastJSONResponse([], status_code=200)
 
-    # Serve cached response if fresh
-    now = time.time()
-    cache_key = f"{query}:{min(limit, 50)}"
-    cached = _spotify_search_cache.get(cache_key)
-    if cached and (now - cached[0]) < 30:
-        return JSONResponse(cached[1])
+    limit = min(limit, 50)
 
-    params = {"q": query, "type": "track", "limit": min(limit, 50)}
-    resp = await _spotify_get(token, "/search", params=params)
-    status = resp.status_code
-    if status != 200:
+    async def load() -> List[Dict[str, Any]]:
+        params = {"q": query, "type": "track", "limit": limit}
+        resp = await _spotify_get(token, "/search", params=params)
+        if resp.status_code != 200:
+            raise _UpstreamError(resp)
+        with _Span("map"):
+            body = _decode_tracks(resp, _SEARCH_RESULT_DECODER) or {}
+            items = (body.get("tracks", {}) or {}).get("items", []) or []
+            return [_map_spotify_track_to_song(t, i) for i, t in enumerate(items)]
+
+    try:
+        songs = await _SEARCH_CACHE.get_or_load(f"{query.lower()}:{limit}", load)
+    except _UpstreamError as e:
+        return _spotify_error_response(e.resp)
+    return _song_list_response(request, songs, fields)
+
+
+# Batched reads: one session/token resolution, sub-requests dispatched concurrently in-process
+BATCH_MAX_REQUESTS = 20
+# Only these request headers are forwarded to sub-requests
+_BATCH_FORWARD_HEADERS = (b"cookie", b"host", b"user-agent", b"accept-language")
+
+
+async def _dispatch_subrequest(request: Request, item: Any, auth: Optional[Tuple[str, str]]) -> Dict[str, Any]:
+    """Run one GET sub-request through the app and capture its status and body."""
+    if not isinstance(item, dict) or not isinstance(item.get("path"), str):
+        return {"id": None, "status": 400, "body": {"detail": "Each request needs a path"}}
+    req_id = item.get("id")
+    path, _, query = item["path"].partition("?")
+    if (
+        not path.startswith("/api/")
+        or path.rstrip("/") == "/api/batch"
+        or path.endswith("/stream")
+        or (item.get("method") or "GET").upper() != "GET"
+    ):
+        return {"id": req_id, "status": 400, "body": {"detail": "Only non-streaming GET /api/ routes can be batched"}}
+    params = item.get("params") or {}
+    if not isinstance(params, dict):
+        return {"id": req_id, "status": 400, "body": {"detail": "params must be an object"}}
+    query_string = "&".join(q for q in (query, urlencode(params, doseq=True)) if q)
+
+    scope = {
+        "type": "http",
+        "asgi": request.scope.get("asgi", {"version": "3.0"}),
+        "http_version": request.scope.get("http_version", "1.1"),
+        "method": "GET",
+        "scheme": request.scope.get("scheme", "http"),
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": request.scope.get("root_path", ""),
+        "query_string": query_string.encode(),
+        "headers": [(k, v) for k, v in request.scope["headers"] if k in _BATCH_FORWARD_HEADERS],
+        "client": request.scope.get("client"),
+        "server": request.scope.get("server"),
+        "vinyl.auth": auth,
+    }
+    status = 500
+    content_type = ""
+    chunks: List[bytes] = []
+
+    async def receive() -> Dict[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Dict[str, Any]) -> None:
+        nonlocal status, content_type
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            for k, v in message.get("headers", []):
+                if k.lower() == b"content-type":
+                    content_type = v.decode("latin-1")
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        return {"id": req_id, "status": 500, "body": {"detail": "Internal Server Error"}}
+    raw = b"".join(chunks)
+    body: Any = raw.decode("utf-8", "replace")
+    if content_type.startswith("application/json"):
         try:
-            return JSONResponse(resp.json(), status_code=status)
-        except Exception:
-            return JSONResponse({"status": "error", "message": resp.text}, status_code=status)
-    body = resp.json() or {}
-    items = (body.get("tracks", {}) or {}).get("items", []) or []
-    songs = [_map_spotify_track_to_song(t, i) for i, t in enumerate(items)]
-    _spotify_search_cache[cache_key] = (now, songs)
-    return JSONResponse(songs)
+            body = _json_loads(raw) if raw else None
+        except ValueError:
+            pass
+    return {"id": req_id, "status": status, "body": body}
+
+
+@app.post("/api/batch")
+async def batch(request: Request):
+    """Run several GET API calls in one round trip.
+    Body: {"requests": [{"id"?, "path": "/api/spotify/me", "params"?: {...}}, ...]}
+    The session and access token are resolved once and shared by every sub-request;
+    results come back in order as {"responses": [{"id", "status", "body"}, ...]}.
+    """
+    body = await request.json()
+    items = body.get("requests") if isinstance(body, dict) else None
+    if not isinstance(items, list) or not items:
+        raise HTTPException(status_code=400, detail="requests must be a non-empty list")
+    if len(items) > BATCH_MAX_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_REQUESTS} requests per batch")
+    try:
+        auth: Optional[Tuple[str, str]] = await _ensure_access_token(request)
+    except HTTPException:
+        auth = None  # unauthenticated sub-requests answer for themselves (e.g. 401)
+    results = await asyncio.gather(*[_dispatch_subrequest(request, item, auth) for item in items])
+    return FastJSONResponse({"responses": results})
+
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Hit/miss counters and sizes for the in-process caches of this worker."""
+    return {
+        "search": dict(_SEARCH_CACHE.stats, size=len(_SEARCH_CACHE)),
+        "images": dict(IMAGE_CACHE.stats, memory_bytes=IMAGE_CACHE._memory_size, disk_bytes=IMAGE_CACHE._disk_size),
+        "palettes": {"size": len(_PALETTE_CACHE)},
+        "audio_features": dict(_AUDIO_FEATURES_CACHE.stats, size=len(_AUDIO_FEATURES_CACHE)),
+        "upstream": {cache.name.split(":", 1)[1]: dict(cache.stats, size=len(cache)) for _, cache in _UPSTREAM_POLICIES},
+    }
+
+# Audio features never change for a track, so they're cached for a long time and shared
+AUDIO_FEATURES_BATCH_SIZE = 100  # Spotify's limit for /audio-features?ids=
+AUDIO_FEATURES_BATCH_MAX = 1000
+AUDIO_FEATURES_BATCH_WINDOW = float(os.getenv("AUDIO_FEATURES_BATCH_WINDOW", "0.01"))
+_AUDIO_FEATURES_CACHE = _TieredCache(
+    "audio_features",
+    maxsize=int(os.getenv("AUDIO_FEATURES_CACHE_SIZE", "50000")),
+    ttl=30 * 24 * 3600,
+)
+
+
+def _track_id(track_id: Optional[str], uri: Optional[str]) -> Optional[str]:
+    if track_id:
+        return track_id
+    parts = (uri or "").split(":")
+    return parts[-1] if parts and parts[-1] else None
+
+
+async def _fetch_audio_features(token: str, ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Return features per id (None if Spotify has none), serving known ids from cache and
+    fetching the rest in concurrent 100-id upstream requests."""
+    results: Dict[str, Optional[Dict[str, Any]]] = {}
+    misses: List[str] = []
+    unique = list(dict.fromkeys(ids))
+    cached = await _AUDIO_FEATURES_CACHE.get_many(unique)
+    for tid in unique:
+        entry = cached.get(tid)
+        if entry is not None:
+            _AUDIO_FEATURES_CACHE.count("hits")
+            results[tid] = entry[1]
+        else:
+            _AUDIO_FEATURES_CACHE.count("misses")
+            misses.append(tid)
+
+    async def fetch(chunk: List[str]) -> None:
+        resp = await _spotify_get(token, "/audio-features", params={"ids": ",".join(chunk)})
+        if resp.status_code != 200:
+            raise _UpstreamError(resp)
+        features = _json_loads(resp.content).get("audio_features") or []
+        fetched = dict(zip(chunk, features + [None] * (len(chunk) - len(features))))
+        results.update(fetched)
+        await _AUDIO_FEATURES_CACHE.set_many(fetched)
+
+    chunks = [misses[i:i + AUDIO_FEATURES_BATCH_SIZE] for i in range(0, len(misses), AUDIO_FEATURES_BATCH_SIZE)]
+    await asyncio.gather(*[fetch(chunk) for chunk in chunks])
+    return results
+
+
+class _AudioFeaturesBatcher:
+    """Micro-batches single-track lookups: requests arriving within a short window
+    (per access token) are resolved together by one batch call."""
+
+    def __init__(self, window: float):
+        self.window = window
+        self._pending: Dict[str, Dict[str, List["asyncio.Future"]]] = {}
+
+    async def get(self, token: str, tid: str) -> Optional[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        batch = self._pending.get(token)
+        if batch is None:
+            batch = self._pending[token] = {}
+            loop.call_later(self.window, lambda: asyncio.ensure_future(self._flush(token, batch)))
+        fut = loop.create_future()
+        batch.setdefault(tid, []).append(fut)
+        if len(batch) >= AUDIO_FEATURES_BATCH_SIZE:
+            asyncio.ensure_future(self._flush(token, batch))
+        return await fut
+
+    async def _flush(self, token: str, batch: Dict[str, List["asyncio.Future"]]) -> None:
+        if self._pending.get(token) is not batch:
+            return  # already flushed (size limit reached before the window closed)
+        self._pending.pop(token, None)
+        try:
+            results = await _fetch_audio_features(token, list(batch))
+        except Exception as e:
+            for futs in batch.values():
+                for fut in futs:
+                    if not fut.done():
+                        fut.set_exception(e)
+            return
+        for tid, futs in batch.items():
+            for fut in futs:
+                if not fut.done():
+                    fut.set_result(results.get(tid))
+
+
+_AUDIO_FEATURES_BATCHER = _AudioFeaturesBatcher(AUDIO_FEATURES_BATCH_WINDOW)
+
 
 @app.get("/api/spotify/audio-features")
 async def spotify_audio_features(request: Request, track_id: Optional[str] = None, uri: Optional[str] = None):
     _, token = await _ensure_access_token(request)
-    tid = track_id
-    if not tid and uri:
-        parts = (uri or "").split(":")
-        tid = parts[-1] if parts else None
+    tid = _track_id(track_id, uri)
     if not tid:
         raise HTTPException(status_code=400, detail="track_id or uri required")
-    resp = await _spotify_get(token, f"/audio-features/{tid}")
-    return JSONResponse(resp.json(), status_code=resp.status_code)
\ No newline at end of file
+    entry = await _AUDIO_FEATURES_CACHE.get(tid)
+    if entry is not None:
+        _AUDIO_FEATURES_CACHE.count("hits")
+        features = entry[1]
+    else:
+        try:
+            features = await _AUDIO_FEATURES_BATCHER.get(token, tid)
+        except _UpstreamError as e:
+            return _spotify_error_response(e.resp)
+    if features is None:
+        return FastJSONResponse({"error": {"status": 404, "message": "analysis not found"}}, status_code=404)
+    return FastJSONResponse(features)
+
+
+@app.get("/api/spotify/audio-features/batch")
+async def spotify_audio_features_batch(request: Request, ids: Optional[str] = None, uris: Optional[str] = None):
+    """Audio features for many tracks: `ids` and/or `uris` as comma-separated lists.
+    Returns {"audio_features": [...]} in request order, with null for unknown tracks.
+    """
+    _, token = await _ensure_access_token(request)
+    wanted = [t for t in (ids or "").split(",") if t]
+    wanted += [tid for tid in (_track_id(None, u) for u in (uris or "").split(",") if u) if tid]
+    if not wanted:
+        raise HTTPException(status_code=400, detail="ids or uris required")
+    if len(wanted) > AUDIO_FEATURES_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {AUDIO_FEATURES_BATCH_MAX} tracks per request")
+    try:
+        results = await _fetch_audio_features(token, wanted)
+    except _UpstreamError as e:
+        return _spotify_error_response(e.resp)
+    return FastJSONResponse({"audio_features": [results.get(tid) for tid in wanted]})
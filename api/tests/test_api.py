@@ -1,17 +1,36 @@
+import io
 import json
+import os
+import asyncio
+import time
+import threading
+
+import httpx
+import pytest
 from fastapi.testclient import TestClient
 
 try:
     # Running tests from the repo root: import via package path
+    from api import main
     from api.main import app
 except Exception:
     # Running tests from within the api dir
+    import main  # type: ignore
     from main import app  # type: ignore
 
 
 client = TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def _fresh_spotify_client(monkeypatch):
+    # Rate-limiter state (buckets, Retry-After pauses) must not leak between tests
+    monkeypatch.setattr(main, "SPOTIFY_CLIENT", main._SpotifyClient())
+    # Cached Spotify responses are keyed by token, and tests share "old-token"
+    for _, cache in main._UPSTREAM_POLICIES:
+        monkeypatch.setattr(cache, "_entries", main.OrderedDict())
+
+
 def test_health():
     resp = client.get("/api/health")
     assert resp.status_code == 200
@@ -44,4 +63,1136 @@ def test_volume_requires_auth():
 
 def test_transfer_requires_auth():
     resp = client.put("/api/spotify/transfer", json={"device_id": "dummy", "play": True})
-    assert resp.status_code == 401
\ No newline at end of file
+    assert resp.status_code == 401
+
+def _seed_session(sid, expires_in=3600):
+    main.SESSIONS[sid] = main._SessionRecord.from_dict({
+        "spotify_tokens": {
+            "access_token": "old-token",
+            "refresh_token": "refresh-token",
+            "expires_at": time.time() + expires_in,
+        }
+    })
+
+
+def test_concurrent_token_refresh_is_coalesced(monkeypatch):
+    monkeypatch.setenv("SPOTIFY_CLIENT_ID", "cid")
+    monkeypatch.setenv("SPOTIFY_CLIENT_SECRET", "secret")
+    _seed_session("sid-refresh", expires_in=-10)
+    calls = []
+
+    async def token_endpoint(request):
+        calls.append(request)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"access_token": "new-token", "expires_in": 3600})
+
+    async def run():
+        monkeypatch.setattr(main, "SPOTIFY_ACCOUNTS_HTTP", httpx.AsyncClient(transport=httpx.MockTransport(token_endpoint)))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", cookies={"session_id": "sid-refresh"}) as c:
+            return await asyncio.gather(*[c.get("/api/spotify/token") for _ in range(8)])
+
+    responses = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(r.json()["access_token"] == "new-token" for r in responses)
+    assert main.SESSIONS["sid-refresh"].spotify_tokens["access_token"] == "new-token"
+
+
+def test_playback_event_classification():
+    track_a = {"spotifyUri": "spotify:track:a"}
+    playing = {"isPlaying": True, "progressMs": 10_000, "durationMs": 200_000, "track": track_a}
+    assert main._playback_event(None, 0, playing, 0) == "state"
+    # Normal progress after 1s of playback is not a change
+    assert main._playback_event(playing, 0, dict(playing, progressMs=11_000), 1.0) is None
+    assert main._playback_event(playing, 0, dict(playing, progressMs=90_000), 1.0) == "seek"
+    assert main._playback_event(playing, 0, dict(playing, isPlaying=False), 1.0) == "pause"
+    assert main._playback_event(playing, 0, dict(playing, track={"spotifyUri": "spotify:track:b"}), 1.0) == "track"
+
+
+def test_playback_poller_is_shared_between_subscribers(monkeypatch):
+    _seed_session("sid-stream-1")
+    _seed_session("sid-stream-2")
+    calls = []
+
+    def spotify_api(request):
+        calls.append(request.url.path)
+        return httpx.Response(200, json={
+            "is_playing": True,
+            "progress_ms": 1000,
+            "item": {"name": "Song", "uri": "spotify:track:x", "duration_ms": 180000, "artists": [], "album": {}},
+        })
+
+    async def run():
+        monkeypatch.setattr(main, "SPOTIFY_HTTP", httpx.AsyncClient(transport=httpx.MockTransport(spotify_api)))
+        poller = main._PlaybackPoller("user-1")
+        q1 = poller.subscribe("sid-stream-1")
+        q2 = poller.subscribe("sid-stream-2")
+        first = await asyncio.wait_for(q1.get(), 1)
+        second = await asyncio.wait_for(q2.get(), 1)
+        poller.unsubscribe("sid-stream-1", q1)
+        poller.unsubscribe("sid-stream-2", q2)
+        await asyncio.wait_for(poller.task, 1)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second
+    assert first[0] == "state" and first[1]["track"]["spotifyUri"] == "spotify:track:x"
+    assert calls == ["/v1/me/player/currently-playing"]
+
+
+def test_proxy_image_rejects_foreign_hosts():
+    resp = client.get("/api/proxy/image", params={"src": "https://example.com/a.jpg"})
+    assert resp.status_code == 400
+
+
+def test_proxy_image_caches_and_coalesces(monkeypatch, tmp_path):
+    src = "https://i.scdn.co/image/abc123"
+    calls = []
+
+    async def cdn(request):
+        calls.append(request.url)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, content=b"jpeg-bytes", headers={"content-type": "image/jpeg"})
+
+    cache = main._ImageCache(str(tmp_path), 1024 * 1024, 1024 * 1024)
+    monkeypatch.setattr(main, "IMAGE_CACHE", cache)
+
+    async def run():
+        monkeypatch.setattr(main, "IMAGE_HTTP", httpx.AsyncClient(transport=httpx.MockTransport(cdn)))
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+            misses = await asyncio.gather(*[c.get("/api/proxy/image", params={"src": src}) for _ in range(5)])
+            hit = await c.get("/api/proxy/image", params={"src": src})
+            etag = hit.headers["etag"]
+            not_modified = await c.get("/api/proxy/image", params={"src": src}, headers={"If-None-Match": etag})
+            cache._memory.clear()
+            cache._memory_size = 0
+            from_disk = await c.get("/api/proxy/image", params={"src": src})
+            return misses, hit, not_modified, from_disk
+
+    misses, hit, not_modified, from_disk = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(r.status_code == 200 and r.content == b"jpeg-bytes" for r in misses)
+    assert hit.content == b"jpeg-bytes"
+    assert not_modified.status_code == 304
+    assert from_disk.content == b"jpeg-bytes" and from_disk.headers["content-type"] == "image/jpeg"
+    assert cache.stats == {"memory_hits": 1, "disk_hits": 1, "misses": 1}
+
+
+def test_image_disk_index_is_scanned_off_the_event_loop(tmp_path, monkeypatch):
+    (tmp_path / "old.jpg").write_bytes(b"a" * 10)
+    (tmp_path / "new.png").write_bytes(b"b" * 10)
+    (tmp_path / "partial.tmp").write_bytes(b"c")
+    os.utime(tmp_path / "old.jpg", (1, 1))
+    cache = main._ImageCache(str(tmp_path), 1024, 1024)
+    loop_threads = []
+
+    def scan(directory):
+        loop_threads.append(threading.current_thread() is threading.main_thread())
+        return main._ImageCache._scan_directory(directory)
+
+    monkeypatch.setattr(cache, "_scan_directory", scan)
+
+    async def run():
+        await asyncio.gather(cache.load_disk_index(), cache.load_disk_index())
+        order = list(cache._disk)
+        return order, await cache.get_disk("new"), await cache.get_disk("old")
+
+    order, new, old = asyncio.run(run())
+    assert loop_threads == [False]
+    assert not (tmp_path / "partial.tmp").exists()
+    assert new == (str(tmp_path / "new.png"), "image/png")
+    assert old == (str(tmp_path / "old.jpg"), "image/jpeg")
+    assert order == ["old", "new"] and cache._disk_size == 20
+
+
+def test_proxy_image_variant_is_resized_and_cached(monkeypatch, tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+
+    buf = io.BytesIO()
+    Image.new("RGB", (640, 640), (200, 40, 40)).save(buf, format="JPEG")
+    calls = []
+
+    def cdn(request):
+        calls.append(request.url)
+        return httpx.Response(200, content=buf.getvalue(), headers={"content-type": "image/jpeg"})
+
+    monkeypatch.setattr(main, "IMAGE_CACHE", main._ImageCache(str(tmp_path), 1024 * 1024, 1024 * 1024))
+
+    async def run():
+        monkeypatch.setattr(main, "IMAGE_HTTP", httpx.AsyncClient(transport=httpx.MockTransport(cdn)))
+        params = {"src": "https://i.scdn.co/image/def456", "w": 100, "fmt": "webp"}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+            first = await c.get("/api/proxy/image", params=params)
+            second = await c.get("/api/proxy/image", params=params)
+            bad = await c.get("/api/proxy/image", params=dict(params, fmt="bmp"))
+            return first, second, bad
+
+    first, second, bad = asyncio.run(run())
+    assert first.status_code == 200 and first.headers["content-type"] == "image/webp"
+    assert Image.open(io.BytesIO(first.content)).size == (128, 128)
+    assert second.content == first.content
+    assert bad.status_code == 400
+    assert len(calls) == 1
+
+
+def test_art_palette_extracts_and_memoizes(monkeypatch, tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    im = Image.new("RGB", (64, 64), (255, 0, 0))
+    im.paste((0, 0, 255), (0, 0, 64, 16))  # a quarter blue
+    buf = io.BytesIO()
+    im.save(buf, format="PNG")
+    calls = []
+
+    def cdn(request):
+        calls.append(request.url)
+        return httpx.Response(200, content=buf.getvalue(), headers={"content-type": "image/png"})
+
+    monkeypatch.setattr(main, "IMAGE_CACHE", main._ImageCache(str(tmp_path), 1024 * 1024, 1024 * 1024))
+    monkeypatch.setattr(main, "_PALETTE_CACHE", main.OrderedDict())
+
+    async def run():
+        monkeypatch.setattr(main, "IMAGE_HTTP", httpx.AsyncClient(transport=httpx.MockTransport(cdn)))
+        src = "https://i.scdn.co/image/palette1"
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+            single = await c.get("/api/art/palette", params={"src": src, "k": 2})
+            batch = await c.post("/api/art/palette/batch", json={"srcs": [src, "https://example.com/x.jpg"], "k": 2})
+            return single, batch
+
+    single, batch = asyncio.run(run())
+    body = single.json()
+    assert body["dominant"] == "#ff0000"
+    assert [c["hex"] for c in body["palette"]] == ["#ff0000", "#0000ff"]
+    assert body["palette"][0]["weight"] == pytest.approx(0.75, abs=0.05)
+    palettes = batch.json()["palettes"]
+    assert palettes["https://i.scdn.co/image/palette1"] == body
+    assert palettes["https://example.com/x.jpg"]["status"] == 400
+    assert len(calls) == 1
+
+
+def test_palette_batch_rejects_malformed_bodies():
+    for body in (["https://i.scdn.co/image/a"], {"srcs": ["https://i.scdn.co/image/a"], "k": "abc"}, {"srcs": [{"u": 1}]}):
+        assert client.post("/api/art/palette/batch", json=body).status_code == 400
+
+
+def test_tiered_cache_coalesces_and_serves_stale():
+    cache = main._TieredCache("test", maxsize=2, ttl=0.05, stale_ttl=10, shared=False)
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        return len(loads)
+
+    async def run():
+        first = await asyncio.gather(*[cache.get_or_load("k", loader) for _ in range(5)])
+        fresh = await cache.get_or_load("k", loader)
+        await asyncio.sleep(0.06)
+        stale = await cache.get_or_load("k", loader)  # served stale, refresh starts
+        await asyncio.sleep(0.03)
+        refreshed = await cache.get_or_load("k", loader)
+        await cache.get_or_load("a", loader)
+        await cache.get_or_load("b", loader)  # evicts "k" (LRU, maxsize=2)
+        return first, fresh, stale, refreshed
+
+    first, fresh, stale, refreshed = asyncio.run(run())
+    assert first == [1] * 5 and fresh == 1 and stale == 1 and refreshed == 2
+    assert cache.peek("k") is None and len(cache) == 2
+    # Five coalesced callers each count as a miss, but only one load ran
+    assert cache.stats["misses"] == 7 and cache.stats["stale_hits"] == 1 and len(loads) == 4
+
+
+def test_playlist_song_stream_fetches_every_page(monkeypatch):
+    _seed_session("sid-sync")
+    offsets = []
+
+    def spotify_api(request):
+        offset = int(request.url.params["offset"])
+        offsets.append(offset)
+        items = [
+            {"track": {"name": f"Song {n}", "uri": f"spotify:track:{n}", "duration_ms": 1000, "artists": [], "album": {}}}
+            for n in range(offset, min(offset + 100, 250))
+        ]
+        return httpx.Response(200, json={"total": 250, "items": items})
+
+    async def run():
+        monkeypatch.setattr(main, "SPOTIFY_HTTP", httpx.AsyncClient(transport=httpx.MockTransport(spotify_api)))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", cookies={"session_id": "sid-sync"}) as c:
+            return await c.get("/api/spotify/playlists/p1/songs/stream")
+
+    resp = asyncio.run(run())
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    songs = [json.loads(line) for line in resp.text.splitlines()]
+    assert sorted(offsets) == [0, 100, 200]
+    assert sorted(s["id"] for s in songs) == list(range(1, 251))
+    assert all(s["spotifyUri"] == f"spotify:track:{s['id'] - 1}" for s in songs)
+
+
+def _track_item(n, added_at="2024-01-01T00:00:00Z"):
+    return {"added_at": added_at, "track": {"name": f"Song {n}", "uri": f"spotify:track:{n}", "duration_ms": 1000, "artists": [], "album": {}}}
+
+
+def _authed_client(monkeypatch, sid, handler, user="user-lib"):
+    _seed_session(sid)
+    main.SESSIONS[sid].spotify_user_id = user
+    monkeypatch.setattr(main, "SPOTIFY_HTTP", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", cookies={"session_id": sid})
+
+
+def test_playlist_songs_served_from_store_until_snapshot_changes(monkeypatch):
+    monkeypatch.setattr(main, "LIBRARY", main._LibraryStore(100))
+    state = {"snapshot": "s1"}
+    calls = []
+
+    def spotify_api(request):
+        calls.append(request.url.path)
+        if request.url.path == "/v1/me/playlists":
+            return httpx.Response(200, json={"items": [{"id": "p1", "snapshot_id": state["snapshot"]}]})
+        return httpx.Response(200, json={"total": 2, "items": [_track_item(1), _track_item(2)]})
+
+    async def run():
+        async with _authed_client(monkeypatch, "sid-lib", spotify_api) as c:
+            await c.get("/api/spotify/playlists")
+            first = await c.get("/api/spotify/playlists/p1/songs")
+            calls.clear()
+            again = await c.get("/api/spotify/playlists/p1/songs")
+            unchanged_calls = list(calls)
+            state["snapshot"] = "s2"
+            main._upstream_cache("/me/playlists")._entries.clear()  # its TTL has passed
+            await c.get("/api/spotify/playlists")
+            calls.clear()
+            await c.get("/api/spotify/playlists/p1/songs")
+            return first, again, unchanged_calls
+
+    first, again, unchanged_calls = asyncio.run(run())
+    assert [s["title"] for s in first.json()] == ["Song 1", "Song 2"]
+    assert again.json() == first.json()
+    assert unchanged_calls == []
+    assert calls == ["/v1/playlists/p1/tracks"]
+
+
+def test_playlist_songs_returns_every_track_unless_limited(monkeypatch):
+    monkeypatch.setattr(main, "LIBRARY", main._LibraryStore(100))
+
+    def spotify_api(request):
+        if request.url.path == "/v1/playlists/big":
+            return httpx.Response(200, json={"snapshot_id": "s1"})
+        offset = int(request.url.params.get("offset", 0))
+        items = [_track_item(n) for n in range(offset, min(offset + 100, 250))]
+        return httpx.Response(200, json={"total": 250, "items": items})
+
+    async def run():
+        async with _authed_client(monkeypatch, "sid-big", spotify_api) as c:
+            full = await c.get("/api/spotify/playlists/big/songs")
+            limited = await c.get("/api/spotify/playlists/big/songs", params={"limit": 20})
+            return full.json(), limited.json()
+
+    full, limited = asyncio.run(run())
+    assert len(full) == 250 and full[-1]["title"] == "Song 249"
+    assert limited == full[:20]
+
+
+def test_unlisted_playlist_snapshot_is_rechecked_after_ttl(monkeypatch):
+    monkeypatch.setattr(main, "LIBRARY", main._LibraryStore(100))
+    now = [1000.0]
+    monkeypatch.setattr(main.time, "time", lambda: now[0])
+    state = {"snapshot": "s1", "title": 1}
+    calls = []
+
+    def spotify_api(request):
+        calls.append(request.url.path)
+        if request.url.path == "/v1/playlists/followed":
+            return httpx.Response(200, json={"snapshot_id": state["snapshot"]})
+        return httpx.Response(200, json={"total": 1, "items": [_track_item(state["title"])]})
+
+    async def run():
+        async with _authed_client(monkeypatch, "sid-follow", spotify_api) as c:
+            await c.get("/api/spotify/playlists/followed/songs")
+            calls.clear()
+            cached = await c.get("/api/spotify/playlists/followed/songs")
+            within_ttl = list(calls)
+            state["snapshot"], state["title"] = "s2", 2
+            now[0] += main.PLAYLIST_SNAPSHOT_TTL
+            calls.clear()
+            edited = await c.get("/api/spotify/playlists/followed/songs")
+            return cached, within_ttl, edited
+
+    cached, within_ttl, edited = asyncio.run(run())
+    assert [s["title"] for s in cached.json()] == ["Song 1"] and within_ttl == []
+    assert calls == ["/v1/playlists/followed", "/v1/playlists/followed/tracks"]
+    assert [s["title"] for s in edited.json()] == ["Song 2"]
+
+
+def test_liked_library_syncs_incrementally(monkeypatch):
+    monkeypatch.setattr(main, "LIBRARY", main._LibraryStore(100))
+    library = [_track_item(n, f"2024-01-0{n}T00:00:00Z") for n in (3, 2, 1)]
+    offsets = []
+
+    def spotify_api(request):
+        offset = int(request.url.params["offset"])
+        limit = int(request.url.params["limit"])
+        offsets.append(offset)
+        return httpx.Response(200, json={"total": len(library), "items": library[offset:offset + limit]})
+
+    async def run():
+        async with _authed_client(monkeypatch, "sid-liked", spotify_api) as c:
+            first = await c.get("/api/library/liked")
+            library.insert(0, _track_item(4, "2024-01-04T00:00:00Z"))
+            offsets.clear()
+            second = await c.get("/api/library/liked")
+            return first, second
+
+    first, second = asyncio.run(run())
+    assert [s["title"] for s in first.json()] == ["Song 3", "Song 2", "Song 1"]
+    assert [s["title"] for s in second.json()] == ["Song 4", "Song 3", "Song 2", "Song 1"]
+    assert [s["id"] for s in second.json()] == [1, 2, 3, 4]
+    assert offsets == [0]
+
+
+def test_audio_features_single_lookups_are_micro_batched(monkeypatch):
+    monkeypatch.setattr(main, "_AUDIO_FEATURES_CACHE", main._TieredCache("af-test", 100, 3600, shared=False))
+    calls = []
+
+    def spotify_api(request):
+        ids = request.url.params["ids"].split(",")
+        calls.append(ids)
+        return httpx.Response(200, json={"audio_features": [None if i == "missing" else {"id": i, "tempo": 120} for i in ids]})
+
+    async def run():
+        async with _authed_client(monkeypatch, "sid-af", spotify_api) as c:
+            singles = await asyncio.gather(*[
+                c.get("/api/spotify/audio-features", params={"track_id": tid}) for tid in ("a", "b", "c", "missing")
+            ])
+            batch = await c.get("/api/spotify/audio-features/batch", params={"ids": "a,d", "uris": "spotify:track:b"})
+            return singles, batch
+
+    singles, batch = asyncio.run(run())
+    assert [r.status_code for r in singles] == [200, 200, 200, 404]
+    assert singles[0].json()["id"] == "a"
+    assert [f["id"] for f in batch.json()["audio_features"]] == ["a", "d", "b"]
+    # Four parallel single lookups became one upstream call; the batch only fetched the unknown id
+    assert sorted(calls[0]) == ["a", "b", "c", "missing"]
+    assert calls[1:] == [["d"]]
+
+
+def test_spotify_client_retries_after_429(monkeypatch):
+    responses = [httpx.Response(429, headers={"Retry-After": "0"}), httpx.Response(200, json={"id": "me"})]
+
+    def spotify_api(request):
+        return responses.pop(0)
+
+    async def run():
+        monkeypatch.setattr(main, "SPOTIFY_HTTP", httpx.AsyncClient(transport=httpx.MockTransport(spotify_api)))
+        spotify = main.SPOTIFY_CLIENT
+        limit_before = spotify.limiter.limit
+        resp = await main._spotify_get("token", "/me")
+        return resp, limit_before, spotify
+
+    resp, limit_before, spotify = asyncio.run(run())
+    assert resp.status_code == 200 and resp.json() == {"id": "me"}
+    assert spotify.stats == {"requests": 2, "throttled": 1, "retries": 1, "shed": 0}
+    assert spotify.limiter.limit < limit_before
+
+
+def test_spotify_client_fails_fast_during_long_block(monkeypatch):
+    calls = []
+
+    def spotify_api(request):
+        calls.append(request.url.path)
+        return httpx.Response(429, headers={"Retry-After": "60"})
+
+    async def run():
+        monkeypatch.setattr(main, "SPOTIFY_HTTP", httpx.AsyncClient(transport=httpx.MockTransport(spotify_api)))
+        first = await main._spotify_get("token", "/me")
+        started = time.monotonic()
+        # A different user's playback command must not sleep out the 60 s block
+        second = await main._spotify_put("other-token", "/me/player/pause")
+        return first, second, time.monotonic() - started
+
+    first, second, elapsed = asyncio.run(run())
+    assert first.status_code == 429 and first.headers["retry-after"] == "60"
+    assert second.status_code == 429 and 55 <= int(second.headers["retry-after"]) <= 60
+    assert elapsed < 1 and calls == ["/v1/me"]
+    assert main.SPOTIFY_CLIENT.stats["shed"] == 1
+
+
+def test_spotify_client_sheds_deep_bucket_backlog(monkeypatch):
+    monkeypatch.setattr(main, "SPOTIFY_USER_RPS", 1.0)
+    monkeypatch.setattr(main, "SPOTIFY_USER_BURST", 1.0)
+    monkeypatch.setattr(main, "SPOTIFY_MAX_RETRY_AFTER", 0.5)
+    monkeypatch.setattr(main, "SPOTIFY_CLIENT", main._SpotifyClient())
+
+    def spotify_api(request):
+        return httpx.Response(204)
+
+    async def run():
+        monkeypatch.setattr(main, "SPOTIFY_HTTP", httpx.AsyncClient(transport=httpx.MockTransport(spotify_api)))
+        return [await main._spotify_put("token", "/me/player/pause") for _ in range(2)]
+
+    ok, shed = asyncio.run(run())
+    assert ok.status_code == 204 and shed.status_code == 429
+    # The refused reservation was handed back, so the bucket isn't pushed further into the future
+    assert main.SPOTIFY_CLIENT._user_bucket("token").tokens > -1
+
+
+def test_aimd_limiter_lets_commands_jump_the_queue():
+    async def run():
+        limiter = main._AIMDLimiter(initial=1, minimum=1)
+        await limiter.acquire(1)
+        order = []
+
+        async def waiter(name, priority):
+            await limiter.acquire(priority)
+            order.append(name)
+            limiter.release()
+
+        tasks = [asyncio.ensure_future(waiter("read", 1)), asyncio.ensure_future(waiter("command", 0))]
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(run()) == ["command", "read"]
+
+
+def test_command_coalescer_sends_only_latest_value():
+    sent = []
+
+    async def send(value):
+        sent.append(value)
+        await asyncio.sleep(0.02)
+        return httpx.Response(204)
+
+    async def run():
+        coalescer = main._CommandCoalescer(0.05)
+        first = asyncio.ensure_future(coalescer.submit(("sid", "volume", ""), 10, send))
+        await asyncio.sleep(0)  # first value goes out immediately
+        burst = [asyncio.ensure_future(coalescer.submit(("sid", "volume", ""), v, send)) for v in (20, 30, 40, 50)]
+        return await first, await asyncio.gather(*burst)
+
+    first, burst = asyncio.run(run())
+    assert sent == [10, 50]
+    assert first[0] == 10
+    assert [applied for applied, _ in burst] == [50, 50, 50, 50]
+
+
+def test_seek_requires_position():
+    _seed_session("sid-seek")
+    resp = client.put("/api/spotify/seek", json={}, headers={"Cookie": "session_id=sid-seek"})
+    assert resp.status_code == 400
+
+
+def test_play_on_device_resolves_transfers_and_retries(monkeypatch):
+    calls = []
+    play_statuses = [502, 204]
+
+    def spotify_api(request):
+        calls.append((request.method, request.url.path))
+        if request.url.path == "/v1/me/player/devices":
+            return httpx.Response(200, json={"devices": [{"id": "dev-a", "is_active": True}]})
+        if request.url.path == "/v1/me/player/play":
+            assert request.url.params["device_id"] == "dev-a"
+            return httpx.Response(play_statuses.pop(0))
+        return httpx.Response(204)
+
+    async def run():
+        async with _authed_client(monkeypatch, "sid-pod", spotify_api) as c:
+            return await c.put("/api/spotify/play-on-device", json={"fallback_device_id": "sdk", "uris": ["spotify:track:1"]})
+
+    resp = asyncio.run(run())
+    assert resp.json() == {"status": "ok", "device_id": "dev-a", "attempts": 2}
+    # Already-active device skips the first transfer; the retry re-transfers
+    assert calls == [
+        ("GET", "/v1/me/player/devices"),
+        ("PUT", "/v1/me/player/play"),
+        ("PUT", "/v1/me/player"),
+        ("PUT", "/v1/me/player/play"),
+    ]
+
+
+def test_play_on_device_survives_device_lookup_timeout(monkeypatch):
+    calls = []
+
+    def spotify_api(request):
+        calls.append((request.method, request.url.path))
+        if request.url.path == "/v1/me/player/devices":
+            raise httpx.ReadTimeout("devices timed out", request=request)
+        return httpx.Response(204)
+
+    async def run():
+        async with _authed_client(monkeypatch, "sid-pod-t", spotify_api) as c:
+            return await c.put("/api/spotify/play-on-device", json={"device_id": "dev-b", "uris": ["spotify:track:1"]})
+
+    resp = asyncio.run(run())
+    assert resp.status_code == 200
+    assert resp.json() == {"status": "ok", "device_id": "dev-b", "attempts": 1}
+    # Without knowing the active device, the target is transferred to first
+    assert calls[-2:] == [("PUT", "/v1/me/player"), ("PUT", "/v1/me/player/play")]
+
+
+def test_batch_resolves_auth_once_and_fans_out(monkeypatch):
+    lookups = []
+    real_get_session = main._get_session
+
+    async def counting_get_session(sid):
+        lookups.append(sid)
+        return await real_get_session(sid)
+
+    def spotify_api(request):
+        if request.url.path == "/v1/me":
+            return httpx.Response(200, json={"id": "user-batch"})
+        return httpx.Response(200, json={"devices": []})
+
+    async def run():
+        async with _authed_client(monkeypatch, "sid-batch", spotify_api) as c:
+            monkeypatch.setattr(main, "_get_session", counting_get_session)
+            return await c.post("/api/batch", json={"requests": [
+                {"id": "status", "path": "/api/auth/status"},
+                {"id": "me", "path": "/api/spotify/me"},
+                {"id": "token", "path": "/api/spotify/token"},
+                {"id": "devices", "path": "/api/spotify/devices"},
+                {"id": "bad", "path": "/api/batch"},
+            ]})
+
+    resp = asyncio.run(run())
+    results = {r["id"]: r for r in resp.json()["responses"]}
+    assert results["status"]["body"] == {"authenticated": True}
+    assert results["me"]["body"] == {"id": "user-batch"}
+    assert results["token"]["body"] == {"access_token": "old-token"}
+    assert results["devices"]["status"] == 200
+    assert results["bad"]["status"] == 400
+    assert lookups == ["sid-batch"]
+
+
+def test_batch_without_auth_returns_per_item_401():
+    resp = client.post("/api/batch", json={"requests": [{"path": "/api/spotify/me"}, {"path": "/api/health"}]})
+    assert resp.status_code == 200
+    assert [r["status"] for r in resp.json()["responses"]] == [401, 200]
+
+
+def test_batch_rejects_non_object_params_per_item():
+    resp = client.post("/api/batch", json={"requests": [
+        {"id": "bad", "path": "/api/health", "params": "x=1"},
+        {"id": "ok", "path": "/api/health", "params": {"x": 1}},
+    ]})
+    assert resp.status_code == 200
+    assert [(r["id"], r["status"]) for r in resp.json()["responses"]] == [("bad", 400), ("ok", 200)]
+
+
+def test_redis_session_hash_cache_and_invalidation(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+
+    async def run():
+        server = fakeredis.FakeServer()
+        r = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+        peer = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+        monkeypatch.setattr(main, "REDIS", r)
+        monkeypatch.setattr(main, "_SESSION_CACHE", main.OrderedDict())
+
+        # Legacy JSON-string sessions are migrated to hashes on first read
+        await r.set("session:sid-h", json.dumps({"spotify_user_id": "u1"}))
+        assert await main._get_session("sid-h") == {"spotify_user_id": "u1"}
+        assert await r.type("session:sid-h") == "hash"
+
+        await main._update_session("sid-h", {"auth_popup": True}, oauth_state="st-1")
+        assert await r.hget("session:sid-h", "spotify_user_id") == '"u1"'
+        assert await main._get_state_sid("st-1") == "sid-h"
+
+        listener = asyncio.create_task(main._session_invalidation_listener())
+        await asyncio.sleep(0.05)
+        # A peer worker writes directly; the local copy is stale until its invalidation arrives
+        await peer.hset("session:sid-h", "spotify_user_id", '"u2"')
+        assert (await main._get_session("sid-h"))["spotify_user_id"] == "u1"
+        await peer.publish(main.SESSION_INVALIDATION_CHANNEL, "peer:sid-h")
+        await asyncio.sleep(0.05)
+        session = await main._get_session("sid-h")
+        listener.cancel()
+        return session
+
+    assert asyncio.run(run()) == {"spotify_user_id": "u2", "auth_popup": True}
+
+
+def test_redis_breaker_opens_and_writes_back_on_recovery(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    breaker = main._CircuitBreaker(threshold=2, window=10)
+
+    async def run():
+        server = fakeredis.FakeServer()
+        r = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+        monkeypatch.setattr(main, "REDIS", r)
+        monkeypatch.setattr(main, "REDIS_BREAKER", breaker)
+        monkeypatch.setattr(main, "REDIS_PROBE_INTERVAL", 0.01)
+        monkeypatch.setattr(main, "SESSIONS", main._TTLStore(60, 100))
+        monkeypatch.setattr(main, "OAUTH_STATE_TO_SID", main._TTLStore(60, 100))
+        monkeypatch.setattr(main, "_SESSION_CACHE", main.OrderedDict())
+
+        server.connected = False
+        await main._update_session("sid-o", {"auth_popup": True}, oauth_state="st-o")
+        await main._ensure_session("sid-o")
+        assert breaker.state == "open"
+        # While open, Redis is not touched at all
+        await main._update_session("sid-o", {"spotify_user_id": "u-o"})
+        assert breaker.stats["short_circuits"] == 1
+        assert main.SESSIONS["sid-o"].to_dict() == {"auth_popup": True, "spotify_user_id": "u-o"}
+
+        server.connected = True
+        for _ in range(50):
+            await asyncio.sleep(0.01)
+            if breaker.state == "closed":
+                break
+        assert len(main.SESSIONS) == 0 and len(main.OAUTH_STATE_TO_SID) == 0
+        return await main._get_session("sid-o"), await main._get_state_sid("st-o")
+
+    session, state_sid = asyncio.run(run())
+    assert session == {"auth_popup": True, "spotify_user_id": "u-o"}
+    assert state_sid == "sid-o"
+    assert client.get("/api/health").json()["redis"]["opens"] == 1
+
+
+def test_idle_pubsub_read_timeouts_do_not_trip_the_breaker(monkeypatch):
+    redis = pytest.importorskip("redis")
+    breaker = main._CircuitBreaker(threshold=1, window=10)
+    subscriptions = []
+
+    class IdlePubSub:
+        async def subscribe(self, *channels):
+            subscriptions.append(channels)
+
+        async def listen(self):
+            raise redis.TimeoutError("Timeout reading from socket")
+            yield  # pragma: no cover
+
+        async def aclose(self):
+            pass
+
+    class Client:
+        def pubsub(self):
+            return IdlePubSub()
+
+    real_sleep = asyncio.sleep
+
+    async def no_wait(_seconds):
+        await real_sleep(0)
+
+    async def run():
+        monkeypatch.setattr(main, "REDIS_PUBSUB", Client())
+        monkeypatch.setattr(main, "REDIS_BREAKER", breaker)
+        monkeypatch.setattr(main.asyncio, "sleep", no_wait)
+        listener = asyncio.ensure_future(main._session_invalidation_listener())
+        for _ in range(20):
+            await no_wait(0)
+        listener.cancel()
+
+    asyncio.run(run())
+    assert len(subscriptions) > 1  # resubscribed after each timeout
+    assert breaker.state == "closed" and breaker.stats["failures"] == 0
+
+
+def test_ttl_store_expires_and_caps_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(main.time, "monotonic", lambda: now[0])
+    store = main._TTLStore(ttl=10, max_entries=3, sliding=True)
+    store.set("short", 1, ttl=2)
+    store.set("a", "a")
+    store.set("b", "b")
+    now[0] += 5
+    assert "short" not in store
+    assert store.get("a") == "a"  # sliding: now expires at t+15
+    now[0] += 7
+    assert store.get("b") is None and store.get("a") == "a"
+    assert store.stats["expired"] == 2 and len(store._wheel) == 1
+    for key in ("c", "d", "e"):
+        store.set(key, key)
+    assert [k for k, _ in store.items()] == ["c", "d", "e"]
+    assert store.stats["evicted"] == 1
+    # A long idle gap sweeps everything without walking every tick
+    now[0] += 10 ** 9
+    assert len(store) == 0 and store._wheel == {}
+
+
+def test_memory_sessions_without_login_use_short_ttl():
+    sid = "sid-anon"
+    asyncio.run(main._ensure_session(sid))
+    assert main.SESSIONS._entries[sid].ttl == main.SESSION_ANON_TTL
+    _seed_session(sid)
+    asyncio.run(main._update_session(sid, {"auth_popup": False}))
+    assert main.SESSIONS._entries[sid].ttl == main.SESSION_TTL
+
+
+def test_sqlite_sessions_are_shared_between_workers(monkeypatch, tmp_path):
+    path = str(tmp_path / "sessions.db")
+    worker_a, worker_b = main._SQLiteSessions(path), main._SQLiteSessions(path)
+    monkeypatch.setattr(main, "LOCAL_SESSIONS", worker_a)
+
+    # Login lands on worker A...
+    asyncio.run(main._ensure_session("sid-sql"))
+    asyncio.run(main._update_session("sid-sql", {"spotify_oauth_state": "st"}, oauth_state="st"))
+    # ...and the OAuth callback on worker B
+    monkeypatch.setattr(main, "LOCAL_SESSIONS", worker_b)
+    assert asyncio.run(main._get_state_sid("st")) == "sid-sql"
+    asyncio.run(main._update_session("sid-sql", {"spotify_tokens": {"access_token": "t"}}))
+
+    assert worker_a.get("sid-sql") == {"spotify_oauth_state": "st", "spotify_tokens": {"access_token": "t"}}
+    assert worker_a._conn().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    asyncio.run(main._delete_session("sid-sql"))
+    assert asyncio.run(main._get_session("sid-sql")) == {}
+
+
+def test_sqlite_session_write_lock_does_not_block_event_loop(monkeypatch, tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "sessions.db")
+    store = main._SQLiteSessions(path)
+    monkeypatch.setattr(main, "LOCAL_SESSIONS", store)
+    asyncio.run(main._ensure_session("sid-lock"))
+    other_worker = sqlite3.connect(path, isolation_level=None)
+
+    async def run():
+        other_worker.execute("BEGIN IMMEDIATE")
+        update = asyncio.create_task(main._update_session("sid-lock", {"auth_popup": True}))
+        ticks = 0
+        for _ in range(10):
+            await asyncio.sleep(0.02)
+            ticks += 1
+        assert not update.done()
+        other_worker.execute("COMMIT")
+        await update
+        return ticks
+
+    try:
+        assert asyncio.run(run()) == 10
+    finally:
+        other_worker.close()
+        store.close()
+    assert store.get("sid-lock") == {"auth_popup": True}
+
+
+def test_upstream_cache_revalidates_and_invalidates_on_writes(monkeypatch):
+    calls = []
+
+    def spotify_api(request):
+        calls.append((request.method, request.url.path, request.headers.get("if-none-match")))
+        if request.url.path == "/v1/me/player/devices":
+            return httpx.Response(200, json={"devices": [{"id": f"d{len(calls)}"}]})
+        if request.url.path == "/v1/me/playlists":
+            if request.headers.get("if-none-match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, json={"items": []}, headers={"ETag": '"v1"'})
+        return httpx.Response(204)
+
+    async def run():
+        async with _authed_client(monkeypatch, "sid-up", spotify_api) as c:
+            devices = [(await c.get("/api/spotify/devices")).json() for _ in range(2)]
+            await c.put("/api/spotify/transfer", json={"device_id": "d1"})
+            devices.append((await c.get("/api/spotify/devices")).json())
+            await c.get("/api/spotify/playlists")
+            entries = main._upstream_cache("/me/playlists")._entries
+            for key, (stored_at, value) in list(entries.items()):
+                entries[key] = (stored_at - 61, value)  # past the 60 s TTL
+            playlists = await c.get("/api/spotify/playlists")
+            return devices, playlists
+
+    devices, playlists = asyncio.run(run())
+    assert devices[0] == devices[1] != devices[2]
+    assert playlists.status_code == 200 and playlists.json() == {"items": []}
+    assert calls == [
+        ("GET", "/v1/me/player/devices", None),
+        ("PUT", "/v1/me/player", None),
+        ("GET", "/v1/me/player/devices", None),
+        ("GET", "/v1/me/playlists", None),
+        ("GET", "/v1/me/playlists", '"v1"'),
+    ]
+    stats = client.get("/api/cache/stats").json()["upstream"]
+    assert stats["playlists"]["revalidated"] == 1 and stats["devices"]["hits"] == 1
+
+
+def test_song_lists_support_fields_and_conditional_requests(monkeypatch):
+    monkeypatch.setattr(main, "LIBRARY", main._LibraryStore(100))
+    upstream_fields = []
+
+    def spotify_api(request):
+        if request.url.path == "/v1/playlists/p9":
+            return httpx.Response(200, json={"snapshot_id": "s9"})
+        upstream_fields.append(request.url.params.get("fields"))
+        return httpx.Response(200, json={"total": 1, "items": [_track_item(1)]})
+
+    async def run():
+        async with _authed_client(monkeypatch, "sid-etag", spotify_api) as c:
+            first = await c.get("/api/spotify/playlists/p9/songs", params={"fields": "title,spotifyUri"})
+            again = await c.get(
+                "/api/spotify/playlists/p9/songs",
+                params={"fields": "title,spotifyUri"},
+                headers={"If-None-Match": first.headers["etag"]},
+            )
+            bad = await c.get("/api/spotify/playlists/p9/songs", params={"fields": "nope"})
+            return first, again, bad
+
+    first, again, bad = asyncio.run(run())
+    assert first.json() == [{"title": "Song 1", "spotifyUri": "spotify:track:1"}]
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["etag"] == first.headers["etag"]
+    assert bad.status_code == 400
+    assert upstream_fields == [main.SPOTIFY_PLAYLIST_TRACK_FIELDS]
+
+
+def test_track_pages_decode_only_song_fields():
+    page = {"total": 1, "items": [dict(_track_item(1), extra="x")]}
+    page["items"][0]["track"]["popularity"] = 50
+    body = main._decode_tracks(httpx.Response(200, json=page))
+    song = main._map_spotify_track_to_song(body["items"][0], 0)
+    assert song["title"] == "Song 1" and song["spotifyUri"] == "spotify:track:1"
+    if main.msgspec is not None:
+        assert "popularity" not in body["items"][0]["track"]
+    # A shape the typed decoder doesn't expect still decodes
+    odd = main._decode_tracks(httpx.Response(200, json={"total": "1", "items": []}))
+    assert odd == {"total": "1", "items": []}
+
+
+def test_token_refresher_refreshes_active_sessions_ahead_of_expiry(monkeypatch):
+    monkeypatch.setenv("SPOTIFY_CLIENT_ID", "cid")
+    monkeypatch.setenv("SPOTIFY_CLIENT_SECRET", "secret")
+    monkeypatch.setattr(main, "TOKEN_REFRESHER", main._TokenRefreshScheduler())
+    monkeypatch.setattr(main, "TOKEN_REFRESH_CONCURRENCY", 1)
+    refreshed = []
+
+    def accounts(request):
+        refreshed.append(request)
+        return httpx.Response(200, json={"access_token": f"fresh-{len(refreshed)}", "expires_in": 3600})
+
+    monkeypatch.setattr(main, "SPOTIFY_ACCOUNTS_HTTP", httpx.AsyncClient(transport=httpx.MockTransport(accounts)))
+    for sid in ("sid-ahead-1", "sid-ahead-2", "sid-idle"):
+        _seed_session(sid, expires_in=120)  # inside the refresh-ahead window, still usable
+
+    async def run():
+        # Requests are served the current token without waiting on a refresh
+        tokens = [await main._access_token_for_sid(sid) for sid in ("sid-ahead-1", "sid-ahead-2")]
+        main.TOKEN_REFRESHER.schedule("sid-idle", main.SESSIONS["sid-idle"].spotify_tokens["expires_at"])
+        first = await main.TOKEN_REFRESHER.tick()
+        assert len(first) == 1 and await main.TOKEN_REFRESHER.tick() == []  # concurrency bound
+        await asyncio.gather(*first)
+        rest = []
+        while True:
+            started = await main.TOKEN_REFRESHER.tick()
+            if not started:
+                break
+            rest += started
+            await asyncio.gather(*started)
+        return tokens, len(rest)
+
+    tokens, rest = asyncio.run(run())
+    assert tokens == ["old-token", "old-token"] and rest == 2
+    assert len(refreshed) == 2
+    assert main.TOKEN_REFRESHER.stats == {"refreshed": 2, "failed": 0, "idle": 1}
+    assert main.SESSIONS["sid-ahead-1"].spotify_tokens["access_token"].startswith("fresh-")
+    assert main.SESSIONS["sid-idle"].spotify_tokens["access_token"] == "old-token"
+
+
+def test_metrics_expose_route_and_upstream_series(monkeypatch):
+    pytest.importorskip("prometheus_client")
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+
+    def spotify_api(request):
+        return httpx.Response(200, json={"items": [{"id": "p1", "snapshot_id": "s1"}]})
+
+    async def run():
+        async with _authed_client(monkeypatch, "sid-metrics", spotify_api) as c:
+            await c.get("/api/spotify/playlists")
+            return await c.get("/metrics")
+
+    r = asyncio.run(run())
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain")
+    body = r.text
+    assert 'vinyl_http_request_duration_seconds_count{method="GET",route="/api/spotify/playlists",status="200"}' in body
+    assert 'service="api"' in body and 'path="/me/playlists"' in body
+    assert 'vinyl_cache_events_total{cache="upstream:playlists",result="misses"}' in body
+    assert "vinyl_http_requests_in_flight" in body
+
+
+def test_server_timing_and_slow_trace_buffer(monkeypatch):
+    monkeypatch.setattr(main, "TRACE_SLOW_MS", 0.0)
+    monkeypatch.setattr(main, "SLOW_TRACES", main._SlowTraces(10))
+    monkeypatch.setenv("DEBUG_TOKEN", "dbg")
+
+    def spotify_api(request):
+        return httpx.Response(200, json={"total": 2, "items": [_track_item(1), _track_item(2)]})
+
+    async def run():
+        async with _authed_client(monkeypatch, "sid-trace", spotify_api) as c:
+            songs = await c.get("/api/songs")
+            denied = await c.get("/api/debug/traces")
+            traces = await c.get("/api/debug/traces", params={"route": "/api/songs"}, headers={"X-Debug-Token": "dbg"})
+            return songs, denied, traces
+
+    songs, denied, traces = asyncio.run(run())
+    timing = songs.headers["server-timing"]
+    for name in ("session", "auth", "spotify", "map", "app"):
+        assert f"{name};dur=" in timing
+    assert denied.status_code == 403
+    (trace,) = traces.json()["traces"]
+    assert trace["status"] == 200 and trace["path"] == "/api/songs"
+    assert set(trace["spans"]) == {"session", "auth", "spotify", "map"}
+
+
+def test_streaming_responses_are_traced_to_first_byte(monkeypatch):
+    monkeypatch.setattr(main, "TRACE_SLOW_MS", 0.0)
+    monkeypatch.setattr(main, "SLOW_TRACES", main._SlowTraces(10))
+
+    async def stream_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/x-ndjson")]})
+        await asyncio.sleep(0.3)
+        await send({"type": "http.response.body", "body": b"{}\n"})
+
+    async def run():
+        transport = httpx.ASGITransport(app=main._TracingMiddleware(stream_app))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            await c.get("/api/songs/stream")
+
+    asyncio.run(run())
+    (entry,) = main.SLOW_TRACES.entries
+    assert entry["path"] == "/api/songs/stream" and entry["ms"] < 250
+
+
+def test_load_bench_workloads_against_stub(monkeypatch, tmp_path):
+    try:
+        from api.bench import load as bench_load
+    except Exception:
+        from bench import load as bench_load  # type: ignore
+    for name in ("SPOTIFY_HTTP", "SPOTIFY_ACCOUNTS_HTTP", "IMAGE_HTTP", "IMAGE_CACHE", "LIBRARY",
+                 "SPOTIFY_APP_RPS", "SPOTIFY_APP_BURST", "SPOTIFY_USER_RPS", "SPOTIFY_USER_BURST"):
+        monkeypatch.setattr(main, name, getattr(main, name))
+    monkeypatch.setenv("SPOTIFY_CLIENT_ID", "cid")
+    monkeypatch.setenv("SPOTIFY_CLIENT_SECRET", "secret")
+    args = bench_load.parse_args([
+        "--users", "3", "--duration", "0.3", "--poll-interval", "0.1", "--keystroke", "0",
+        "--latency-ms", "0", "--jitter-ms", "0", "--liked-pages", "2", "--throttle-rate", "0.1",
+        "--baseline", str(tmp_path / "baseline.json"),
+    ])
+    current = asyncio.run(bench_load.bench(args))
+    results = current["results"]
+    assert set(results) == set(bench_load.WORKLOADS)
+    for report in results.values():
+        assert report["requests"] > 0
+        assert all(route["errors"] == 0 for route in report["routes"].values())
+    assert results["library"]["routes"]["GET /api/spotify/playlists/{id}/songs"]["n"] == 9
+    assert bench_load.compare(current, current, 0.25) == []
+    slower = json.loads(json.dumps(current))
+    slower["results"]["polling"]["routes"]["GET /api/spotify/current"]["p99"] += 1000
+    assert len(bench_load.compare(slower, current, 0.25)) == 1
+
+
+def test_load_bench_refuses_baselines_with_other_settings(monkeypatch, tmp_path, capsys):
+    try:
+        from api.bench import load as bench_load
+    except Exception:
+        from bench import load as bench_load  # type: ignore
+    path = tmp_path / "baseline.json"
+
+    def result(users, p99):
+        meta = {k: 0 for k in bench_load.SETTINGS}
+        meta["users"] = users
+        routes = {"GET /api/health": {"n": 1, "errors": 0, "p50": p99, "p99": p99}}
+        return {"meta": meta, "results": {"login": {"requests": 1, "seconds": 0.1, "rps": 10.0, "routes": routes}}}
+
+    path.write_text(json.dumps(result(20, 1.0)))
+    current = result(5, 900.0)
+
+    async def fake_bench(args):
+        return current
+
+    monkeypatch.setattr(bench_load, "bench", fake_bench)
+    assert bench_load.incomparable_settings(current, result(20, 1.0)) == ["users"]
+    assert bench_load.run(["--baseline", str(path)]) == 2
+    out = capsys.readouterr().out
+    assert "incomparable baseline" in out and "REGRESSION" not in out
+
+
+def test_lifespan_opens_prewarms_and_closes_upstream_clients(monkeypatch):
+    warmed = []
+
+    def upstream(request):
+        warmed.append((request.method, request.url.host))
+        return httpx.Response(401)
+
+    monkeypatch.setattr(main, "HTTP_PREWARM", True)
+    monkeypatch.setattr(main, "REDIS_URL", None)
+    monkeypatch.setattr(main, "TOKEN_REFRESHER", main._TokenRefreshScheduler())
+    monkeypatch.setattr(main, "_new_http_client", lambda name: httpx.AsyncClient(transport=httpx.MockTransport(upstream)))
+    for name in ("SPOTIFY_HTTP", "SPOTIFY_ACCOUNTS_HTTP", "IMAGE_HTTP"):
+        monkeypatch.setattr(main, name, None)
+
+    with TestClient(app) as c:
+        assert main.SPOTIFY_HTTP is not None and main.IMAGE_HTTP is not None
+        assert c.get("/api/health").status_code == 200
+        for _ in range(100):
+            if len(warmed) == 3:
+                break
+            time.sleep(0.01)
+    assert sorted(warmed) == [("HEAD", "accounts.spotify.com"), ("HEAD", "api.spotify.com"), ("HEAD", "i.scdn.co")]
+    assert main.SPOTIFY_HTTP is None and main.SPOTIFY_ACCOUNTS_HTTP is None and main.IMAGE_HTTP is None
+
+
+def test_library_store_expires_redis_entries(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+
+    async def run():
+        r = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        monkeypatch.setattr(main, "REDIS", r)
+        store = main._LibraryStore(10)
+        await store.set("library:u:liked", {"songs": []})
+        set_ttl = await r.ttl("library:u:liked")
+        await r.expire("library:u:liked", 5)
+        value = await store.get("library:u:liked")
+        return set_ttl, value, await r.ttl("library:u:liked")
+
+    set_ttl, value, read_ttl = asyncio.run(run())
+    assert value == {"songs": []}
+    # Written with an expiry, and reading pushes it back out
+    assert set_ttl == main.LIBRARY_TTL and read_ttl > 5
+
+
+def test_tiered_cache_bulk_get_and_set_use_one_round_trip(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+
+    async def run():
+        r = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        monkeypatch.setattr(main, "REDIS", r)
+        worker_a = main._TieredCache("bulk", 100, ttl=60)
+        worker_b = main._TieredCache("bulk", 100, ttl=60)
+        await worker_a.set_many({f"t{i}": {"tempo": i} for i in range(50)} | {"none": None})
+
+        async def no_single_gets(*args, **kwargs):
+            raise AssertionError("per-key GET")
+
+        monkeypatch.setattr(r, "get", no_single_gets)
+        await worker_b.set("t0", {"tempo": "local"})
+        found = await worker_b.get_many(["t0", "t1", "t49", "none", "unknown"])
+        return found, await r.ttl("cache:bulk:t1"), worker_b.stats["redis_hits"]
+
+    found, ttl, redis_hits = asyncio.run(run())
+    assert {k: v for k, (_, v) in found.items()} == {"t0": {"tempo": "local"}, "t1": {"tempo": 1}, "t49": {"tempo": 49}, "none": None}
+    assert 0 < ttl <= 60 and redis_hits == 3
+
+
+def test_player_cache_is_local_and_invalidated_across_workers(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    player = main._upstream_cache("/me/player/currently-playing")
+    assert not player.shared and not main._upstream_cache("/me/player/devices").shared
+    assert player.stale_ttl <= 5
+
+    async def run():
+        server = fakeredis.FakeServer()
+        r = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+        peer = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+        monkeypatch.setattr(main, "REDIS", r)
+        key = main._upstream_key("tok", "/me/player/currently-playing", None)
+        await player.set(key, {"body": "{}", "etag": None})
+        assert await r.keys("cache:*") == []  # never written to Redis
+        listener = asyncio.create_task(main._session_invalidation_listener())
+        await asyncio.sleep(0.05)
+        # Another worker ran a pause for the same user
+        await peer.publish(main.UPSTREAM_INVALIDATION_CHANNEL, f"peer {player.name} {key}")
+        await asyncio.sleep(0.05)
+        listener.cancel()
+        return key in player._entries
+
+    assert asyncio.run(run()) is False
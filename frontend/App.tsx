@@ -16,6 +16,34 @@ import MinimalGradientBackground from './components/MinimalGradientBackground';
 import AppearanceModal from './components/AppearanceModal';
 import RecordShelf from './components/RecordShelf';
 
+// Read an NDJSON Song stream, reporting the songs received so far (in library order)
+// after each network chunk. Resolves with the full list; a trailing error line rejects.
+const readSongStream = async (res: Response, onSongs: (songs: Song[]) => void): Promise<Song[]> => {
+  const songs: Song[] = [];
+  const reader = res.body!.getReader();
+  const decoder = new TextDecoder();
+  let buffered = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    buffered += decoder.decode(value, { stream: !done });
+    const lines = buffered.split('\n');
+    buffered = done ? '' : lines.pop() || '';
+    let added = false;
+    for (const line of lines) {
+      if (!line.trim()) continue;
+      const row = JSON.parse(line);
+      if (row && row.error !== undefined && row.title === undefined) {
+        throw new Error(`Stream error: status ${row.status}`);
+      }
+      songs.push(row as Song);
+      added = true;
+    }
+    // Pages are fetched concurrently and may arrive out of order
+    if (added) onSongs([...songs].sort((a, b) => a.id - b.id));
+    if (done) return songs.sort((a, b) => a.id - b.id);
+  }
+};
+
 const App: React.FC = () => {
   const [library, setLibrary] = useState<Song[]>([]);
   const [playQueue, setPlayQueue] = useState<Song[]>([]);
@@ -249,11 +277,29 @@ const App: React.FC = () => {
   }, [playQueue]);
 
   // Centralized song fetcher; pulls from backend and maps
+  // Loads a song list from an NDJSON route: the library fills in as pages arrive, the
+  // play queue is set from the first page and again once the stream completes
+  const loadSongStream = useCallback(async (res: Response) => {
+    let queued = false;
+    const data = await readSongStream(res, songs => {
+      setLibrary(songs);
+      if (!queued) { queued = true; setPlayQueue(songs); }
+    });
+    setLibrary(data);
+    setPlayQueue(data);
+  }, []);
+
   const fetchSongs = useCallback(async () => {
     try {
       const base = API_BASE || '';
-      const url = `${base}/api/songs`;
-      const response = await fetch(url, { credentials: 'include', headers: { 'ngrok-skip-browser-warning': 'true' } });
+      const headers = { 'ngrok-skip-browser-warning': 'true' };
+      // Stream the whole liked library; /api/songs serves the sample list when logged out
+      const stream = await fetch(`${base}/api/songs/stream`, { credentials: 'include', headers });
+      if (stream.ok && stream.body) {
+        await loadSongStream(stream);
+        return;
+      }
+      const response = await fetch(`${base}/api/songs`, { credentials: 'include', headers });
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
@@ -263,7 +309,7 @@ const App: React.FC = () => {
     } catch (error) {
       console.error('Could not fetch songs:', error);
     }
-  }, []);
+  }, [loadSongStream]);
 
   // Queue feature removed: no longer fetch Spotify queue
 
@@ -310,17 +356,15 @@ const App: React.FC = () => {
   const fetchPlaylistSongs = useCallback(async (playlistId: string) => {
     try {
       const base = API_BASE || '';
-      const res = await fetch(`${base}/api/spotify/playlists/${playlistId}/songs`, { credentials: 'include', headers: { 'ngrok-skip-browser-warning': 'true' } });
-      if (!res.ok) {
+      const res = await fetch(`${base}/api/spotify/playlists/${playlistId}/songs/stream`, { credentials: 'include', headers: { 'ngrok-skip-browser-warning': 'true' } });
+      if (!res.ok || !res.body) {
         throw new Error(`HTTP error! status: ${res.status}`);
       }
-      const data: Song[] = await res.json();
-      setLibrary(data);
-      setPlayQueue(data);
+      await loadSongStream(res);
     } catch (e) {
       console.error('Failed to fetch playlist songs', e);
     }
-  }, []);
+  }, [loadSongStream]);
 
   // Fetch song library from the backend on initial load
   useEffect(() => {
@@ -556,6 +600,28 @@ const App: React.FC = () => {
 
   // Smooth progress animation via requestAnimationFrame
   const progressRafIdRef = useRef<number | null>(null);
+  // Playback events only arrive on track/play/pause/seek changes: advance the bar
+  // locally from the last known position while playing
+  useEffect(() => {
+    if (!nowPlaying?.isPlaying) return;
+    // Re-anchor on every snapshot (local track starts don't go through apply())
+    spotifyProgressRef.current = { baseMs: nowPlaying.progressMs, durationMs: nowPlaying.durationMs, ts: Date.now() };
+    let lastPaint = 0;
+    const tick = (now: number) => {
+      const sp = spotifyProgressRef.current;
+      if (sp && sp.durationMs > 0 && now - lastPaint >= 250) {
+        lastPaint = now;
+        const elapsedMs = sp.baseMs + (Date.now() - sp.ts);
+        setProgressRatio(Math.max(0, Math.min(1, elapsedMs / sp.durationMs)));
+      }
+      progressRafIdRef.current = requestAnimationFrame(tick);
+    };
+    progressRafIdRef.current = requestAnimationFrame(tick);
+    return () => {
+      if (progressRafIdRef.current !== null) cancelAnimationFrame(progressRafIdRef.current);
+      progressRafIdRef.current = null;
+    };
+  }, [nowPlaying]);
   // Fallback timer to advance track if end events are missed
   const trackEndTimerRef = useRef<any>(null);
   // Poll Spotify current playback to reflect remote device state
@@ -565,6 +631,14 @@ const App: React.FC = () => {
     let stopped = false;
     let id: any = null;
 
+    let es: EventSource | null = null;
+
+    const stop = () => {
+      stopped = true;
+      if (id) clearInterval(id);
+      if (es) { es.close(); es = null; }
+    };
+
     const poll = async () => {
       try {
         const res = await fetch(`${base}/api/spotify/current`, {
@@ -574,18 +648,23 @@ const App: React.FC = () => {
         if (!res.ok) {
           if (res.status === 401 || res.status === 403) {
             setSpotifyLimited(true);
-            if (id) clearInterval(id);
-            stopped = true;
+            stop();
           }
           return;
         }
-        const body = await res.json();
+        await apply(await res.json());
+      } catch (e) {
+        // ignore errors
+      }
+    };
+
+    const apply = async (body: any) => {
+      try {
         if (stopped) return;
 
         if (body?.error === 'premium_required') {
           setSpotifyLimited(true);
-          if (id) clearInterval(id);
-          stopped = true;
+          stop();
           return;
         }
 
@@ -645,9 +724,37 @@ const App: React.FC = () => {
       }
     };
 
-    id = setInterval(poll, 1200);
-    poll();
-    return () => { stopped = true; if (id) clearInterval(id); };
+    const startPolling = () => {
+      if (stopped || id) return;
+      id = setInterval(poll, 1200);
+      poll();
+    };
+
+    // Prefer the server-push stream (one shared upstream poller per account, events
+    // only on change); fall back to polling if the stream can't be kept open.
+    if (typeof EventSource !== 'undefined') {
+      es = new EventSource(`${base}/api/spotify/current/stream`, { withCredentials: true });
+      const onState = (e: MessageEvent) => {
+        try { apply(JSON.parse(e.data)); } catch {}
+      };
+      ['state', 'track', 'play', 'pause', 'seek'].forEach(t => es?.addEventListener(t, onState as EventListener));
+      es.addEventListener('error', (e: Event) => {
+        const data = (e as MessageEvent).data;
+        if (data) {
+          // Server-sent error event: session is no longer authorized
+          setSpotifyLimited(true);
+          stop();
+          return;
+        }
+        if (es && es.readyState === EventSource.CLOSED) {
+          es = null;
+          startPolling();
+        }
+      });
+    } else {
+      startPolling();
+    }
+    return () => { stop(); };
   }, [isAuthenticated]);
 
   // Reset auto-advance guard whenever the current track changes
@@ -700,21 +807,6 @@ const App: React.FC = () => {
       const next = playQueue[nextIndex];
       (async () => {
         const base = API_BASE || '';
-        // Resolve target device: selected -> active -> browser SDK
-        let targetDeviceId: string | null = selectedDeviceId || null;
-        if (!targetDeviceId) {
-          try {
-            const res = await fetch(`${base}/api/spotify/devices`, {
-              credentials: 'include',
-              headers: { 'ngrok-skip-browser-warning': 'true' }
-            });
-            const json = await res.json();
-            const activeId = (json.devices || []).find((d: any) => d?.is_active)?.id || null;
-            if (activeId) targetDeviceId = activeId;
-          } catch {}
-        }
-        targetDeviceId = targetDeviceId || spotifyDeviceId || null;
-
         // Update local now-playing and background immediately
         setCurrentTrackIndex(nextIndex);
         setIsPlaying(true);
@@ -729,43 +821,22 @@ const App: React.FC = () => {
           }
         }
 
-        if (next?.spotifyUri && targetDeviceId && !spotifyLimited) {
+        if (next?.spotifyUri && !spotifyLimited) {
           try {
-            // Always transfer playback to the target device to make it active
-            await fetch(`${base}/api/spotify/transfer`, {
+            // Backend resolves the device (selected -> active -> browser SDK),
+            // transfers and plays, retrying server-side
+            const res = await fetch(`${base}/api/spotify/play-on-device`, {
               method: 'PUT',
               credentials: 'include',
               headers: { 'Content-Type': 'application/json', 'ngrok-skip-browser-warning': 'true' },
-              body: JSON.stringify({ device_id: targetDeviceId, play: true }),
+              body: JSON.stringify({
+                device_id: selectedDeviceId || null,
+                fallback_device_id: spotifyDeviceId || null,
+                uris: [next.spotifyUri],
+              }),
             });
-
-            // Play this track on the target device (replaces current track)
-            const playBody = { device_id: targetDeviceId, uris: [next.spotifyUri] };
-            let playRes = await fetch(`${base}/api/spotify/play`, {
-              method: 'PUT',
-              credentials: 'include',
-              headers: { 'Content-Type': 'application/json', 'ngrok-skip-browser-warning': 'true' },
-              body: JSON.stringify(playBody),
-            });
-
-            // If Spotify rejects initially, retry after a short delay
-            if (!playRes.ok) {
-              await new Promise(r => setTimeout(r, 300));
-              await fetch(`${base}/api/spotify/transfer`, {
-                method: 'PUT',
-                credentials: 'include',
-                headers: { 'Content-Type': 'application/json', 'ngrok-skip-browser-warning': 'true' },
-                body: JSON.stringify({ device_id: targetDeviceId, play: true }),
-              });
-              playRes = await fetch(`${base}/api/spotify/play`, {
-                method: 'PUT',
-                credentials: 'include',
-                headers: { 'Content-Type': 'application/json', 'ngrok-skip-browser-warning': 'true' },
-                body: JSON.stringify(playBody),
-              });
-            }
-
-            if (targetDeviceId === spotifyDeviceId) { try { spotifyPlayerRef.current?.resume?.(); } catch {} }
+            const json = res.ok ? await res.json() : null;
+            if (json?.device_id && json.device_id === spotifyDeviceId) { try { spotifyPlayerRef.current?.resume?.(); } catch {} }
           } catch (e) {
             console.error('Failed to play next on target device', e);
           }
@@ -785,21 +856,6 @@ const App: React.FC = () => {
       const prev = playQueue[prevIndex];
       (async () => {
         const base = API_BASE || '';
-        // Resolve target device: selected -> active -> browser SDK
-        let targetDeviceId: string | null = selectedDeviceId || null;
-        if (!targetDeviceId) {
-          try {
-            const res = await fetch(`${base}/api/spotify/devices`, {
-              credentials: 'include',
-              headers: { 'ngrok-skip-browser-warning': 'true' }
-            });
-            const json = await res.json();
-            const activeId = (json.devices || []).find((d: any) => d?.is_active)?.id || null;
-            if (activeId) targetDeviceId = activeId;
-          } catch {}
-        }
-        targetDeviceId = targetDeviceId || spotifyDeviceId || null;
-
         // Update local now-playing and background immediately
         setCurrentTrackIndex(prevIndex);
         setIsPlaying(true);
@@ -814,43 +870,22 @@ const App: React.FC = () => {
           }
         }
 
-        if (prev?.spotifyUri && targetDeviceId && !spotifyLimited) {
+        if (prev?.spotifyUri && !spotifyLimited) {
           try {
-            // Always transfer playback to the target device to make it active
-            await fetch(`${base}/api/spotify/transfer`, {
+            // Backend resolves the device (selected -> active -> browser SDK),
+            // transfers and plays, retrying server-side
+            const res = await fetch(`${base}/api/spotify/play-on-device`, {
               method: 'PUT',
               credentials: 'include',
               headers: { 'Content-Type': 'application/json', 'ngrok-skip-browser-warning': 'true' },
-              body: JSON.stringify({ device_id: targetDeviceId, play: true }),
+              body: JSON.stringify({
+                device_id: selectedDeviceId || null,
+                fallback_device_id: spotifyDeviceId || null,
+                uris: [prev.spotifyUri],
+              }),
             });
-
-            // Play this track on the target device (replaces current track)
-            const playBody = { device_id: targetDeviceId, uris: [prev.spotifyUri] };
-            let playRes = await fetch(`${base}/api/spotify/play`, {
-              method: 'PUT',
-              credentials: 'include',
-              headers: { 'Content-Type': 'application/json', 'ngrok-skip-browser-warning': 'true' },
-              body: JSON.stringify(playBody),
-            });
-
-            // If Spotify rejects initially, retry after a short delay
-            if (!playRes.ok) {
-              await new Promise(r => setTimeout(r, 300));
-              await fetch(`${base}/api/spotify/transfer`, {
-                method: 'PUT',
-                credentials: 'include',
-                headers: { 'Content-Type': 'application/json', 'ngrok-skip-browser-warning': 'true' },
-                body: JSON.stringify({ device_id: targetDeviceId, play: true }),
-              });
-              playRes = await fetch(`${base}/api/spotify/play`, {
-                method: 'PUT',
-                credentials: 'include',
-                headers: { 'Content-Type': 'application/json', 'ngrok-skip-browser-warning': 'true' },
-                body: JSON.stringify(playBody),
-              });
-            }
-
-            if (targetDeviceId === spotifyDeviceId) { try { spotifyPlayerRef.current?.resume?.(); } catch {} }
+            const json = res.ok ? await res.json() : null;
+            if (json?.device_id && json.device_id === spotifyDeviceId) { try { spotifyPlayerRef.current?.resume?.(); } catch {} }
           } catch (e) {
             console.error('Failed to play previous on target device', e);
           }
@@ -1,5 +1,6 @@
 import React, { useRef, useEffect } from 'react';
 import { Song } from '../types';
+import { proxiedImage } from '../constants';
 
 interface RecordShelfProps {
   songs: Song[];
@@ -47,7 +48,7 @@ const RecordShelf: React.FC<RecordShelfProps> = ({ songs, currentIndex, onSelect
             const ringOpacity = isActive ? 0.35 : 0.25;
             const groove = 'repeating-radial-gradient(circle at 50% 50%, rgba(255,255,255,0.06) 0px, rgba(255,255,255,0.0) 1px, rgba(0,0,0,0.0) 2px)';
             const discBase = 'radial-gradient(circle at 50% 45%, #0a0a0a 0%, #111 30%, #0b0b0b 55%, #000 100%)';
-            const labelImg = song.albumArt ? `url(${song.albumArt})` : undefined;
+            const labelImg = song.albumArt ? `url(${proxiedImage(song.albumArt, { w: 128, fmt: 'webp' })})` : undefined;
             return (
               <button
                 key={`${song.id}-${song.spotifyUri || song.title}`}
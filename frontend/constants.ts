@@ -1,12 +1,16 @@
 export const API_BASE = (import.meta.env.VITE_BACKEND_URL || '').replace(/\/$/, '');
 
-export const proxiedImage = (src: string | null | undefined): string => {
+// Optional server-side variant: `w` is snapped to a width bucket, `fmt` transcodes
+export const proxiedImage = (src: string | null | undefined, opts?: { w?: number; fmt?: 'webp' | 'jpeg' | 'png' }): string => {
   const s = src || '';
   if (!s) return '';
   try {
     const u = new URL(s);
     if (u.hostname === 'i.scdn.co' && API_BASE) {
-      return `${API_BASE}/api/proxy/image?src=${encodeURIComponent(s)}`;
+      let url = `${API_BASE}/api/proxy/image?src=${encodeURIComponent(s)}`;
+      if (opts?.w) url += `&w=${opts.w}`;
+      if (opts?.fmt) url += `&fmt=${opts.fmt}`;
+      return url;
     }
   } catch {}
   return s;